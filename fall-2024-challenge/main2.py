@@ -1,13 +1,19 @@
+import heapq
 import itertools
 import json
 import math
-import random
 import sys
+import time
 from collections import Counter, defaultdict
-from copy import deepcopy
 from dataclasses import asdict, dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional, Set, Tuple
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # BuildingDistanceMatrix falls back to nested lists
+    np = None
 
 # Auto-generated code below aims at helping you parse
 # the standard input according to the problem statement.
@@ -15,7 +21,26 @@ from typing import Dict, List, Optional, Set, Tuple
 
 DISTANCE_THRESHOLD = 1000
 POD_COST = 1000
+POD_REFUND = 750
 MAX_TRANSPORT_LINE_COUNT = 4
+# Side of a BuildingGridIndex cell, the city is 160 x 90
+GRID_CELL_SIZE = 10
+# Distances the NumPy distance matrix starts with room for, it doubles when full
+DISTANCE_MATRIX_CAPACITY = 4096
+# Building ids fit in this many bits of an edge_key
+EDGE_KEY_BITS = 20
+# Limits on generate_routes: buildings per route, paths explored, and seconds
+# spent as a backstop, the path count stops it after 10-20ms on 100 buildings
+ROUTE_MAX_STOPS = 10
+ROUTE_MAX_PATHS = 4000
+ROUTE_TIME_BUDGET = 0.1
+# Game rules the ActionPlanner's estimates rely on
+DAYS_PER_MONTH = 20
+POD_CAPACITY = 10
+SPEED_POINTS = 50
+BALANCE_POINTS = 50
+# Routes over the existing tubes the ActionPlanner considers running pods on
+PLAN_ROUTE_CANDIDATES = 20
 
 
 def debug(message: any):
@@ -32,10 +57,26 @@ def distance(p1: Tuple[int, int], p2: Tuple[int, int]):
     return math.sqrt((p2[0] - p1[0]) ** 2 + (p2[1] - p1[1]) ** 2)
 
 
+def edge_key(building_id_1: int, building_id_2: int) -> int:
+    """The same integer for a pair of buildings in either order"""
+    if building_id_1 > building_id_2:
+        building_id_1, building_id_2 = building_id_2, building_id_1
+    return (building_id_1 << EDGE_KEY_BITS) | building_id_2
+
+
+def split_edge_key(key: int) -> Tuple[int, int]:
+    return key >> EDGE_KEY_BITS, key & ((1 << EDGE_KEY_BITS) - 1)
+
+
 # Function to check if point A is on the segment between B and C
 def pointOnSegment(A, B, C):
-    epsilon = 0.0000001
-    return -epsilon < distance(B, A) + distance(A, C) - distance(B, C) < epsilon
+    # Exact on integer coordinates: A is on the line through B and C (zero
+    # cross product) and its projection falls between them
+    dx, dy = C[0] - B[0], C[1] - B[1]
+    ax, ay = A[0] - B[0], A[1] - B[1]
+    if dx * ay - dy * ax != 0:
+        return False
+    return 0 <= dx * ax + dy * ay <= dx * dx + dy * dy
 
 
 def sign(x):
@@ -87,6 +128,126 @@ def segmentsIntersect(A, B, C, D):
     )
 
 
+def segment_cells(
+    p1: Tuple[int, int], p2: Tuple[int, int], cell_size: int = GRID_CELL_SIZE
+) -> List[Tuple[int, int]]:
+    """
+    Every grid cell the segment p1-p2 passes through or touches
+
+    Goes column by column, taking the span of y the segment covers within
+    each column. The spans are widened a little so a segment running along
+    a cell border lists the cells on both sides.
+    """
+    (x1, y1), (x2, y2) = sorted([tuple(p1), tuple(p2)])
+    epsilon = 1e-9
+    cells = []
+    for cx in range(int(x1 // cell_size), int(x2 // cell_size) + 1):
+        if x1 == x2:
+            y_low, y_high = min(y1, y2), max(y1, y2)
+        else:
+            slope = (y2 - y1) / (x2 - x1)
+            ya = y1 + slope * (max(x1, cx * cell_size) - x1)
+            yb = y1 + slope * (min(x2, (cx + 1) * cell_size) - x1)
+            y_low, y_high = min(ya, yb), max(ya, yb)
+        for cy in range(
+            int((y_low - epsilon) // cell_size), int((y_high + epsilon) // cell_size) + 1
+        ):
+            cells.append((cx, cy))
+    return cells
+
+
+def delaunay_edges(points: Dict[int, Tuple[int, int]]) -> Set[int]:
+    """
+    edge_keys of the Delaunay triangulation of {building id: coordinates}
+
+    Bowyer-Watson in integer arithmetic, so exact on the game's coordinates.
+    The edges never cross each other or pass through another building, and
+    include every building's nearest neighbor and the minimum spanning tree.
+    Each point is located by walking the triangles from the last one made,
+    then the triangles whose circumcircle holds it are flooded out from
+    there and replaced by a fan around it.
+    """
+    ids = list(points)
+    if len(ids) < 3:
+        return {edge_key(ids[0], ids[1])} if len(ids) == 2 else set()
+
+    # vertices by index, the last three a triangle around everything
+    vertices = [tuple(int(v) for v in points[i]) for i in ids]
+    xs, ys = [v[0] for v in vertices], [v[1] for v in vertices]
+    cx, cy = (min(xs) + max(xs)) // 2, (min(ys) + max(ys)) // 2
+    far = 1000 * (max(max(xs) - min(xs), max(ys) - min(ys)) + 1)
+    n = len(vertices)
+    vertices += [(cx - 2 * far, cy - far), (cx + 2 * far, cy - far), (cx, cy + 2 * far)]
+
+    def orient(a: int, b: int, c: int) -> int:
+        (ax, ay), (bx, by), (qx, qy) = vertices[a], vertices[b], vertices[c]
+        return (bx - ax) * (qy - ay) - (by - ay) * (qx - ax)
+
+    def in_circle(a: int, b: int, c: int, d: int) -> bool:
+        """Whether d is strictly inside the circumcircle of ccw a, b, c"""
+        dx, dy = vertices[d]
+        ax, ay = vertices[a][0] - dx, vertices[a][1] - dy
+        bx, by = vertices[b][0] - dx, vertices[b][1] - dy
+        qx, qy = vertices[c][0] - dx, vertices[c][1] - dy
+        return (
+            (ax * ax + ay * ay) * (bx * qy - qx * by)
+            - (bx * bx + by * by) * (ax * qy - qx * ay)
+            + (qx * qx + qy * qy) * (ax * by - bx * ay)
+        ) > 0
+
+    # directed edge (u, v) of a ccw triangle: its third vertex
+    opposite: Dict[Tuple[int, int], int] = {}
+
+    def add_triangle(a: int, b: int, c: int):
+        opposite[(a, b)], opposite[(b, c)], opposite[(c, a)] = c, a, b
+
+    add_triangle(n, n + 1, n + 2)
+    last_edge = (n, n + 1)
+
+    # nearby points one after another keep the walks short
+    for point in sorted(range(n), key=lambda i: vertices[i]):
+        u, v = last_edge
+        while True:
+            w = opposite[(u, v)]
+            for a, b in ((u, v), (v, w), (w, u)):
+                if orient(a, b, point) < 0:
+                    # the point is past this edge, step into the next triangle
+                    u, v = b, a
+                    break
+            else:
+                break
+
+        # triangles whose circumcircle holds the point, and the hole's rim
+        stack, seen, bad, rim = [(u, v, opposite[(u, v)])], set(), [], []
+        seen.add(min((u, v), (v, opposite[(u, v)]), (opposite[(u, v)], u)))
+        while stack:
+            a, b, c = stack.pop()
+            bad.append((a, b, c))
+            for x, y in ((a, b), (b, c), (c, a)):
+                z = opposite.get((y, x))
+                if z is None:
+                    rim.append((x, y))
+                    continue
+                key = min((y, x), (x, z), (z, y))
+                if key in seen:
+                    continue
+                if in_circle(y, x, z, point):
+                    seen.add(key)
+                    stack.append((y, x, z))
+                else:
+                    rim.append((x, y))
+
+        for a, b, c in bad:
+            del opposite[(a, b)], opposite[(b, c)], opposite[(c, a)]
+        for x, y in rim:
+            add_triangle(x, y, point)
+        last_edge = rim[0]
+
+    return {
+        edge_key(ids[u], ids[v]) for (u, v) in opposite if u < n and v < n
+    }
+
+
 def detect_anomalous_keys(counts, z_threshold=4):
     """
     Detect keys with anomalously high values in a dictionary based on z-score.
@@ -122,24 +283,13 @@ def detect_anomalous_keys(counts, z_threshold=4):
         return []
 
 
-def subtract_arrays(array1, array2):
-    """
-    Subtracts elements of array2 from array1 element-wise.
-
-    :param array1: The first list of numbers.
-    :param array2: The second list of numbers.
-    :return: A list where each element is the result of subtracting corresponding elements of array2 from array1.
-    """
-    return [item for item in array1 if item not in array2]
-
-
 @dataclass(frozen=True)
 class TransportLine:
     building_1: "Building"
     building_2: "Building"
     capacity: int = 1
 
-    @property
+    @cached_property
     def id(self):
         building_ids = [
             self.building_1.id,
@@ -148,6 +298,10 @@ class TransportLine:
         building_ids.sort()
         return "TransportLine:" + ";".join([str(bid) for bid in building_ids])
 
+    @property
+    def edge_key(self) -> int:
+        return edge_key(self.building_1.id, self.building_2.id)
+
     @property
     def display_id(self):
         building_ids = [
@@ -203,68 +357,7 @@ class TransportLine:
         building_2: "Building",
     ) -> "TransportLine":
 
-        for transport_line in TRANSPORT_LINES.values():
-            building_ids = [transport_line.building_1.id, transport_line.building_2.id]
-            if building_1.id in building_ids and building_2.id in building_ids:
-                return transport_line
-        return None
-
-    @classmethod
-    def get_connected_buildings(
-        cls, adjacency_list: Dict["Building", List["Building"]], building_id
-    ) -> List["Building"]:
-        # Use adjacency list to get connected buildings in O(1)
-        return adjacency_list.get(building_id, [])
-
-    @classmethod
-    def build_adjacency_list(cls) -> Dict["Building", List["Building"]]:
-        # Build an adjacency list to avoid recomputing neighbors
-        adjacency_list = {}
-        # debug(type(TRANSPORT_LINES))
-        # debug(type(TRANSPORT_LINES.values()))
-        for transport_line in list(TRANSPORT_LINES.values()):
-            # debug(transport_line)
-            # debug(transport_line.id)
-            if not isinstance(transport_line, TransportLine):
-                debug(transport_line)
-                assert False
-            if transport_line.building_1.id not in adjacency_list:
-                adjacency_list[transport_line.building_1.id] = []
-            if transport_line.building_2.id not in adjacency_list:
-                adjacency_list[transport_line.building_2.id] = []
-
-            # Add bidirectional connections
-            adjacency_list[transport_line.building_1.id].append(
-                transport_line.building_2
-            )
-            adjacency_list[transport_line.building_2.id].append(
-                transport_line.building_1
-            )
-
-        return adjacency_list
-
-    @classmethod
-    def get_transport_lines_prioritized_least_connecions(cls) -> List["TransportLine"]:
-        debug("get_transport_lines_prioritized_least_connecions")
-        copy_transport_lines = deepcopy(list(TRANSPORT_LINES.values()))
-        supp_transport_lines = []
-        for tl in copy_transport_lines:
-
-            supp_transport_lines.append(
-                (
-                    tl,
-                    min(
-                        tl.building_1.transport_line_count,
-                        tl.building_2.transport_line_count,
-                    ),
-                )
-            )
-
-        ordered = sorted(supp_transport_lines, key=lambda x: x[1], reverse=False)
-        # debug("ordered")
-        # debug(json.dumps(ordered, indent=2, default=str))
-
-        return [o[0] for o in ordered]
+        return TRANSPORT_LINES.get_line_between(building_1.id, building_2.id)
 
 
 class PotentialTransportLine(TransportLine):
@@ -328,7 +421,7 @@ class PotentialTransportLine(TransportLine):
         return True
 
     def _does_it_already_exist(self):
-        return self.id in TRANSPORT_LINES.keys()
+        return TRANSPORT_LINES.has_edge(self.building_1.id, self.building_2.id)
 
     def _buildings_have_too_many_connections(self):
         if self.building_1.transport_line_count >= MAX_TRANSPORT_LINE_COUNT:
@@ -340,7 +433,14 @@ class PotentialTransportLine(TransportLine):
         return False
 
     def _does_it_intersect(self):
-        for transport_line in TRANSPORT_LINES.values():
+        candidate_edges = BUILDINGS.candidate_edges
+        is_candidate = self.edge_key in candidate_edges
+        for transport_line in TRANSPORT_LINES.lines_near_segment(
+            self.building_1.coordinates, self.building_2.coordinates
+        ):
+            # edges of the triangulation never cross each other
+            if is_candidate and transport_line.edge_key in candidate_edges:
+                continue
             if segmentsIntersect(
                 A=self.building_1.coordinates,
                 B=self.building_2.coordinates,
@@ -351,8 +451,15 @@ class PotentialTransportLine(TransportLine):
         return False
 
     def _does_it_intersect_a_building(self):
-        for building in BUILDINGS.get_buildings_as_list():
-            if building in [self.building_1, self.building_2]:
+        # nor pass through a building
+        if self.edge_key in BUILDINGS.candidate_edges:
+            return False
+
+        ends = (self.building_1.id, self.building_2.id)
+        for building in BUILDINGS.grid.buildings_near_segment(
+            self.building_1.coordinates, self.building_2.coordinates
+        ):
+            if building.id in ends:
                 continue
             if pointOnSegment(
                 A=building.coordinates,
@@ -367,7 +474,7 @@ class PotentialTransportLine(TransportLine):
 class Teleporter(TransportLine):
     capacity: int = 0
 
-    @property
+    @cached_property
     def id(self):
         building_ids = [
             self.building_1.id,
@@ -377,6 +484,110 @@ class Teleporter(TransportLine):
         return "TELEPORTER:" + ";".join([str(bid) for bid in building_ids])
 
 
+class TransportNetwork:
+    """
+    The transport lines by id, with adjacency, per-building line counts and
+    a grid of the cells each line passes through
+
+    The indexes are updated as lines are added and removed, so nothing has
+    to scan every line to find a building's neighbors, count its lines or
+    find the lines a new tube could cross.
+    """
+
+    def __init__(self):
+        self.lines: Dict[str, TransportLine] = {}
+        # building id: {neighbor id: neighbor}
+        self.adjacency: Dict[int, Dict[int, "Building"]] = {}
+        # building id: number of lines, teleporters included
+        self.degrees: Dict[int, int] = defaultdict(int)
+        # edge_key: {line id: line}
+        self.edges: Dict[int, Dict[str, TransportLine]] = {}
+        # (cell x, cell y): {line id: line}
+        self.cells: Dict[Tuple[int, int], Dict[str, TransportLine]] = defaultdict(dict)
+
+    def __contains__(self, line_id: str) -> bool:
+        return line_id in self.lines
+
+    def __getitem__(self, line_id: str) -> TransportLine:
+        return self.lines[line_id]
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def get(self, line_id: str, default=None) -> Optional[TransportLine]:
+        return self.lines.get(line_id, default)
+
+    def keys(self):
+        return self.lines.keys()
+
+    def values(self):
+        return self.lines.values()
+
+    def add(self, transport_line: TransportLine):
+        if transport_line.id in self.lines:
+            self.remove(transport_line.id)
+        building_1, building_2 = transport_line.building_1, transport_line.building_2
+        self.lines[transport_line.id] = transport_line
+        self.degrees[building_1.id] += 1
+        self.degrees[building_2.id] += 1
+
+        edge_lines = self.edges.setdefault(transport_line.edge_key, {})
+        edge_lines[transport_line.id] = transport_line
+        self.adjacency.setdefault(building_1.id, {})[building_2.id] = building_2
+        self.adjacency.setdefault(building_2.id, {})[building_1.id] = building_1
+        for cell in segment_cells(building_1.coordinates, building_2.coordinates):
+            self.cells[cell][transport_line.id] = transport_line
+
+    def remove(self, line_id: str) -> Optional[TransportLine]:
+        transport_line = self.lines.pop(line_id, None)
+        if transport_line is None:
+            return None
+        id_1, id_2 = transport_line.building_1.id, transport_line.building_2.id
+        self.degrees[id_1] -= 1
+        self.degrees[id_2] -= 1
+        for cell in segment_cells(
+            transport_line.building_1.coordinates, transport_line.building_2.coordinates
+        ):
+            del self.cells[cell][line_id]
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+        key = transport_line.edge_key
+        del self.edges[key][line_id]
+        if not self.edges[key]:
+            # no other line (a teleporter) still joins them
+            del self.edges[key]
+            for building_id, neighbor_id in ((id_1, id_2), (id_2, id_1)):
+                del self.adjacency[building_id][neighbor_id]
+                if not self.adjacency[building_id]:
+                    del self.adjacency[building_id]
+        return transport_line
+
+    def degree(self, building_id: int) -> int:
+        return self.degrees.get(building_id, 0)
+
+    def lines_near_segment(
+        self, p1: Tuple[int, int], p2: Tuple[int, int]
+    ) -> List[TransportLine]:
+        """The lines sharing a grid cell with p1-p2, the only ones it can cross"""
+        near: Dict[str, TransportLine] = {}
+        for cell in segment_cells(p1, p2):
+            lines = self.cells.get(cell)
+            if lines:
+                near.update(lines)
+        return list(near.values())
+
+    def has_edge(self, building_id_1: int, building_id_2: int) -> bool:
+        """Whether any line, tube or teleporter, joins the two buildings"""
+        return edge_key(building_id_1, building_id_2) in self.edges
+
+    def get_line_between(
+        self, building_id_1: int, building_id_2: int
+    ) -> Optional[TransportLine]:
+        edge_lines = self.edges.get(edge_key(building_id_1, building_id_2))
+        return next(iter(edge_lines.values())) if edge_lines else None
+
+
 @dataclass
 class Pod:
     id: int
@@ -419,13 +630,7 @@ class Building:
 
     @property
     def transport_line_count(self):
-        return len(
-            [
-                tl
-                for tl in list(TRANSPORT_LINES.values())
-                if tl.building_1 == self or tl.building_2 == self
-            ]
-        )
+        return TRANSPORT_LINES.degree(self.id)
 
     def calc_distance_to_building(self, other_building: "Building") -> float:
         return distance(
@@ -469,17 +674,13 @@ class Building:
                     ^ isinstance(b2, BuildingLandingPad)
                 ),
                 distance_between=b1.calc_distance_to_building(b2),
-                has_existing_transport_line=TransportLine.get_transport_line_by_buildings(
-                    building_1=b1,
-                    building_2=b2,
-                )
-                is not None,
-                existing_transport_line=TransportLine.get_transport_line_by_buildings(
-                    building_1=b1,
-                    building_2=b2,
-                ),
+                has_existing_transport_line=existing_transport_line is not None,
+                existing_transport_line=existing_transport_line,
             )
             for b1, b2 in building_pairs
+            for existing_transport_line in [
+                TRANSPORT_LINES.get_line_between(b1.id, b2.id)
+            ]
         ]
 
         sorted_building_pairs = sorted(
@@ -591,16 +792,134 @@ from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
 
+class BuildingGridIndex:
+    """
+    Buildings bucketed by type into a uniform grid
+
+    A nearest neighbor query walks rings of cells out from the building and
+    stops once nothing further out can beat what it already found, so it
+    only looks at nearby buildings of the wanted types.
+    """
+
+    def __init__(self, cell_size: int = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        # type: {(cell x, cell y): [(row, building)]}
+        self.cells: Dict[int, Dict[Tuple[int, int], List[Tuple[int, Building]]]] = (
+            defaultdict(lambda: defaultdict(list))
+        )
+        self.min_cell = None
+        self.max_cell = None
+
+    def cell_of(self, coordinates: Tuple[int, int]) -> Tuple[int, int]:
+        return (
+            int(coordinates[0]) // self.cell_size,
+            int(coordinates[1]) // self.cell_size,
+        )
+
+    def add(self, row: int, building: Building):
+        cell = self.cell_of(building.coordinates)
+        self.cells[building.type][cell].append((row, building))
+        if self.min_cell is None:
+            self.min_cell, self.max_cell = cell, cell
+        self.min_cell = (min(self.min_cell[0], cell[0]), min(self.min_cell[1], cell[1]))
+        self.max_cell = (max(self.max_cell[0], cell[0]), max(self.max_cell[1], cell[1]))
+
+    def buildings_near_segment(
+        self, p1: Tuple[int, int], p2: Tuple[int, int]
+    ) -> List[Building]:
+        """The buildings in the cells the segment p1-p2 passes through"""
+        near = []
+        for cell in segment_cells(p1, p2, self.cell_size):
+            for cells in self.cells.values():
+                near.extend(building for _, building in cells.get(cell, ()))
+        return near
+
+    def nearest(
+        self,
+        building: Building,
+        N: int,
+        building_types: Optional[List[int]] = None,
+        exclude_ids: Optional[Set[int]] = None,
+    ) -> List[Building]:
+        """The N closest buildings, ties in the order they were added"""
+        if N < 1 or self.min_cell is None:
+            return []
+        types = self.cells.keys() if building_types is None else building_types
+        type_cells = [self.cells[t] for t in set(types) if t in self.cells]
+        if not type_cells:
+            return []
+
+        cx, cy = self.cell_of(building.coordinates)
+        max_ring = max(
+            cx - self.min_cell[0],
+            self.max_cell[0] - cx,
+            cy - self.min_cell[1],
+            self.max_cell[1] - cy,
+        )
+        found: List[Tuple[float, int, Building]] = []
+        for ring in range(max_ring + 1):
+            # anything in this ring or beyond is at least this far away
+            if len(found) >= N and found[N - 1][0] < (ring - 1) * self.cell_size:
+                break
+            for x in range(cx - ring, cx + ring + 1):
+                step = 1 if abs(x - cx) == ring else 2 * ring
+                for y in range(cy - ring, cy + ring + 1, max(step, 1)):
+                    for cells in type_cells:
+                        for row, other in cells.get((x, y), ()):
+                            if other.id == building.id:
+                                continue
+                            if exclude_ids and other.id in exclude_ids:
+                                continue
+                            found.append(
+                                (distance(building.coordinates, other.coordinates), row, other)
+                            )
+            found.sort(key=lambda item: (item[0], item[1]))
+        return [other for _, _, other in found[:N]]
+
+
 @dataclass
 class BuildingDistanceMatrix:
+    """
+    Distances between every pair of buildings
+
+    With NumPy the matrix is condensed into a float32 array holding each
+    row's distances to the rows before it, row after row, so a new building
+    only appends to it. The array has spare capacity past the distances in
+    use. Without NumPy it's nested lists.
+    """
+
     buildings: Dict[int, Building] = field(default_factory=dict)
+    use_numpy: bool = np is not None
     distance_matrix: List[List[float]] = field(init=False, default_factory=list)
+    # building id: its row in distance_matrix
+    rows: Dict[int, int] = field(init=False, default_factory=dict)
+    grid: BuildingGridIndex = field(init=False, default_factory=BuildingGridIndex)
+    # NumPy storage only, the coordinates of each row
+    coordinates: Optional["np.ndarray"] = field(init=False, default=None)
+    # Delaunay triangulation of the buildings, built on first use
+    _candidate_edges: Optional[Set[int]] = field(init=False, default=None)
+    _candidate_adjacency: Dict[int, List[int]] = field(init=False, default_factory=dict)
 
     def __post_init__(self):
+        if self.use_numpy:
+            initial_buildings = list(self.buildings.values())
+            self.buildings = {}
+            self.distance_matrix = np.zeros(0, dtype=np.float32)
+            self.coordinates = np.zeros((0, 2))
+            self.add_buildings(initial_buildings)
+            return
+
         self.distance_matrix = self.create_distance_matrix()
+        for row, building in enumerate(self.buildings.values()):
+            self.rows[building.id] = row
+            self.grid.add(row, building)
 
     @property
     def max_distance(self):
+        if self.use_numpy:
+            used = self._condensed_size(len(self.rows))
+            return float(self.distance_matrix[:used].max()) if used else float("-inf")
+
         max_value = 0
         max_value = float("-inf")  # Initialize with negative infinity
         for row in self.distance_matrix:
@@ -609,6 +928,55 @@ class BuildingDistanceMatrix:
                     max_value = value
         return max_value
 
+    @property
+    def candidate_edges(self) -> Set[int]:
+        """edge_keys of the Delaunay triangulation of every building"""
+        if self._candidate_edges is None:
+            self._candidate_edges = delaunay_edges(
+                {b.id: b.coordinates for b in self.buildings.values()}
+            )
+            self._candidate_adjacency = defaultdict(list)
+            for key in self._candidate_edges:
+                id_1, id_2 = split_edge_key(key)
+                self._candidate_adjacency[id_1].append(id_2)
+                self._candidate_adjacency[id_2].append(id_1)
+        return self._candidate_edges
+
+    def get_candidate_neighbors(
+        self,
+        building_id: int,
+        N: int,
+        building_types: Optional[List[int]] = None,
+        exclude_list: Optional[List[Building]] = None,
+    ) -> List[Building]:
+        """
+        Like get_neighbors, but the building's neighbors in the triangulation
+        come first, nearest first, as tubes to them are quick to validate
+        """
+        building = self.buildings.get(building_id)
+        if building is None:
+            return []
+        self.candidate_edges
+        excluded = set() if exclude_list is None else {b.id for b in exclude_list}
+        candidates = sorted(
+            (
+                self.buildings[other_id]
+                for other_id in self._candidate_adjacency.get(building_id, ())
+                if other_id not in excluded
+                and (building_types is None or self.buildings[other_id].type in building_types)
+            ),
+            key=lambda other: (
+                distance(building.coordinates, other.coordinates),
+                self.rows[other.id],
+            ),
+        )[:N]
+        if len(candidates) < N:
+            excluded.update(other.id for other in candidates)
+            candidates += self.grid.nearest(
+                building, N - len(candidates), building_types, excluded
+            )
+        return candidates
+
     def get_buildings_as_list(self, filter_type: int = None) -> List[Building]:
         buildings_list = list(self.buildings.values())
 
@@ -629,11 +997,73 @@ class BuildingDistanceMatrix:
                 matrix[i][j] = matrix[j][i] = d
         return matrix
 
+    @staticmethod
+    def _condensed_size(rows: int) -> int:
+        return rows * (rows - 1) // 2
+
+    def get_distance(self, building_id_1: int, building_id_2: int) -> float:
+        row_1, row_2 = self.rows[building_id_1], self.rows[building_id_2]
+        if not self.use_numpy:
+            return self.distance_matrix[row_1][row_2]
+        if row_1 == row_2:
+            return 0.0
+        row_1, row_2 = min(row_1, row_2), max(row_1, row_2)
+        return float(self.distance_matrix[self._condensed_size(row_2) + row_1])
+
+    def _reserve(self, rows: int):
+        """Doubles the NumPy storage until `rows` rows fit"""
+        if len(self.coordinates) < rows:
+            coordinates = np.zeros((max(rows, 2 * len(self.coordinates)), 2))
+            coordinates[: len(self.coordinates)] = self.coordinates
+            self.coordinates = coordinates
+
+        size = self._condensed_size(rows)
+        capacity = len(self.distance_matrix)
+        if size <= capacity:
+            return
+        matrix = np.zeros(max(size, 2 * capacity, DISTANCE_MATRIX_CAPACITY), dtype=np.float32)
+        matrix[:capacity] = self.distance_matrix
+        self.distance_matrix = matrix
+
+    def add_buildings(self, new_buildings: List[Building]):
+        """Adds a batch of buildings, with NumPy in one vectorised update"""
+        if not self.use_numpy:
+            for new_building in new_buildings:
+                self.add_building(new_building)
+            return
+        if not new_buildings:
+            return
+        self._candidate_edges = None
+
+        start = len(self.rows)
+        end = start + len(new_buildings)
+        self._reserve(end)
+        self.coordinates[start:end] = [b.coordinates for b in new_buildings]
+
+        # new rows against every row before them, read out row after row
+        offsets = self.coordinates[start:end, None, :] - self.coordinates[None, :end, :]
+        block = np.sqrt((offsets**2).sum(axis=2))
+        before = np.arange(end)[None, :] < np.arange(start, end)[:, None]
+        first, last = self._condensed_size(start), self._condensed_size(end)
+        self.distance_matrix[first:last] = block[before]
+
+        for row, new_building in enumerate(new_buildings, start):
+            self.buildings[new_building.id] = new_building
+            self.rows[new_building.id] = row
+            self.grid.add(row, new_building)
+
     def add_building(self, new_building: Building):
+        if self.use_numpy:
+            self.add_buildings([new_building])
+            return
+
         # Add new building to the dictionary
         self.buildings[new_building.id] = new_building
+        self._candidate_edges = None
         building_list = list(self.buildings.values())
         n = len(building_list)
+        self.rows[new_building.id] = n - 1
+        self.grid.add(n - 1, new_building)
 
         # Update the distance matrix
         for i in range(n - 1):
@@ -652,65 +1082,18 @@ class BuildingDistanceMatrix:
         building_types: Optional[List[int]] = None,
         exclude_list: Optional[List[Building]] = None,
     ) -> List[Building]:
-        if building_id not in self.buildings:
+        building = self.buildings.get(building_id)
+        if building is None:
             return []
 
-        building_idx = list(self.buildings).index(building_id)
-        building_list = list(self.buildings.values())
-
-        # if exclude_list:
-        #     building_list = [b for b in building_list if b not in exclude_list]
-
-        # if building_types and len(building_types) > 0:
-        #     building_list = [b for b in building_list if b.type in building_types]
-
-        # debug("building_list")
-        # debug(building_list)
-
-        # Get distances from the building to others and sort by distance
-        distances = [
-            (i, dist)
-            for i, dist in enumerate(self.distance_matrix[building_idx])
-            if i != building_idx
-        ]
-        distances.sort(key=lambda x: x[1])
-
-        # debug("distances")
-        # debug(distances)
-
-        # Filter buildings by type if specified
-        if building_types is not None:
-            # debug(building_types)
-            distances = [
-                (i, dist)
-                for i, dist in distances
-                if building_list[i].type in building_types
-            ]
-            # building_list = [b for b in building_list if b.type in building_types]
-
-        if exclude_list is not None:
-            # debug(exclude_list)
-            distances = [
-                (i, dist)
-                for i, dist in distances
-                if building_list[i] not in exclude_list
-            ]
-            # building_list = [b for b in building_list if b.type in building_types]
-
-        try:
-            # Return the N closest buildings that match the type
-            closest_buildings = [building_list[i] for i, _ in distances[:N]]
-            # closest_buildings = []
-            # for i, _ in distances[:N]:
-            #     debug(i)
-            #     debug(_)
-            #     debug(building_list[i])
-            return closest_buildings
-        except Exception as exc:
-            debug(exc)
-            debug(json.dumps(building_list, default=str, indent=2))
-            debug(json.dumps(distances, default=str, indent=2))
-            raise
+        return self.grid.nearest(
+            building,
+            N,
+            building_types=building_types,
+            exclude_ids=(
+                None if exclude_list is None else {b.id for b in exclude_list}
+            ),
+        )
 
 
 @dataclass
@@ -798,6 +1181,12 @@ class ActionTeleport(Action):
     building_2: "Building"
     action_type: ActionType = ActionType.TELEPORT
 
+    def __str__(self):
+        props = [f"{self.action_type.value}"]
+        props.append(str(self.building_1.id))
+        props.append(str(self.building_2.id))
+        return " ".join(props)
+
     def calc_cost(self):
         return 5000
 
@@ -822,8 +1211,13 @@ class ActionDestroy(Action):
     pod: Pod
     action_type: ActionType = ActionType.DESTROY
 
+    def __str__(self):
+        props = [f"{self.action_type.value}"]
+        props.append(str(self.pod.id))
+        return " ".join(props)
+
     def calc_cost(self):
-        return -750
+        return -POD_REFUND
 
 
 @dataclass
@@ -844,119 +1238,432 @@ def build_bidirectional_path_from_transport_line(transport_lines: List[Transport
     pass
 
 
-def find_paths(
-    transport_lines: List[TransportLine],
-    adjacency_list: Dict[int, List[Building]],
-    mirror: bool = False,
-    max_depth: int = 10,
-) -> List[List[Building]]:
-    """Find circular or mirrored paths from transport lines with repeated visits and max depth."""
-    if not adjacency_list.keys():
+def generate_routes(
+    adjacency_list: Dict[int, Dict[int, Building]],
+    max_stops: int = ROUTE_MAX_STOPS,
+    max_paths: int = ROUTE_MAX_PATHS,
+    time_budget: float = ROUTE_TIME_BUDGET,
+) -> Iterator[List[Building]]:
+    """
+    Pod routes over the network, the ones visiting the most buildings first
+
+    Simple cycles come back closed, [start, ..., start], listed once
+    whichever building they start from and whichever way round. Simple
+    paths come back as out-and-back routes, [start, ..., end, ..., start],
+    listed once for both directions.
+
+    At most max_paths paths are explored, whether or not they make a route,
+    shared evenly between the starting buildings, a start that explores
+    fewer than its share leaving the rest to the next ones. The count is
+    what normally stops the search, so the same network always gives the
+    same routes; time_budget only guards against a slow machine.
+    """
+    if not adjacency_list:
         debug("no adjacency_list provided")
-        return []
-
-    paths = []
-
-    def dfs(current: Building, path: List[Building], start: Building, depth: int):
-        if depth > max_depth:
-            return  # Stop if max depth is exceeded
-
-        if len(path) > 1 and current == start:
-            # We found a circular path, add it to the list of paths
-            paths.append(path[:])
-            return
+        return
+
+    buildings = {
+        neighbor.id: neighbor
+        for neighbors in adjacency_list.values()
+        for neighbor in neighbors.values()
+    }
+    # buildings visited: cycles then out-and-back routes
+    by_coverage: Dict[int, Tuple[List[List[int]], List[List[int]]]] = defaultdict(
+        lambda: ([], [])
+    )
+    deadline = time.perf_counter() + time_budget
+    explored = 0
+    quota = 0
+
+    def explore(path: List[int], visited: Set[int]) -> bool:
+        """Records the routes extending `path`, False once the quota is reached"""
+        nonlocal explored
+        explored += 1
+        start, current = path[0], path[-1]
+        # each path is reached from both ends, keep the one from the lower id
+        if len(path) > 1 and start < current:
+            by_coverage[len(path)][1].append(path[:])
+        # a cycle is reached from each of its buildings both ways round
+        if (
+            len(path) > 2
+            and start in adjacency_list[current]
+            and start == min(path)
+            and path[1] < current
+        ):
+            by_coverage[len(path)][0].append(path + [start])
+        if explored >= quota:
+            return False
 
-        for neighbor in adjacency_list[current.id]:
-            if depth < max_depth:  # Continue if the depth limit has not been reached
+        if len(path) < max_stops:
+            for neighbor in adjacency_list[current]:
+                if neighbor in visited:
+                    continue
                 path.append(neighbor)
-                dfs(neighbor, path, start, depth + 1)
+                visited.add(neighbor)
+                in_budget = explore(path, visited)
+                visited.discard(neighbor)
                 path.pop()
+                if not in_budget:
+                    return False
+        return True
 
-    # For each building, try to find circular or mirrored paths
-    for line in transport_lines:
-        # debug(line)
-        b1, b2 = line.building_1, line.building_2
+    starts = sorted(adjacency_list)
+    capped = 0
+    for index, start in enumerate(starts):
+        if time.perf_counter() > deadline:
+            debug(f"generate_routes: out of time before building {start}")
+            break
+        quota = explored + (max_paths - explored) // (len(starts) - index)
+        if quota > explored and not explore([start], {start}):
+            capped += 1
+    if capped:
+        debug(f"generate_routes: {capped} buildings stopped at their share of paths")
+
+    def interleaved(routes: List[List[int]]) -> List[List[int]]:
+        """Round-robin over the starting buildings, so no start takes the front"""
+        ranks: Counter = Counter()
+        ranked = []
+        for route in routes:
+            ranked.append((ranks[route[0]], route))
+            ranks[route[0]] += 1
+        return [route for _, route in sorted(ranked, key=lambda item: item[0])]
+
+    for coverage in sorted(by_coverage, reverse=True):
+        cycles, lines = by_coverage[coverage]
+        for cycle in interleaved(cycles):
+            yield [buildings[b] for b in cycle]
+        for line in interleaved(lines):
+            yield [buildings[b] for b in line + line[-2::-1]]
+
+
+# Astronauts a pod route or teleporter carries each month: landing pad id,
+# module id, astronaut type, number of astronauts, days on the way
+Flow = Tuple[int, int, int, int, int]
+
+
+def astronaut_points(arrivals: int, count: int, days: int) -> int:
+    """
+    Points for `count` astronauts reaching a module after `days`, when
+    `arrivals` astronauts already reach it each month
+    """
+    speed = max(0, SPEED_POINTS - days) * count
+    balance = sum(max(0, BALANCE_POINTS - arrivals - k) for k in range(count))
+    return speed + balance
 
-        # Circular path starting from building_1
-        dfs(b1, [b1], b1, 1)
 
-    # debug(json.dumps(paths, default=str, indent=1))
+def pod_edges(path: List[int]) -> Set[int]:
+    """edge_keys of the tubes a pod on `path` runs on"""
+    return {edge_key(a, b) for a, b in zip(path, path[1:]) if a != b}
 
-    if mirror:
-        # Create mirrored paths
-        mirrored_paths = []
-        for path in paths:
-            mirrored_path = (
-                path + path[-2::-1]
-            )  # Mirror the path by excluding the last point and reversing
-            mirrored_paths.append(mirrored_path)
-        return mirrored_paths
 
-    return paths
+def route_flows(path: List[int]) -> List[Flow]:
+    """
+    The astronauts a pod on `path` carries from each landing pad on it to
+    the first module of their type it reaches, as many as one pod can move
+    """
+    stops = path[:-1] if len(path) > 1 and path[0] == path[-1] else path
+    buildings = [BUILDINGS.buildings.get(b) for b in stops]
+    if len(stops) < 2 or None in buildings:
+        return []
+    throughput = POD_CAPACITY * DAYS_PER_MONTH // len(stops)
 
+    flows = []
+    for i, pad in enumerate(buildings):
+        if not isinstance(pad, BuildingLandingPad):
+            continue
+        for astronaut_type, count in Counter(pad.astronaut_types).items():
+            reached = [
+                ((j - i) % len(stops), module.id)
+                for j, module in enumerate(buildings)
+                if module.type == astronaut_type
+            ]
+            if reached:
+                days, module_id = min(reached)
+                flows.append(
+                    (pad.id, module_id, astronaut_type, min(count, throughput), days)
+                )
+    return flows
 
-def add_potential_path_to_transport_lines(path: PotentialTransportLine):
 
-    if not path.id in TRANSPORT_LINES.keys():
-        TRANSPORT_LINES[path.id] = path
+def teleporter_flows(entrance: Building, exit: Building) -> List[Flow]:
+    if not isinstance(entrance, BuildingLandingPad):
+        return []
+    count = Counter(entrance.astronaut_types)[exit.type]
+    return [(entrance.id, exit.id, exit.type, count, 0)] if count else []
 
-    return path
 
+@dataclass
+class PlanCandidate:
+    """
+    Actions the ActionPlanner takes together or not at all: a pod route and
+    the tubes it still needs, or a teleporter
+    """
 
-def traverse_buildings(
-    start_building: "Building",
-    remaining_depth=10,
-    visited=None,
-    current_path=None,
-    building_types=None,
-    N=1,
-):
-    if visited is None:
-        visited = set()
-    if current_path is None:
-        current_path = []
+    flows: List[Flow] = field(default_factory=list)
+    path: Optional[List[int]] = None
+    tubes: List[PotentialTransportLine] = field(default_factory=list)
+    teleport: Optional[Tuple[Building, Building]] = None
+    # ActionPlanner.network_changes when the tubes were last validated
+    validated_at: int = 0
 
-    # Mark the current building as visited
-    visited.add(start_building.id)
 
-    for neighbor in BUILDINGS.get_neighbors(
-        building_id=start_building.id,
-        N=N,
-        building_types=building_types,
-    ):
+class ActionPlanner:
+    """
+    Spends the month's resources in one pass over every candidate action
+
+    Candidates are pods out and back between a landing pad and nearby modules
+    of its astronauts' types (with a new tube if needed), pods on the longest
+    routes over the existing tubes, and teleporters from a landing pad to the
+    nearest module of each of its types. A candidate is worth the points of
+    the astronauts it carries that no pod or teleporter carries yet.
+
+    Pods carrying nobody are only destroyed to pay for a candidate that
+    can't be afforded otherwise: they lose no points, but they are only
+    worth their refund when something better needs it.
+
+    The pick is a greedy knapsack on points per resource, repaired as it
+    goes: the best candidate is rebuilt against what's already picked (tubes
+    re-validated, upgrades added for full tubes, astronauts already carried
+    left out) and only taken if it still beats the next one's last known
+    ratio, otherwise it goes back in the heap with its new ratio.
+    """
 
-        if neighbor.id in visited:
-            continue
+    def __init__(self, remaining_resources: float):
+        self.remaining_resources = remaining_resources
+        self.actions: List[Action] = []
+        # (landing pad id, astronaut type) already carried somewhere
+        self.served: Set[Tuple[int, int]] = set()
+        # module id: astronauts reaching it each month
+        self.arrivals: Dict[int, int] = defaultdict(int)
+        # edge_key: pods running on the tube, and the tube's capacity
+        self.edge_pods: Dict[int, int] = defaultdict(int)
+        self.edge_capacity: Dict[int, int] = {}
+        self.teleporter_ends: Set[int] = set()
+        self.next_pod_id = max(PODS, default=0) + 1
+        # pods carrying nobody, destroyed in this order when a pick needs the refund
+        self.idle_pods: List[Pod] = []
+        # lines picked so far, tubes are only validated again once it moves
+        self.network_changes = 0
+
+        for line in TRANSPORT_LINES.values():
+            if isinstance(line, Teleporter):
+                self.teleporter_ends.update((line.building_1.id, line.building_2.id))
+                self._points(teleporter_flows(line.building_1, line.building_2), serve=True)
+            else:
+                self.edge_capacity[line.edge_key] = line.capacity
+        for pod in PODS.values():
+            for key in pod_edges(pod.path):
+                self.edge_pods[key] += 1
+            flows = route_flows(pod.path)
+            if flows:
+                self._points(flows, serve=True)
+            else:
+                self.idle_pods.append(pod)
 
-        # Create a path between start_building and neighbor
-        path = PotentialTransportLine(building_1=start_building, building_2=neighbor)
+    @property
+    def spendable_resources(self) -> float:
+        """Resources left, idle pods' refunds included"""
+        return self.remaining_resources + POD_REFUND * len(self.idle_pods)
+
+    def candidates(self, limit_types: List[int]) -> List[PlanCandidate]:
+        candidates = []
+        for pad in BUILDINGS.get_buildings_as_list(filter_type=0):
+            counts = Counter(pad.astronaut_types)
+            if not counts:
+                continue
 
-        if not path.is_valid():
-            continue
+            for module in BUILDINGS.get_candidate_neighbors(
+                building_id=pad.id, N=5, building_types=list(counts)
+            ):
+                line = TRANSPORT_LINES.get_line_between(pad.id, module.id)
+                if isinstance(line, Teleporter):
+                    continue
+                tubes = []
+                if line is None:
+                    pot_line = PotentialTransportLine.create_valid_transport_line(
+                        building_1=pad,
+                        building_2=module,
+                        remaining_resources=self.spendable_resources - POD_COST,
+                        limit_types=limit_types,
+                    )
+                    if not pot_line:
+                        continue
+                    tubes.append(pot_line)
+                path = [pad.id, module.id, pad.id]
+                candidates.append(
+                    PlanCandidate(flows=route_flows(path), path=path, tubes=tubes)
+                )
 
-        add_potential_path_to_transport_lines(path=path)
+            if pad.id in self.teleporter_ends:
+                continue
+            taken = [BUILDINGS.buildings[b] for b in self.teleporter_ends]
+            for astronaut_type in counts:
+                for module in BUILDINGS.get_neighbors(
+                    building_id=pad.id,
+                    N=1,
+                    building_types=[astronaut_type],
+                    exclude_list=taken,
+                ):
+                    candidates.append(
+                        PlanCandidate(
+                            flows=teleporter_flows(pad, module), teleport=(pad, module)
+                        )
+                    )
+
+        # pods can't ride teleporters
+        tube_adjacency: Dict[int, Dict[int, Building]] = defaultdict(dict)
+        for line in TRANSPORT_LINES.values():
+            if not isinstance(line, Teleporter):
+                tube_adjacency[line.building_1.id][line.building_2.id] = line.building_2
+                tube_adjacency[line.building_2.id][line.building_1.id] = line.building_1
+        for route in itertools.islice(
+            generate_routes(adjacency_list=tube_adjacency), PLAN_ROUTE_CANDIDATES
+        ):
+            path = [b.id for b in route]
+            flows = route_flows(path)
+            if flows:
+                candidates.append(PlanCandidate(flows=flows, path=path))
+
+        return candidates
+
+    def plan(self, candidates: List[PlanCandidate]) -> List[Action]:
+        heap = []
+        for i, candidate in enumerate(candidates):
+            evaluated = self._evaluate(candidate)
+            if evaluated is not None:
+                heap.append((-evaluated[0], i, candidate))
+        heapq.heapify(heap)
+
+        while heap:
+            _, i, candidate = heapq.heappop(heap)
+            evaluated = self._evaluate(candidate)
+            if evaluated is None:
+                continue
+            ratio, actions = evaluated
+            if heap and ratio < -heap[0][0]:
+                heapq.heappush(heap, (-ratio, i, candidate))
+                continue
+            self._take(candidate, actions)
 
-        # Update the spending limit and path
-        current_path.append(path)
+        debug(f"planned {len(self.actions)} actions, {self.remaining_resources} left")
+        return self.actions
 
-        remaining_depth = remaining_depth - 1
-        if remaining_depth < 1:
-            return (
-                current_path  # If no more budget, stop here and return the current path
-            )
+    def _points(self, flows: List[Flow], serve: bool = False) -> int:
+        points = 0
+        seen = set()
+        extra_arrivals: Dict[int, int] = defaultdict(int)
+        for pad_id, module_id, astronaut_type, count, days in flows:
+            if (pad_id, astronaut_type) in self.served or (pad_id, astronaut_type) in seen:
+                continue
+            seen.add((pad_id, astronaut_type))
+            arrivals = self.arrivals.get(module_id, 0) + extra_arrivals[module_id]
+            points += astronaut_points(arrivals, count, days)
+            extra_arrivals[module_id] += count
+        if serve:
+            self.served.update(seen)
+            for module_id, count in extra_arrivals.items():
+                self.arrivals[module_id] += count
+        return points
+
+    def _evaluate(
+        self, candidate: PlanCandidate
+    ) -> Optional[Tuple[float, List[Action]]]:
+        """Points per resource and actions of the candidate, None once it's out"""
+        actions = self._build_actions(candidate)
+        if actions is None:
+            return None
+        cost = sum(action.calc_cost() for action in actions)
+        points = self._points(candidate.flows)
+        if points <= 0 or cost > self.spendable_resources:
+            return None
+        return points / cost, actions
 
-        # Recurse into the next neighbor with the updated spending limit
-        traverse_buildings(
-            start_building=neighbor,
-            remaining_depth=remaining_depth,
-            visited=visited,
-            current_path=current_path,
-        )
+    def _build_actions(self, candidate: PlanCandidate) -> Optional[List[Action]]:
+        """The candidate's actions given what's picked so far"""
+        if candidate.teleport is not None:
+            entrance, exit = candidate.teleport
+            if {entrance.id, exit.id} & self.teleporter_ends:
+                return None
+            return [ActionTeleport(building_1=entrance, building_2=exit)]
 
-    return current_path
+        actions: List[Action] = []
+        new_edges = set()
+        if candidate.validated_at != self.network_changes:
+            if not all(self._still_valid(tube) for tube in candidate.tubes):
+                return None
+            candidate.validated_at = self.network_changes
+        for tube in candidate.tubes:
+            actions.append(ActionTube(transport_line=tube))
+            new_edges.add(tube.edge_key)
+        for key in pod_edges(candidate.path):
+            if key in new_edges:
+                continue
+            capacity = self.edge_capacity.get(key)
+            if capacity is None:
+                return None
+            if self.edge_pods[key] >= capacity:
+                line = TRANSPORT_LINES.get_line_between(*split_edge_key(key))
+                actions.append(
+                    ActionUpgrade(
+                        transport_line=TransportLine(
+                            building_1=line.building_1,
+                            building_2=line.building_2,
+                            capacity=capacity,
+                        )
+                    )
+                )
+        pod = Pod(
+            id=self.next_pod_id, num_stops=len(candidate.path), path=candidate.path
+        )
+        actions.append(ActionPod(pod=pod))
+        return actions
 
+    @staticmethod
+    def _still_valid(tube: PotentialTransportLine) -> bool:
+        """
+        is_valid for a tube that was valid earlier this turn, buildings don't
+        move so it can't have come to pass through one
+        """
+        return not (
+            tube._does_it_already_exist()
+            or tube._buildings_have_too_many_connections()
+            or tube._does_it_intersect()
+        )
 
-TRANSPORT_LINES: Dict[str, TransportLine] = {}
+    def _take(self, candidate: PlanCandidate, actions: List[Action]):
+        destroys = []
+        cost = sum(action.calc_cost() for action in actions)
+        while cost > self.remaining_resources + POD_REFUND * len(destroys):
+            destroys.append(ActionDestroy(pod=self.idle_pods.pop(0)))
+        actions = destroys + actions
+        for action in actions:
+            self.remaining_resources -= action.calc_cost()
+            if isinstance(action, ActionTube):
+                TRANSPORT_LINES.add(action.transport_line)
+                self.edge_capacity[action.transport_line.edge_key] = 1
+                self.network_changes += 1
+            elif isinstance(action, ActionUpgrade):
+                self.edge_capacity[action.transport_line.edge_key] += 1
+            elif isinstance(action, ActionTeleport):
+                TRANSPORT_LINES.add(
+                    Teleporter(building_1=action.building_1, building_2=action.building_2)
+                )
+                self.teleporter_ends.update((action.building_1.id, action.building_2.id))
+                self.network_changes += 1
+            elif isinstance(action, ActionPod):
+                for key in pod_edges(action.pod.path):
+                    self.edge_pods[key] += 1
+                PODS[action.pod.id] = action.pod
+                self.next_pod_id += 1
+            elif isinstance(action, ActionDestroy):
+                for key in pod_edges(action.pod.path):
+                    self.edge_pods[key] -= 1
+                del PODS[action.pod.id]
+        self.actions.extend(actions)
+        self._points(candidate.flows, serve=True)
+
+
+TRANSPORT_LINES = TransportNetwork()
 PODS: Dict[int, Pod] = {}
 BUILDINGS = BuildingDistanceMatrix()
 
@@ -965,7 +1672,7 @@ BUILDINGS = BuildingDistanceMatrix()
 while True:
 
     # Reset transport lines and pods
-    TRANSPORT_LINES = {}
+    TRANSPORT_LINES = TransportNetwork()
     PODS = {}
 
     resources = int(input())
@@ -1014,8 +1721,7 @@ while True:
                 )
             )
 
-    for new_building in new_buildings:
-        BUILDINGS.add_building(new_building=new_building)
+    BUILDINGS.add_buildings(new_buildings=new_buildings)
 
     # debug(json.dumps(BUILDINGS.buildings, default=str, indent=2))
     # raise
@@ -1045,7 +1751,7 @@ while True:
                 )
                 transport_lines.append(transport_line)
             if not transport_line.id in TRANSPORT_LINES.keys():
-                TRANSPORT_LINES[transport_line.id] = transport_line
+                TRANSPORT_LINES.add(transport_line)
         # debug(TRANSPORT_LINES)
 
     limit_types = []
@@ -1081,345 +1787,13 @@ while True:
 
     remaining_resources = program_inputs.num_resources
     debug(f"Remaining resources: {remaining_resources}")
-    actions: List[Action] = []
-    building_landing_pads = BUILDINGS.get_buildings_as_list(filter_type=0)
-    # debug(json.dumps(TRANSPORT_LINES, default=str, indent=1))
-
-    building_adjacency_list = TransportLine.build_adjacency_list()
-
-    ############
-    # POD MANAGEMENT
-    ############
-
-    debug("CREATING PODS....")
-    debug(f"Current # of pods: {len(PODS)}")
-
-    max_pods_created_per_turn = 2
-    created_pods = 0
-    if True and POD_COST <= remaining_resources and len(TRANSPORT_LINES.values()):
-        debug("In creating pods section...")
-
-        paths = find_paths(
-            transport_lines=list(TRANSPORT_LINES.values()),
-            adjacency_list=building_adjacency_list,
-            mirror=True,
-        )
-
-        def sort_by_unique_items(list_of_lists):
-            """
-            Sorts a list of lists by the number of unique items in each sublist.
-
-            :param list_of_lists: List of lists to be sorted.
-            :return: A sorted list of lists based on the number of unique items in each sublist.
-            """
-            return sorted(
-                list_of_lists,
-                key=lambda sublist: len(set([b.id for b in sublist])),
-                reverse=True,
-            )
-
-        paths = sort_by_unique_items(paths)
-
-        # debug("paths....")
-        # debug(json.dumps(paths, default=str, indent=1))
-        # raise
-
-        desired_path_length = max(2, len(set([b.id for b in paths[0]])))
-        debug(f"desired_path_length: {desired_path_length}")
-
-        for path in paths:
-            path_ids = [b.id for b in path]
-            if len(set(path_ids)) < desired_path_length:
-                # debug("path too short, continuing....")
-                break
-            debug(f"evaluating path {str(path_ids)}")
-            if remaining_resources <= POD_COST:
-                pod = Pod(
-                    id=len(PODS) + 1,
-                    num_stops=len(path_ids),
-                    path=path_ids,
-                )
-                debug(f"Creating pod: {pod}")
-                actions.append(ActionPod(pod=pod))
-                PODS[pod.id] = pod
-                remaining_resources = remaining_resources - POD_COST
-                created_pods += 1
-            else:
-                debug("Too expensive to create pod...")
-                break
-
-            if remaining_resources <= POD_COST:
-                debug("remaining resources <= POD_COST, breaking...")
-                break
-
-            if created_pods > max_pods_created_per_turn:
-                debug("too many pods created this turn, breaking...")
-                break
-
-    debug("/CREATING PODS....")
 
     ############
-    # TUBE MANAGEMENT
+    # ACTION PLANNING
     ############
 
-    max_lines_created_per_turn = 10
-    created_lines = 0
-
-    # Start with landing pads
-    # building_landing_pads = [
-    #     b
-    #     for b in building_landing_pads
-    #     if b.transport_line_count < MAX_TRANSPORT_LINE_COUNT
-    # ]
-
-    # TODO I want to sort them by something?
-    # TODO I want to filter them by something?
-    pods_to_build = []
-    building_landing_pad = building_landing_pads[0]
-    for building_landing_pad in [building_landing_pad]:
-        debug(building_landing_pads)
-        # raise
-        neighbor_filters = list(set(building_landing_pad.astronaut_types))
-        # TODO I might want to add some better logic in here for better filters
-
-        for neighbor in BUILDINGS.get_neighbors(
-            building_id=building_landing_pad.id, N=1, building_types=neighbor_filters
-        ):
-            path = PotentialTransportLine(
-                building_1=building_landing_pad, building_2=neighbor
-            )
-            if not path.is_valid():
-                continue
-
-            add_potential_path_to_transport_lines(path=path)
-
-            paths = [path]
-
-            # raise
-            paths.extend(
-                traverse_buildings(
-                    start_building=neighbor,
-                )
-            )
-            debug(json.dumps(paths, indent=2, default=str))
-            pods_to_build.append(paths)
-
-            for pot_line in paths:
-                actions.append(ActionTube(transport_line=pot_line))
-                remaining_resources = remaining_resources - pot_line.build_cost
-                if pot_line.id not in TRANSPORT_LINES:
-                    TRANSPORT_LINES[pot_line.id] = pot_line
-                created_lines += 1
-
-                if remaining_resources <= POD_COST:
-                    debug("remaining resources <= POD_COST, breaking...")
-                    break
-
-                if created_lines >= max_lines_created_per_turn:
-                    debug("too many lines created")
-                    break
-
-            if remaining_resources <= POD_COST:
-                debug("remaining resources <= POD_COST, breaking...")
-                break
-
-            if created_lines >= max_lines_created_per_turn:
-                debug("too many lines created")
-                break
-
-        debug(actions)
-
-        
-
-    debug("CREATING TUBES BETWEEN BUILDINGS....")
-    debug(f"Current # of transport lines: {len(TRANSPORT_LINES.values())}")
-    building_type_filters = [e for e in list(range(0, 19)) if e > 0]
-    building_type_filters = subtract_arrays(building_type_filters, limit_types)
-    if False or new_buildings:
-        is_first_round = len(TRANSPORT_LINES.values()) == 0
-        max_lines_created_per_turn = 10
-        created_lines = 0
-
-        building_landing_pads = [
-            b
-            for b in building_landing_pads
-            if b.transport_line_count < MAX_TRANSPORT_LINE_COUNT
-        ]
-        # debug("building_landing_pads/!")
-        # debug(json.dumps(building_landing_pads,default=str,indent=1))
-
-        for building_landing_pad in random.sample(
-            building_landing_pads, min(len(building_landing_pads), 20)
-        ):
-            # debug("list(set(building_landing_pad.astronaut_types))")
-            # debug(list(set(building_landing_pad.astronaut_types)))
-
-            if is_first_round:
-                building_type_filters = list(set(building_landing_pad.astronaut_types))
-
-            nearest_buildings = BUILDINGS.get_neighbors(
-                building_id=building_landing_pad.id,
-                N=5,
-                building_types=building_type_filters,
-            )
-
-            for nearest_building in nearest_buildings:
-                # debug(json.dumps(nearest_buildings, default=str, indent=2))
-                pot_line = PotentialTransportLine.create_valid_transport_line(
-                    building_1=building_landing_pad,
-                    building_2=nearest_building,
-                    remaining_resources=remaining_resources,
-                    limit_types=limit_types,
-                )
-                if pot_line:
-                    actions.append(ActionTube(transport_line=pot_line))
-                    remaining_resources = remaining_resources - pot_line.build_cost
-                    TRANSPORT_LINES[pot_line.id] = pot_line
-                    created_lines += 1
-
-                if remaining_resources <= POD_COST:
-                    debug("remaining resources <= POD_COST, breaking...")
-                    break
-
-                if created_lines >= max_lines_created_per_turn:
-                    debug("too many lines created")
-                    break
-
-    debug("/CREATING TUBES BETWEEN BUILDINGS....")
-    debug("EXTENDING TUBES BETWEEN BUILDINGS....")
-
-    debug(f"Current # of transport lines: {len(TRANSPORT_LINES.values())}")
-    debug(f"remaining_resources: {remaining_resources}")
-
-    max_lines_extended_per_turn = 10
-    extended_lines = 0
-
-    # building_adjacency_list = TransportLine.build_adjacency_list()
-
-    # if len(TRANSPORT_LINES.values()) and remaining_resources <= POD_COST:
-    if False and len(TRANSPORT_LINES.values()):
-        # copy_transport_lines = deepcopy(list(TRANSPORT_LINES.values()))
-
-        # if limit_types:
-        #     copy_transport_lines = [
-        #         tl
-        #         for tl in copy_transport_lines
-        #         if tl.building_1.type not in limit_types
-        #         and tl.building_2.type not in limit_types
-        #     ]
-
-        # for transport_line in random.sample(
-        #     copy_transport_lines, min(len(copy_transport_lines), 100)
-        # ):
-        for (
-            transport_line
-        ) in TransportLine.get_transport_lines_prioritized_least_connecions():
-            building_1 = transport_line.building_1
-            building_2 = transport_line.building_2
-
-            if building_1.type == 0 and building_2.type == 0:
-                continue
-
-            if (
-                building_1.transport_line_count > MAX_TRANSPORT_LINE_COUNT
-                or building_2.transport_line_count > MAX_TRANSPORT_LINE_COUNT
-            ):
-                continue
-
-            debug(f"Trying to extend line {str(transport_line)}")
-
-            debug("looking to extend lines for building_2")
-
-            building_2_types_to_filter = None
-            if len(limit_types):
-                building_2_types_to_filter = subtract_arrays(
-                    connected_types.keys(), limit_types
-                )
-
-            if building_2.type == 0:
-                building_2_types_to_filter = [0]
-
-            debug("building_2_types_to_filter")
-            debug(building_2_types_to_filter)
-
-            building_2_neighbors = BUILDINGS.get_neighbors(
-                building_id=building_2.id,
-                N=1 if building_2.type == 0 else 2,
-                building_types=building_2_types_to_filter,
-                exclude_list=TransportLine.get_connected_buildings(
-                    building_id=building_2.id,
-                    adjacency_list=building_adjacency_list,
-                ),
-            )
-
-            for building_2_neighbor in building_2_neighbors:
-                debug(f"building 2 has a neighbor: {building_2_neighbor.id}")
-
-                pot_line = PotentialTransportLine.create_valid_transport_line(
-                    building_1=building_2,
-                    building_2=building_2_neighbor,
-                    remaining_resources=remaining_resources,
-                    limit_types=limit_types,
-                )
-                if pot_line:
-                    debug(pot_line)
-                    actions.append(ActionTube(transport_line=pot_line))
-                    remaining_resources = remaining_resources - pot_line.build_cost
-                    TRANSPORT_LINES[pot_line.id] = pot_line
-                    extended_lines += 1
-                    building_adjacency_list = TransportLine.build_adjacency_list()
-
-            # if remaining_resources <= POD_COST:
-            #     debug("remaining resources <= POD_COST, breaking...")
-            #     break
-
-            debug("looking to extend lines for building_1")
-            building_1_types_to_filter = None
-            if len(limit_types):
-                building_1_types_to_filter = subtract_arrays(
-                    connected_types.keys(), limit_types
-                )
-
-            if building_1.type == 0:
-                building_1_types_to_filter = [0]
-
-            debug("building_1_types_to_filter")
-            debug(building_1_types_to_filter)
-
-            building_1_neighbors = BUILDINGS.get_neighbors(
-                building_id=building_1.id,
-                N=1 if building_1.type == 0 else 2,
-                building_types=building_1_types_to_filter,
-                exclude_list=TransportLine.get_connected_buildings(
-                    building_id=building_1.id,
-                    adjacency_list=building_adjacency_list,
-                ),
-            )
-
-            for building_1_neighbor in building_1_neighbors:
-                debug(f"building 1 has a neighbor: {building_1_neighbor.id}")
-                pot_line = PotentialTransportLine.create_valid_transport_line(
-                    building_1=building_1,
-                    building_2=building_1_neighbor,
-                    remaining_resources=remaining_resources,
-                    limit_types=limit_types,
-                )
-                if pot_line:
-                    actions.append(ActionTube(transport_line=pot_line))
-                    remaining_resources = remaining_resources - pot_line.build_cost
-                    TRANSPORT_LINES[pot_line.id] = pot_line
-                    extended_lines += 1
-                    building_adjacency_list = TransportLine.build_adjacency_list()
-
-            # if remaining_resources <= POD_COST:
-            #     debug("remaining resources <= POD_COST, breaking...")
-            #     break
-
-            if extended_lines >= max_lines_extended_per_turn:
-                debug("too many lines extended")
-                break
-
-        debug("/EXTENDING TUBES BETWEEN BUILDINGS....")
+    planner = ActionPlanner(remaining_resources=remaining_resources)
+    actions: List[Action] = planner.plan(planner.candidates(limit_types=limit_types))
 
     if not actions:
         actions.append(ActionWait())
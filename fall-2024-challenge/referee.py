@@ -0,0 +1,641 @@
+"""
+Local referee for https://www.codingame.com/ide/challenge/fall-challenge-2024 (Selenia City)
+
+Plays seeded games of the monthly cycle with the same text protocol as the
+platform, so a bot's turn plans can be scored offline:
+
+    python referee.py main2.py --games 10 --seed 1
+
+General methodology is:
+- Each seed generates a city: landing pads with a group of astronauts each,
+  lunar modules of a few types, and more buildings arriving over the months
+- Every month the bot gets the usual input and answers with its actions,
+  which are applied in order; invalid or unaffordable ones are skipped
+- Then the month's days are simulated:
+  - Pods leave from the first stop of their path and move one stop a day,
+    looping over the path, with room for POD_CAPACITY astronauts
+  - Astronauts head for the nearest module of their type, counting pod
+    hops as a day and teleporters as free, and board a pod when its next
+    stop brings them closer
+  - An astronaut arriving scores speed points, 50 less a point per day,
+    and balance points, 50 less one per astronaut who already arrived in
+    that module this month
+  - Astronauts still travelling at the end of the month are lost
+- Points scored are added to the resources, which also earn 10% interest at
+  the start of every month
+- Bots run in-process (in a thread, with `input`/`print` swapped out) or as
+  subprocesses, with `random` seeded from the game's seed either way
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+WIDTH = 160
+HEIGHT = 90
+MONTHS = 20
+DAYS_PER_MONTH = 20
+INTEREST_RATE = 0.1
+MAX_TUBES_PER_BUILDING = 5
+POD_CAPACITY = 10
+POD_COST = 1000
+POD_REFUND = 750
+TELEPORT_COST = 5000
+SPEED_POINTS = 50
+BALANCE_POINTS = 50
+
+# Generous, we're measuring plans here rather than the platform's limits
+TURN_TIMEOUT = 2.0
+
+
+################
+# GEOMETRY
+################
+
+
+def orientation(p1: Tuple[int, int], p2: Tuple[int, int], p3: Tuple[int, int]) -> int:
+    prod = (p3[1] - p1[1]) * (p2[0] - p1[0]) - (p2[1] - p1[1]) * (p3[0] - p1[0])
+    return (prod > 0) - (prod < 0)
+
+
+def segments_cross(a, b, c, d) -> bool:
+    """Whether segments ab and cd cross, touching ends don't count"""
+    return (
+        orientation(a, b, c) * orientation(a, b, d) < 0
+        and orientation(c, d, a) * orientation(c, d, b) < 0
+    )
+
+
+def point_on_segment(p, a, b) -> bool:
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    px, py = p[0] - a[0], p[1] - a[1]
+    if dx * py - dy * px != 0:
+        return False
+    return 0 <= dx * px + dy * py <= dx * dx + dy * dy
+
+
+################
+# CITY
+################
+
+
+@dataclass
+class Building:
+    id: int
+    type: int
+    x: int
+    y: int
+    # landing pads only, the types of the astronauts landing every month
+    astronauts: List[int] = field(default_factory=list)
+
+    @property
+    def coordinates(self) -> Tuple[int, int]:
+        return self.x, self.y
+
+    def input_line(self) -> str:
+        if self.type == 0:
+            values = [0, self.id, self.x, self.y, len(self.astronauts)] + self.astronauts
+        else:
+            values = [self.type, self.id, self.x, self.y]
+        return " ".join(str(v) for v in values)
+
+
+def tube_key(building_id_1: int, building_id_2: int) -> Tuple[int, int]:
+    return min(building_id_1, building_id_2), max(building_id_1, building_id_2)
+
+
+def pod_hops(path: List[int]) -> List[Tuple[int, int]]:
+    """The moves a pod makes going once round its path"""
+    stops = path[:-1] if path[0] == path[-1] else path
+    return [(stops[i], stops[(i + 1) % len(stops)]) for i in range(len(stops))]
+
+
+class ActionError(Exception):
+    pass
+
+
+class City:
+    """Everything built so far, and the rules for building more"""
+
+    def __init__(self, resources: int):
+        self.resources = resources
+        self.score = 0
+        self.buildings: Dict[int, Building] = {}
+        # (lower id, higher id): capacity
+        self.tubes: Dict[Tuple[int, int], int] = {}
+        self.tube_counts: Dict[int, int] = defaultdict(int)
+        # entrance: exit
+        self.teleporters: Dict[int, int] = {}
+        self.pods: Dict[int, List[int]] = {}
+
+    def add_buildings(self, buildings: List[Building]):
+        for building in buildings:
+            self.buildings[building.id] = building
+
+    def tube_cost(self, building_id_1: int, building_id_2: int) -> int:
+        a, b = self.buildings[building_id_1], self.buildings[building_id_2]
+        return int(math.dist(a.coordinates, b.coordinates) * 10)
+
+    def _pods_using(self, key: Tuple[int, int]) -> int:
+        return sum(
+            any(tube_key(*hop) == key for hop in pod_hops(path))
+            for path in self.pods.values()
+        )
+
+    def _spend(self, cost: int):
+        if cost > self.resources:
+            raise ActionError("costs {}, {} left".format(cost, self.resources))
+        self.resources -= cost
+
+    def _building(self, building_id: int) -> Building:
+        if building_id not in self.buildings:
+            raise ActionError("no building {}".format(building_id))
+        return self.buildings[building_id]
+
+    def apply(self, action: str):
+        """Carries out one action, ActionError if it isn't allowed"""
+        words = action.split()
+        if not words:
+            raise ActionError("empty action")
+        name, args = words[0], words[1:]
+        try:
+            values = [int(v) for v in args]
+        except ValueError:
+            raise ActionError("non-integer argument")
+
+        if name == "WAIT":
+            return
+        if name == "TUBE" and len(values) == 2:
+            self._tube(*values)
+        elif name == "UPGRADE" and len(values) == 2:
+            self._upgrade(*values)
+        elif name == "TELEPORT" and len(values) == 2:
+            self._teleport(*values)
+        elif name == "POD" and len(values) >= 3:
+            self._pod(values[0], values[1:])
+        elif name == "DESTROY" and len(values) == 1:
+            self._destroy(values[0])
+        else:
+            raise ActionError("unknown action")
+
+    def _tube(self, building_id_1: int, building_id_2: int):
+        a, b = self._building(building_id_1), self._building(building_id_2)
+        key = tube_key(a.id, b.id)
+        if a.id == b.id or key in self.tubes:
+            raise ActionError("tube {} already exists".format(key))
+        if max(self.tube_counts[a.id], self.tube_counts[b.id]) >= MAX_TUBES_PER_BUILDING:
+            raise ActionError("too many tubes")
+        for other in self.buildings.values():
+            if other.id not in key and point_on_segment(other.coordinates, a.coordinates, b.coordinates):
+                raise ActionError("tube passes through building {}".format(other.id))
+        for c_id, d_id in self.tubes:
+            c, d = self.buildings[c_id], self.buildings[d_id]
+            if segments_cross(a.coordinates, b.coordinates, c.coordinates, d.coordinates):
+                raise ActionError("tube crosses {}".format((c_id, d_id)))
+        self._spend(self.tube_cost(a.id, b.id))
+        self.tubes[key] = 1
+        self.tube_counts[a.id] += 1
+        self.tube_counts[b.id] += 1
+
+    def _upgrade(self, building_id_1: int, building_id_2: int):
+        key = tube_key(building_id_1, building_id_2)
+        if key not in self.tubes:
+            raise ActionError("no tube {}".format(key))
+        self._spend(self.tube_cost(*key) * (self.tubes[key] + 1))
+        self.tubes[key] += 1
+
+    def _teleport(self, entrance: int, exit: int):
+        self._building(entrance), self._building(exit)
+        ends = set(self.teleporters) | set(self.teleporters.values())
+        if entrance == exit or entrance in ends or exit in ends:
+            raise ActionError("building already has a teleporter")
+        self._spend(TELEPORT_COST)
+        self.teleporters[entrance] = exit
+
+    def _pod(self, pod_id: int, path: List[int]):
+        if pod_id in self.pods:
+            raise ActionError("pod {} already exists".format(pod_id))
+        hops = pod_hops(path)
+        for hop in hops:
+            key = tube_key(*hop)
+            if key not in self.tubes:
+                raise ActionError("no tube for hop {}".format(hop))
+            if self._pods_using(key) >= self.tubes[key]:
+                raise ActionError("tube {} is full".format(key))
+        self._spend(POD_COST)
+        self.pods[pod_id] = path
+
+    def _destroy(self, pod_id: int):
+        if self.pods.pop(pod_id, None) is None:
+            raise ActionError("no pod {}".format(pod_id))
+        self.resources += POD_REFUND
+
+    def input_lines(self, new_buildings: List[Building]) -> List[str]:
+        lines = [str(self.resources)]
+        routes = ["{} {} {}".format(a, b, capacity) for (a, b), capacity in self.tubes.items()]
+        routes += ["{} {} 0".format(a, b) for a, b in self.teleporters.items()]
+        lines += [str(len(routes))] + routes
+        lines.append(str(len(self.pods)))
+        lines += [
+            " ".join(str(v) for v in [pod_id, len(path)] + path)
+            for pod_id, path in self.pods.items()
+        ]
+        lines.append(str(len(new_buildings)))
+        lines += [building.input_line() for building in new_buildings]
+        return lines
+
+    ################
+    # SIMULATION
+    ################
+
+    def _days_to_type(self, module_type: int) -> Dict[int, int]:
+        """Fewest days from each building to a module of the type"""
+        reverse: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        for path in self.pods.values():
+            for a, b in pod_hops(path):
+                reverse[b].append((a, 1))
+        for entrance, exit in self.teleporters.items():
+            reverse[exit].append((entrance, 0))
+
+        days = {b.id: 0 for b in self.buildings.values() if b.type == module_type}
+        todo = deque(days)
+        while todo:
+            building_id = todo.popleft()
+            for previous, cost in reverse[building_id]:
+                candidate = days[building_id] + cost
+                if candidate < days.get(previous, candidate + 1):
+                    days[previous] = candidate
+                    if cost:
+                        todo.append(previous)
+                    else:
+                        todo.appendleft(previous)
+        return days
+
+    def simulate_month(self) -> int:
+        """Moves the month's astronauts, returns the points they scored"""
+        astronaut_types = {t for b in self.buildings.values() for t in b.astronauts}
+        days_to = {t: self._days_to_type(t) for t in astronaut_types}
+        arrivals: Dict[int, int] = defaultdict(int)
+        points = 0
+
+        # [building id, type] of every astronaut still on the way
+        travelling: List[List[int]] = []
+
+        def settle(astronaut: List[int], day: int) -> bool:
+            """Teleports and scores the astronaut, True once it has arrived"""
+            nonlocal points
+            position, astronaut_type = astronaut
+            days = days_to[astronaut_type]
+            seen = {position}
+            while position in self.teleporters:
+                exit = self.teleporters[position]
+                if exit in seen or days.get(exit) != days.get(position):
+                    break
+                position = exit
+                seen.add(position)
+            astronaut[0] = position
+            if self.buildings[position].type != astronaut_type:
+                return False
+            points += max(0, SPEED_POINTS - day)
+            points += max(0, BALANCE_POINTS - arrivals[position])
+            arrivals[position] += 1
+            return True
+
+        for building in self.buildings.values():
+            for astronaut_type in building.astronauts:
+                astronaut = [building.id, astronaut_type]
+                if building.id in days_to[astronaut_type] and not settle(astronaut, 0):
+                    travelling.append(astronaut)
+
+        pods = [(pod_hops(path), [0]) for _, path in sorted(self.pods.items())]
+        for day in range(1, DAYS_PER_MONTH + 1):
+            if not travelling:
+                break
+            waiting: Dict[int, List[List[int]]] = defaultdict(list)
+            for astronaut in travelling:
+                waiting[astronaut[0]].append(astronaut)
+
+            arrived = set()
+            for hops, position in pods:
+                here, there = hops[position[0] % len(hops)]
+                position[0] += 1
+                queue_here, boarding = waiting.get(here, []), []
+                for astronaut in queue_here:
+                    days = days_to[astronaut[1]]
+                    if days.get(there, -1) == days[here] - 1:
+                        boarding.append(astronaut)
+                        if len(boarding) == POD_CAPACITY:
+                            break
+                for astronaut in boarding:
+                    queue_here.remove(astronaut)
+                    astronaut[0] = there
+                    if settle(astronaut, day):
+                        arrived.add(id(astronaut))
+            travelling = [a for a in travelling if id(a) not in arrived]
+
+        return points
+
+    def end_month(self) -> int:
+        points = self.simulate_month()
+        self.resources += points
+        self.score += points
+        return points
+
+
+################
+# MAPS
+################
+
+
+def generate_city(rng: random.Random) -> Tuple[int, List[List[Building]]]:
+    """Starting resources, and the buildings arriving each month"""
+    nb_types = rng.randint(2, 6)
+    taken = set()
+    next_id = 0
+
+    def place(building_type: int, astronauts: List[int] = ()) -> Building:
+        nonlocal next_id
+        while True:
+            x, y = rng.randint(0, WIDTH), rng.randint(0, HEIGHT)
+            if (x, y) not in taken:
+                break
+        taken.add((x, y))
+        building = Building(id=next_id, type=building_type, x=x, y=y, astronauts=list(astronauts))
+        next_id += 1
+        return building
+
+    def pad() -> Building:
+        types = rng.sample(range(1, nb_types + 1), rng.randint(1, min(3, nb_types)))
+        return place(0, [rng.choice(types) for _ in range(rng.randint(5, 30))])
+
+    months: List[List[Building]] = [[] for _ in range(MONTHS)]
+    months[0] = [place(t) for t in range(1, nb_types + 1)]
+    months[0] += [place(rng.randint(1, nb_types)) for _ in range(rng.randint(2, 8))]
+    months[0] += [pad() for _ in range(rng.randint(1, 4))]
+    for month in range(1, MONTHS):
+        if rng.random() < 0.4:
+            months[month] = [pad()] + [
+                place(rng.randint(1, nb_types)) for _ in range(rng.randint(1, 4))
+            ]
+    return rng.randint(2000, 12000), months
+
+
+################
+# BOTS
+################
+
+
+class BotCrashed(Exception):
+    pass
+
+
+class _GameOver(BaseException):
+    """Unwinds an in-process bot's game loop, which never returns by itself"""
+
+
+class InProcessBot:
+    """
+    Runs a bot script in a thread of this process
+
+    The scripts read stdin with `input()` and answer with `print()` at module
+    level, so both names are shadowed in the module's namespace before it runs.
+    """
+
+    def __init__(self, path: str, seed: int):
+        self.inputs: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.outputs: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.error: Optional[BaseException] = None
+        spec = importlib.util.spec_from_file_location("selenia_bot", path)
+        self.module = importlib.util.module_from_spec(spec)
+        # dataclasses look their module up while it runs
+        sys.modules[spec.name] = self.module
+        self.module.input = self._input
+        self.module.print = self._print
+        # one game at a time per process, so the shared generator is ours
+        random.seed(seed)
+        self.thread = threading.Thread(target=self._run, args=(spec.loader,), daemon=True)
+        self.thread.start()
+
+    def _run(self, loader):
+        try:
+            loader.exec_module(self.module)
+        except _GameOver:
+            pass
+        except BaseException as exc:  # noqa
+            self.error = exc
+            self.outputs.put(None)
+
+    def _input(self, prompt: str = "") -> str:
+        line = self.inputs.get()
+        if line is None:
+            raise _GameOver()
+        return line
+
+    def _print(self, *args, file=None, **kwargs):
+        if file is not None and file is not sys.stdout:
+            # debug output
+            return
+        self.outputs.put(" ".join(str(arg) for arg in args))
+
+    def send(self, lines: List[str]):
+        for line in lines:
+            self.inputs.put(line)
+
+    def receive(self, timeout: float) -> str:
+        try:
+            line = self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            raise BotCrashed("timeout")
+        if line is None:
+            raise BotCrashed(repr(self.error))
+        return line
+
+    def close(self):
+        self.inputs.put(None)
+
+
+# Seeds `random` before handing over to the bot script
+_SUBPROCESS_BOOTSTRAP = (
+    "import random, runpy, sys; random.seed(int(sys.argv[2])); "
+    "sys.argv = sys.argv[1:2]; runpy.run_path(sys.argv[0], run_name='__main__')"
+)
+
+
+class SubprocessBot:
+    def __init__(self, path: str, seed: int):
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", _SUBPROCESS_BOOTSTRAP, path, str(seed)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            cwd=os.path.dirname(os.path.abspath(path)),
+        )
+        self.outputs: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.outputs.put(line.rstrip("\n"))
+        self.outputs.put(None)
+
+    def send(self, lines: List[str]):
+        try:
+            self.process.stdin.write("\n".join(lines) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise BotCrashed(repr(exc))
+
+    def receive(self, timeout: float) -> str:
+        try:
+            line = self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            raise BotCrashed("timeout")
+        if line is None:
+            raise BotCrashed("exited with {}".format(self.process.poll()))
+        return line
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+
+BOT_MODES = {
+    "inprocess": InProcessBot,
+    "subprocess": SubprocessBot,
+}
+
+
+################
+# GAMES
+################
+
+
+@dataclass
+class GameResult:
+    seed: int
+    score: int
+    resources: int
+    months: int
+    invalid_actions: List[str]
+    crash: Optional[str]
+    duration: float
+    # seconds spent simulating, without the bot
+    simulation: float
+
+
+def play_game(
+    bot_path: str,
+    seed: int,
+    mode: str = "inprocess",
+    turn_timeout: float = TURN_TIMEOUT,
+) -> GameResult:
+    started = time.perf_counter()
+    resources, arrivals = generate_city(random.Random(seed))
+    city = City(resources)
+    invalid_actions: List[str] = []
+    crash = None
+    simulation = 0.0
+
+    bot = BOT_MODES[mode](bot_path, seed)
+    month = 0
+    try:
+        for month, new_buildings in enumerate(arrivals):
+            if month:
+                city.resources += int(city.resources * INTEREST_RATE)
+            city.add_buildings(new_buildings)
+            lines = city.input_lines(new_buildings)
+
+            if crash is None:
+                try:
+                    bot.send(lines)
+                    answer = bot.receive(turn_timeout)
+                except BotCrashed as exc:
+                    crash, answer = str(exc), ""
+                simulation_started = time.perf_counter()
+                for action in filter(None, answer.split(";")):
+                    try:
+                        city.apply(action.strip())
+                    except ActionError as exc:
+                        invalid_actions.append("month {}: {!r} {}".format(month, action, exc))
+            else:
+                simulation_started = time.perf_counter()
+
+            city.end_month()
+            simulation += time.perf_counter() - simulation_started
+    finally:
+        bot.close()
+
+    return GameResult(
+        seed=seed,
+        score=city.score,
+        resources=city.resources,
+        months=month + 1,
+        invalid_actions=invalid_actions,
+        crash=crash,
+        duration=time.perf_counter() - started,
+        simulation=simulation,
+    )
+
+
+def _play_game_job(job: Tuple[str, int, str, float]) -> GameResult:
+    return play_game(*job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("bot", help="bot script, e.g. main2.py")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=sorted(BOT_MODES), default="inprocess")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT)
+    parser.add_argument("--verbose", action="store_true", help="list invalid actions")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    jobs = [
+        (args.bot, rng.getrandbits(32), args.mode, args.turn_timeout)
+        for _ in range(args.games)
+    ]
+    started = time.perf_counter()
+    with Pool(processes=args.workers or os.cpu_count()) as pool:
+        results = sorted(pool.imap_unordered(_play_game_job, jobs), key=lambda r: r.seed)
+
+    print("{:>10}  {:>7}  {:>9}  {:>7}  {:>9}  crash".format(
+        "seed", "score", "resources", "invalid", "sim ms"
+    ))
+    for result in results:
+        print("{:>10}  {:>7}  {:>9}  {:>7}  {:>9.1f}  {}".format(
+            result.seed,
+            result.score,
+            result.resources,
+            len(result.invalid_actions),
+            result.simulation * 1000,
+            result.crash or "",
+        ))
+        if args.verbose:
+            for invalid in result.invalid_actions:
+                print("            " + invalid)
+    print("mean score {:.0f} over {} games in {:.1f}s".format(
+        statistics.mean(r.score for r in results),
+        len(results),
+        time.perf_counter() - started,
+    ))
+
+
+if __name__ == "__main__":
+    main()
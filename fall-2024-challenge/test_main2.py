@@ -0,0 +1,70 @@
+"""
+Checks for main2.py's helpers, run with `python -m pytest`
+
+main2.py is a CodinGame script that starts reading stdin at module level,
+so only the code above its game loop is loaded.
+"""
+
+import os
+import random
+import sys
+import time
+import types
+
+import pytest
+
+GAME_LOOP = "# game loop\nwhile True:"
+
+
+@pytest.fixture(scope="module")
+def main2() -> types.ModuleType:
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main2.py")
+    with open(path) as source_file:
+        source = source_file.read()
+    module = types.ModuleType("main2")
+    # dataclasses look their module up
+    sys.modules[module.__name__] = module
+    exec(compile(source[: source.index(GAME_LOOP)], path, "exec"), module.__dict__)
+    return module
+
+
+def random_network(main2, seed: int, nb_buildings: int = 100, degree: int = 5):
+    """Adjacency list of a random city with `degree` tubes per building on average"""
+    rng = random.Random(seed)
+    buildings = [
+        main2.Building(
+            id=i, type=1 + i % 3, coordinates=[rng.randrange(160), rng.randrange(90)]
+        )
+        for i in range(nb_buildings)
+    ]
+    adjacency = {building.id: {} for building in buildings}
+    edges = 0
+    while edges < nb_buildings * degree // 2:
+        a, b = rng.sample(buildings, 2)
+        if b.id not in adjacency[a.id]:
+            adjacency[a.id][b.id] = b
+            adjacency[b.id][a.id] = a
+            edges += 1
+    return adjacency
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_generate_routes_is_fast_on_dense_networks(main2, seed):
+    adjacency = random_network(main2, seed)
+
+    started = time.process_time()
+    routes = list(main2.generate_routes(adjacency))
+    elapsed = time.process_time() - started
+
+    assert routes
+    # the path count stops it, well before the time budget and inside a turn
+    assert elapsed < main2.ROUTE_TIME_BUDGET / 2
+
+
+def test_generate_routes_is_deterministic(main2):
+    adjacency = random_network(main2, seed=0)
+
+    first = [[b.id for b in route] for route in main2.generate_routes(adjacency)]
+    second = [[b.id for b in route] for route in main2.generate_routes(adjacency)]
+
+    assert first == second
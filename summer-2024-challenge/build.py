@@ -0,0 +1,522 @@
+"""
+Single-file submission builder for the Olymbits bots
+
+CodinGame takes one file, so a bot importing from olymbits/ (or with a
+generated constants module) is built into one before submitting:
+
+    python build.py level4.py --report
+
+General methodology is:
+- Local imports (olymbits.*, level4_constants) are replaced by the imported
+  module's code, once per module, and only for modules actually imported;
+  optional ones inside `try: ... except ImportError` are dropped when missing
+- debug() calls, debug_state() calls and asserts are stripped
+- `(int, Enum)` classes become int subclasses with a small metaclass, and
+  @dataclass classes become slotted classes with a plain __init__, so
+  neither enum nor dataclasses has to be imported or walked on hot paths
+- Imports nothing uses any more, or repeated ones, are dropped
+- --report compares `python -X importtime` and the time to the first answer
+  of the source and the built file
+"""
+
+import argparse
+import ast
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from referee import MINI_GAMES, NB_GAMES, NB_PLAYERS, GameSlot, final_score
+
+STRIPPED_CALLS = {"debug", "debug_state"}
+BUILD_DIR = "dist"
+
+ENUM_RUNTIME = """
+class _EnumType(type):
+    def __iter__(cls):
+        return iter(cls._members)
+
+    def __len__(cls):
+        return len(cls._members)
+
+    def __call__(cls, value):
+        return cls._by_value[value]
+
+
+def _enum_members(cls, members):
+    cls._members = []
+    cls._by_value = {}
+    for name, value in members:
+        member = int.__new__(cls, value)
+        member.name = name
+        member.value = value
+        setattr(cls, name, member)
+        cls._members.append(member)
+        cls._by_value[value] = member
+"""
+
+ASDICT_RUNTIME = """
+def asdict(obj):
+    return {name: getattr(obj, name) for name in obj._fields}
+"""
+
+
+class BuildError(Exception):
+    pass
+
+
+################
+# INLINING
+################
+
+
+class Inliner:
+    """Replaces imports of modules found under `root` with their code"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.inlined: List[str] = []
+
+    def module_path(self, module: Optional[str]) -> Optional[str]:
+        if not module:
+            return None
+        base = os.path.join(self.root, *module.split("."))
+        for path in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.exists(path):
+                return path
+        # a local module that hasn't been generated
+        if module.endswith("_constants"):
+            return ""
+        return None
+
+    def inline_body(self, body: List[ast.stmt]) -> List[ast.stmt]:
+        result = []
+        for node in body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if self.module_path(alias.name) is not None:
+                        raise BuildError(
+                            "`import {}` can't be inlined, "
+                            "use `from ... import`".format(alias.name)
+                        )
+                result.append(node)
+            elif (
+                isinstance(node, ast.ImportFrom)
+                and self.module_path(node.module) is not None
+            ):
+                result.extend(self.inline_module(node.module))
+            elif isinstance(node, ast.Try) and self._is_optional_local_import(node):
+                result.extend(self.inline_module(node.body[0].module))
+            else:
+                result.append(node)
+        return result
+
+    def _is_optional_local_import(self, node: ast.Try) -> bool:
+        return (
+            len(node.body) == 1
+            and isinstance(node.body[0], ast.ImportFrom)
+            and self.module_path(node.body[0].module) is not None
+            and all(
+                isinstance(handler.type, ast.Name) and handler.type.id == "ImportError"
+                for handler in node.handlers
+            )
+        )
+
+    def inline_module(self, module: str) -> List[ast.stmt]:
+        path = self.module_path(module)
+        if not path or module in self.inlined:
+            return []
+        self.inlined.append(module)
+        # parent packages run first, as they would on import
+        parent = module.rpartition(".")[0]
+        body = self.inline_module(parent) if parent else []
+        with open(path) as module_file:
+            tree = ast.parse(module_file.read(), filename=path)
+        statements = tree.body
+        if statements and _is_docstring(statements[0]):
+            statements = statements[1:]
+        return body + self.inline_body(statements)
+
+
+def _is_docstring(node: ast.stmt) -> bool:
+    return (
+        isinstance(node, ast.Expr)
+        and isinstance(node.value, ast.Constant)
+        and isinstance(node.value.value, str)
+    )
+
+
+################
+# STRIPPING
+################
+
+
+class DebugStripper(ast.NodeTransformer):
+    """Drops debug calls used as statements, and asserts"""
+
+    def __init__(self, names: Set[str]):
+        self.names = names
+
+    def _is_stripped_call(self, node: ast.stmt) -> bool:
+        if not isinstance(node, ast.Expr) or not isinstance(node.value, ast.Call):
+            return False
+        func = node.value.func
+        name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+        return name in self.names
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        super().generic_visit(node)
+        for field in ("body", "orelse", "finalbody"):
+            body = getattr(node, field, None)
+            if (
+                not isinstance(body, list)
+                or not body
+                or not isinstance(body[0], ast.stmt)
+            ):
+                continue
+            kept = [
+                stmt
+                for stmt in body
+                if not isinstance(stmt, ast.Assert) and not self._is_stripped_call(stmt)
+            ]
+            if not kept and field == "body":
+                kept = [ast.Pass()]
+            setattr(node, field, kept)
+        return node
+
+
+################
+# HOT TYPES
+################
+
+
+def _has_decorator(node: ast.ClassDef, name: str) -> bool:
+    return any(
+        isinstance(decorator, ast.Name) and decorator.id == name
+        for decorator in node.decorator_list
+    )
+
+
+def _enum_members(node: ast.ClassDef) -> Optional[List[Tuple[str, int]]]:
+    """The members of an `(int, Enum)` class, None if it's anything else"""
+    bases = [base.id for base in node.bases if isinstance(base, ast.Name)]
+    if sorted(bases) != ["Enum", "int"] or node.decorator_list:
+        return None
+    members = []
+    for stmt in node.body:
+        if _is_docstring(stmt):
+            continue
+        if (
+            isinstance(stmt, ast.Assign)
+            and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)
+            and isinstance(stmt.value, ast.Constant)
+            and isinstance(stmt.value.value, int)
+        ):
+            members.append((stmt.targets[0].id, stmt.value.value))
+        else:
+            return None
+    return members
+
+
+def _dataclass_fields(
+    node: ast.ClassDef,
+) -> Optional[List[Tuple[str, Optional[ast.expr]]]]:
+    """(name, default) of a plain @dataclass's own fields, None if unsupported"""
+    if len(node.decorator_list) != 1 or not _has_decorator(node, "dataclass"):
+        return None
+    fields = []
+    for stmt in node.body:
+        if isinstance(stmt, ast.AnnAssign):
+            if not isinstance(stmt.target, ast.Name):
+                return None
+            default = stmt.value
+            if isinstance(default, ast.Call):
+                # field(...) and friends
+                return None
+            fields.append((stmt.target.id, default))
+    return fields
+
+
+def replace_hot_types(tree: ast.Module) -> Dict[str, int]:
+    """Rewrites enums and dataclasses in place, returns how many of each"""
+    counts = {"enum": 0, "dataclass": 0}
+    all_fields: Dict[str, List[Tuple[str, Optional[ast.expr]]]] = {}
+    body = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            body.append(node)
+            continue
+
+        members = _enum_members(node)
+        if members is not None:
+            counts["enum"] += 1
+            node.bases = [ast.Name("int", ast.Load())]
+            node.keywords = [
+                ast.keyword("metaclass", ast.Name("_EnumType", ast.Load()))
+            ]
+            node.body = [ast.Pass()]
+            body.append(node)
+            body.append(
+                ast.parse("_enum_members({}, {!r})".format(node.name, members)).body[0]
+            )
+            continue
+
+        own = _dataclass_fields(node)
+        bases = [base.id for base in node.bases if isinstance(base, ast.Name)]
+        if own is None or any(base not in all_fields for base in bases):
+            body.append(node)
+            continue
+
+        counts["dataclass"] += 1
+        inherited = [field for base in bases for field in all_fields[base]]
+        fields = inherited + own
+        all_fields[node.name] = fields
+        node.decorator_list = []
+        methods = [stmt for stmt in node.body if not isinstance(stmt, ast.AnnAssign)]
+        docstring = [methods.pop(0)] if methods and _is_docstring(methods[0]) else []
+
+        arguments = ", ".join(
+            name if default is None else "{}={}".format(name, ast.unparse(default))
+            for name, default in fields
+        )
+        assignments = (
+            "\n".join("    self.{0} = {0}".format(name) for name, _ in fields)
+            or "    pass"
+        )
+        generated = ast.parse(
+            "__slots__ = {!r}\n_fields = {!r}\ndef __init__(self, {}):\n{}\n".format(
+                tuple(name for name, _ in own),
+                tuple(name for name, _ in fields),
+                arguments,
+                assignments,
+            )
+        ).body
+        node.body = docstring + generated + methods
+        body.append(node)
+
+    tree.body = body
+    return counts
+
+
+################
+# CLEANUP
+################
+
+
+def _used_names(tree: ast.Module) -> Set[str]:
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            base = node
+            while isinstance(base, ast.Attribute):
+                base = base.value
+            if isinstance(base, ast.Name):
+                used.add(base.id)
+    return used
+
+
+def drop_unused(tree: ast.Module, removable_functions: Set[str]):
+    """
+    Imports and stripped helper functions nothing refers to any more, and
+    imports repeated by inlined modules
+
+    Repeated until nothing changes, a dropped helper can leave an import
+    unused (debug() and sys).
+    """
+    while True:
+        body = []
+        imported = set()
+        for node in tree.body:
+            used = _used_names(
+                ast.Module(
+                    body=[n for n in tree.body if n is not node], type_ignores=[]
+                )
+            )
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                if ast.dump(node) in imported:
+                    continue
+                imported.add(ast.dump(node))
+                names = [
+                    alias
+                    for alias in node.names
+                    if alias.name == "*"
+                    or (alias.asname or alias.name).split(".")[0] in used
+                ]
+                if not names:
+                    continue
+                node.names = names
+            elif isinstance(node, ast.FunctionDef) and node.name in removable_functions:
+                if node.name not in used:
+                    continue
+            body.append(node)
+        if len(body) == len(tree.body):
+            return
+        tree.body = body
+
+
+def _insert_after_imports(tree: ast.Module, code: str):
+    index = 0
+    while index < len(tree.body) and isinstance(
+        tree.body[index], (ast.Import, ast.ImportFrom)
+    ):
+        index += 1
+    tree.body[index:index] = ast.parse(code).body
+
+
+################
+# BUILD
+################
+
+
+def build(source: str) -> Tuple[str, Dict[str, object]]:
+    with open(source) as source_file:
+        tree = ast.parse(source_file.read(), filename=source)
+
+    inliner = Inliner(os.path.dirname(os.path.abspath(source)))
+    tree.body = inliner.inline_body(tree.body)
+    tree = DebugStripper(STRIPPED_CALLS).visit(tree)
+    counts = replace_hot_types(tree)
+
+    uses_asdict = "asdict" in _used_names(tree)
+    if counts["dataclass"]:
+        # the converted classes no longer need the module
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom) and node.module == "dataclasses":
+                node.names = [
+                    a for a in node.names if a.name not in ("dataclass", "asdict")
+                ]
+        tree.body = [
+            node
+            for node in tree.body
+            if not (isinstance(node, ast.ImportFrom) and not node.names)
+        ]
+    drop_unused(tree, STRIPPED_CALLS)
+    if counts["dataclass"] and uses_asdict:
+        _insert_after_imports(tree, ASDICT_RUNTIME)
+    if counts["enum"]:
+        _insert_after_imports(tree, ENUM_RUNTIME)
+
+    ast.fix_missing_locations(tree)
+    code = "# Built by build.py from {}, do not edit\n{}\n".format(
+        os.path.basename(source), ast.unparse(tree)
+    )
+    return code, {"inlined": inliner.inlined, **counts}
+
+
+################
+# REPORT
+################
+
+
+def first_turn_input(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    slots = [GameSlot(game_cls=game_cls, rng=rng) for game_cls in MINI_GAMES]
+    no_medals = [[0, 0, 0] for _ in range(NB_GAMES)]
+    score = " ".join(str(v) for v in [final_score(no_medals)] + [0] * (3 * NB_GAMES))
+    lines = ["0", str(NB_GAMES)] + [score] * NB_PLAYERS
+    lines += [slot.input_line() for slot in slots]
+    return "\n".join(lines) + "\n"
+
+
+def import_times(path: str, turn_input: str) -> List[Tuple[str, int]]:
+    """(module, cumulative us) of every top-level import, slowest first"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", path],
+        input=turn_input,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(path)),
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith("  "):
+            # imported by another import
+            continue
+        imports.append((name.strip(), int(cumulative)))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+def first_answer_time(path: str, turn_input: str) -> float:
+    """Seconds from starting the interpreter to the first action"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, path],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(path)),
+    )
+    process.stdin.write(turn_input)
+    process.stdin.flush()
+    process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    process.kill()
+    process.wait()
+    return elapsed
+
+
+def report(source: str, output: str, repeat: int):
+    turn_input = first_turn_input()
+    for label, path in (("source", source), ("built", output)):
+        imports = import_times(path, turn_input)
+        answers = [first_answer_time(path, turn_input) for _ in range(repeat)]
+        print(
+            "{:<7} {:>8.1f}ms imports, first answer in {:.1f}ms (median of {})".format(
+                label,
+                sum(us for _, us in imports) / 1000,
+                statistics.median(answers) * 1000,
+                repeat,
+            )
+        )
+        print(
+            "        slowest: "
+            + ", ".join(
+                "{} {:.1f}ms".format(name, us / 1000) for name, us in imports[:6]
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--report", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(args.source)),
+        BUILD_DIR,
+        os.path.basename(args.source),
+    )
+    code, summary = build(args.source)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as output_file:
+        output_file.write(code)
+
+    print(
+        "wrote {} ({} characters), inlined {}, "
+        "{} enum and {} dataclasses replaced".format(
+            output,
+            len(code),
+            ", ".join(summary["inlined"]) or "nothing",
+            summary["enum"],
+            summary["dataclass"],
+        )
+    )
+    if args.report:
+        report(args.source, output, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
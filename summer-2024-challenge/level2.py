@@ -4,22 +4,16 @@ Functionality to navigate level 2 of https://www.codingame.com/ide/challenge/sum
 General methodology is:
 - Loop through all "turns"
 - Loop through all 4 "games" for a single turn
+
+Imports from olymbits/, so submit the single file built by
+`python build.py level2.py` (dist/level2.py) rather than this one.
 """
 
 import sys
-from enum import Enum
 from statistics import mode
 from typing import List
 
-
-class ValueBasedTurn(int, Enum):
-    UP = 0
-    LEFT = 1
-    DOWN = 2
-    RIGHT = 3
-
-
-DEFAULT_ACTION = ValueBasedTurn.RIGHT
+from olymbits.common import DEFAULT_ACTION, ValueBasedTurn
 
 
 player_idx = int(input())
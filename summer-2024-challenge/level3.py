@@ -1,28 +1,16 @@
+"""
+Functionality to navigate level 3 of https://www.codingame.com/ide/challenge/summer-challenge-2024-olymbits
+
+Imports from olymbits/, so submit the single file built by
+`python build.py level3.py` (dist/level3.py) rather than this one.
+"""
+
 import json
-import sys
 from dataclasses import dataclass
-from enum import Enum
 from statistics import mode
 from typing import List
 
-
-class ValueBasedTurn(int, Enum):
-    UP = 0
-    LEFT = 1
-    DOWN = 2
-    RIGHT = 3
-
-
-DEFAULT_ACTION = ValueBasedTurn.RIGHT
-
-
-def debug(message: str):
-    """ """
-    print(
-        "turns_until_next_hurdle: {}".format(message),
-        file=sys.stderr,
-        flush=False,
-    )
+from olymbits.common import DEFAULT_ACTION, ValueBasedTurn, _map_letter_to_action, debug
 
 
 def output_action(action: ValueBasedTurn = DEFAULT_ACTION):
@@ -198,19 +186,8 @@ class SkatingGameInputs:
             )
         )
 
-    def _map_letter_to_action(self, letter: str) -> ValueBasedTurn:
-        if letter == "U":
-            return ValueBasedTurn.UP
-        if letter == "R":
-            return ValueBasedTurn.RIGHT
-        if letter == "D":
-            return ValueBasedTurn.DOWN
-        if letter == "L":
-            return ValueBasedTurn.LEFT
-        return DEFAULT_ACTION
-
     def _map_gpu_to_actions(self) -> List[ValueBasedTurn]:
-        return [self._map_letter_to_action(letter=l) for l in self.gpu]
+        return [_map_letter_to_action(letter=l) for l in self.gpu]
 
     def _determine_intersector_risk(self) -> int:
 
@@ -284,22 +261,11 @@ class DivingGameInputs:
             )
         )
 
-    def _map_letter_to_action(self, letter: str) -> ValueBasedTurn:
-        if letter == "U":
-            return ValueBasedTurn.UP
-        if letter == "R":
-            return ValueBasedTurn.RIGHT
-        if letter == "D":
-            return ValueBasedTurn.DOWN
-        if letter == "L":
-            return ValueBasedTurn.LEFT
-        return DEFAULT_ACTION
-
     def determine_optimal_action(self):
 
         self.debug_state()
 
-        action = self._map_letter_to_action(self.gpu[0])
+        action = _map_letter_to_action(self.gpu[0])
 
         debug(
             "DivingGameInputs._hurdle_determine_optimal_action_for_game: {}".format(action),
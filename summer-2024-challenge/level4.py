@@ -1,31 +1,55 @@
+import base64
+import itertools
 import json
-import sys
+import os
+import random
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
 from dataclasses import asdict, dataclass
-from enum import Enum
-from statistics import mode
-from typing import List, Union
+from typing import Any, Callable, Dict, List, Set, Tuple, Union
 
+from olymbits.common import DEFAULT_ACTION, ValueBasedTurn, _map_letter_to_action, debug
 
-class ValueBasedTurn(int, Enum):
-    UP = 0
-    LEFT = 1
-    DOWN = 2
-    RIGHT = 3
+try:
+    import numpy as np
+except ImportError:
+    # rollouts are skipped without numpy
+    np = None
 
+################
+# TUNABLE CONSTANTS
+################
+
+# Chance that a future turn's action is picked for skating rather than
+# dictated by one of the other games
+SKATING_CONTROL = 0.5
 
-DEFAULT_ACTION = ValueBasedTurn.RIGHT
+# Chance that a future dive letter gets played rather than sacrificed for
+# one of the other games
+DIVING_MATCH_CHANCE = 0.75
+# Remaining dives at which diving always asks for priority
+DIVING_PRIORITY = 4
 
+# Chance a player plays a game's preferred action, otherwise any action
+MEDAL_FOCUS = 0.6
+# Turns of evidence MEDAL_FOCUS is worth when estimating an opponent's focus
+OPPONENT_PRIOR_TURNS = 10
+# Added to every game's medal points so that early on, with no medals yet,
+# every game still carries weight
+MEDAL_WEIGHT_PRIOR = 1
 
-def _map_letter_to_action(letter: str) -> ValueBasedTurn:
-    if letter == "U":
-        return ValueBasedTurn.UP
-    if letter == "R":
-        return ValueBasedTurn.RIGHT
-    if letter == "D":
-        return ValueBasedTurn.DOWN
-    if letter == "L":
-        return ValueBasedTurn.LEFT
-    return DEFAULT_ACTION
+# Games that never force their action through the PriorityScheduler
+PRIORITY_EXCLUDE_GAMES: List[str] = []
+
+# Generated by tuner.py, not part of the submission
+try:
+    from level4_constants import *  # noqa: F401,F403
+except ImportError:
+    pass
 
 
 @dataclass
@@ -38,36 +62,255 @@ class GameState:
     force_priority: bool = False
 
 
-def parse_game_states_for_priority(
-    game_states: List[GameState],
-    exclude_games=[]
-    #exclude_games=["DIVING"]
-) -> Union[None, ValueBasedTurn]:
-    force_priority_action = [
-        gs.optimal_action
-        for gs in game_states
-        if gs.force_priority and gs.game not in exclude_games and gs.optimal_action is not None
+def output_action(action: ValueBasedTurn = DEFAULT_ACTION):
+    debug("output_action: " + action.name)
+    print(action.name)
+
+
+################
+# POLICY TABLES
+################
+
+# BEGIN GENERATED POLICY TABLES
+# policy_tables.py, do not edit by hand
+POLICY_HURDLE_WINDOW = 6
+POLICY_ARCHERY_TURNS = 15
+POLICY_SKATING_CONTROL = 0.5
+POLICY_SKATING_VALUE_SCALE = 1000
+POLICY_TABLES = {
+    "hurdle": "eNpjZmBkAAFmIA3DMD46jS4PwgAF2gAt",
+    "archery": "eNrt3dti4zYMBNAZ8v//udsktkVgQIESFdsx/dIWza4dwbzgCJKA9fo7L8ogZZAySBmkDFIGKYOUQcogZZAySBmkDFIGKYOUQcogZZAyyJW4lbiVuJW4lbiVuJW4lbiVuJW4lbiVuJW4v5C49XqDV/n3srFais9qrWLUVDWWqhphVOOOajRSRami7RfdD207EEyUKkoVFSPIj+Kvf8mNtgnRKHHFjUaduHoucVyJ+4XE6WF4QeJ4KHH8hcTh9RPn5tR/ifM7lFrpNyP1/hu4vc1K3LTEXbir9Ps6qH2dSNzjaLmd6pTEie0rs9vXVQ6scmAlbiVuJW4lbiVuycl6STnxsaq+y/Vn0LVfxfuo234V2+3/LUgf5fZnb8OXaLZvP/8BG70HTZQQUfoo2HyYNkr7N4goVZQqShW1Q8pOAexHdeKKmC0rRTp14tgclraOM6Wa/gddlFSJo0qcT+fm8G2jFNE5iaNMHEcSR3Snz6/UDaxxrgC/v4Erll3V8xhLaLN5H6Roh5hfTOUaB7fGQa1xUGucX1GpolTR569xJZm4Eh/PQE6oqnIrJzRvydu4SSXOvTvVZ/rwXWV1/+87mya6JycUW80WmW+zJXgscZSJs/vd7Zy0yoEj5YCbaXnbZaQKB1UOyBEnE4dVx02u4+TogAxCBkFZ3DE9f67ETSzA1egAxEFuPp05YmLA+iNvT1/YqD/oKsXiyJtdZT/Ff1xO1OhQieOrJE6OTWLByYf2nKidclX759qe+GzPgLfnudRgpBrh9BXCrYg2WxbeVaR1G7rzfBSmgfY/tqulPftHNrMDzTnTzvJ2WRTyZHcRE2MlZDZ9lKqcElWcJROoqtz8pNmH/JTW7T7kdjK6OZEqTtAa97ATnq0t4sTxdRJXfFWu20vELwBWKEpSI45ipaQah70VtiMnFHKyPdItUbWcYr9+NNFn95wIOanSwaScVPp01O1voCjJ58hJlCaam0rbYEpOzCTZHmkNvRD7g5OJGxlb03pOxuREtZd0DLCRk3Bw6RzlyKs5LaEwh6qO8xs73M3AJNlJvvjjt3exb6SqODCO/no5IJgCqtr9SSB3qwn1tYnIC2k5wSrAz8iJO3SRnKgykFmNWeT1S3JCJSeyVFc/qf5OrMS9hZwoo2ayZWX1nKzXpT0nj/zWwNxuO0vXcyLkpNgC/FbCJ+UEQk7uGxmPJOLb3GzbTY+I60PZbmbbYSWCMAiJ7aYUZhYw8CJLERHdzlyHek5M4gJtxTk5cVU51ewdyklTSwadHX6363DFGwtg6wTT2+HSyfbLlErcTmUZ9ZwIObl5CBjLyc87VfoSrZ+4hJwwaoPpygmhkeS+MJICsGI5sQ0bTRVIH1QdL26NaxvRzOeUbV5xz8k0OVHasLGLcMOT7DlB0HNi9hyum0rLCU2wOXNujAQCD7Y/GRGNOivUDvXtbvcZPScdOfGG+wpysvksJp1U6VQWZEtQQuYomTioXWWwa++XAzU5g5VOORDKSbtPdnKCoHC4RE7MikaVTqbSyVQ1Ic/DttPxqcRdVscxkhPaixDFkb9CTrTbqCOPECvv75g5Aw55BhxBcfemcmIL27jnJFW/y7YiTTRqyKBfgIv2EgbdycxX6mOJYzqb/mfjbBJMZ7MjJ44pTspJ/Eb63SfICbNwsvjhr8vJ/6+KcIArOSm2AP8q7K+Tk4dmJOQE7cX67my6khNfgG+WucdO1cmJDd7WX9EG016gIJbOVk7KUTn5zibUVuu5ciJ3f0+SEwg5cX9800Hpvnampt+U30k5qeouQlXOzJVBE84ZOcExOblvzAY286NyYok2vizIfIfVl0oNOcE+sZyUiXLynU0GE9MFckIlJ0pvR9NpMuFqyb3mFjMdqwIcquPFpzPaVZYTclIzcrKd8UlMlhOOywmFnKiqmiKofk0jJ1ByAiUn6MlJUFgdkBOfuYeccKTnxKths0uHLAPBGNw6iQvkRDXT0stJNp0MWmsodYzqJ99ZTsxeK9+ycqGcUMtJenRS/HF5Vl1eevDOckJ7bTXSciI8JN3ckpaTQ6MzKSeYJCfqyIfXAssUz5KT9kD5e3lNkBNk5URjTnortAth6/VBcuJK2FKFnJSenDyCtQo5KUflZEvsfTlBUk7QgsyQnDCWE/plTsoJrpcTRJ0umyWynJITdOQEu3Iyks45csJROVEdC5grJ3wfObFnxXbTKROXkBOJJD5IJydQcoKXlRP2+4KYK8B35cQxBbRIDMnJZuYMm1vaL2a34wVz5YQjckIpJ+jLyUZQj8oJpJwQ/jvvxW2anOhfU8oJjsoJ0nJS3VEalpOm2i2PjsKunPAx12fkRLcq8Yic+BXGDIzB2ix+oyNyglNyUr1ypAvwclxOyEBO8Cw54Tk5GdAY/UbvLCdBQdp0JSokuU5OeEJOWiOBkhNMlxOekBPMlZP4PMwhOaGQEwzKCcEL0rleHy0nRcoJvZwUJxL16wkiohEFshEllhO0zSG7pTZ25IS250TKCY72nOyU2sEyt/kQXTnhcTl5JO7xy1YlJ/WEnGC6nGBMTrAvJ0jKCVM9JzwrJxySE4JPlZOhUjufuG7PScQpVBrTkxPV6oS5csIhOeGOnGQuUsjIicGHIJ172wXIdohROXG67buSusKDE3JijlIpvyQnOCgn1HJCKSfHdn85t4nlZABzcEhOqpATlbhr5ATH5ISyWYhaToheF+ZQOiGJBnk5gZQT7MtJFavMbDkpaTnBYTnhOTlRVz8eTicCjYGSE0iiQU9OykvICZNygifICaWcHJ5sexoja/pBOWFSTpC//3wgJ5gpJ3yunBzY2dpuat3EuV6fICe1BnKCeXJSlJyUnpw0wMKdzky134TocR6Vk/g+J249ZXQKaedMRNO50LlDbF5O4G5DXaqTE9hn5pI/Tzu2wZKVE/bkZH99OSonTMuJv8/JZt0xc/puOnflpIhuoZ87xAL7PSfmm7w5LlUgSYFwBqTvc4JROUmW2sM9J/1GlObcT1RqJ+UEs+Uk33Nizv2IxOXlBLtyMn/3J95ospxI9gF+o+cEJ+SE83pOXNvN/HTm5QRKTiDlRAoP8LSeE+TlBIlaOxpxcDOYkRNqOZmXTiknkHKCvJzgk+SEQk5I9G+Lfk06B4SH8nMSCTmpSPQSXyAnJS0n6MsJzK2BmgecMSsnlHIyMZ0B5gREE+YCb321jryOzBYAIpiVE3blJJ3O5Cle80F7g229/mzPSW1uuo/71Tpmb1/MBsVcrbORE5TU1Tqld7XOoJwETxG+753sPsDJCVs5gZKT5nyUWdFG5QR5OfHBnpxUuuf5fmcuKSdU21cTLOFEPUlOOCwn1pfbd99+Rlo58b0meTlBr+eEQc8JsH+fEzA4IP/+EiEnRchJkVV5cKZprpwcvs+JeHzS5lIw+v5345FBk0J8FvUpctJr6Bq7Wuf35USBxvYhXk3ifJDic2LJiZATf4LuCjlRHrLbBhPKCZSc4D3kJFNrJ3pOBHnpkfQsOYGUEyk8+Cw5oZITMWiuT2deTvrs0y/Any0nSMoJd+VEHLt2L/XUdAYfHt5turn4aDmxLUjOLsIhO19OIJ+TvF4fKifY9k+MyAm8nMD1cogm29utNrycuOniCjlxW5vtfTC2a+l9TW32yOzICSG2Ih05uSdurpzcJ8WL5IT7E/VcOeFZOTHToS+O9KNHEF6ajqvlpPoLz4qQkxrIidu+Fv9w22C/NKPU7ssJ83JCISdBh6u6cv9aOalpOamH5aS4r9OLyQn9U3iknMDwlqkGtn0sbJ8P06/ipslJnSwn5fXlJNeIMiYn/o3YbUH/Q3Lir+Z/fTmBkhN8mpzsl2HvISeYKyfZp7FgycmSk6Sc4IScmNteb9fkdI5PnBP0v+WSk8+Uk2Jm4G85sf3k5f/6uyo54UE5qVJOVC1zWE7aW7fuyMl2S7yVE/blxBVsRk7Yl5PH7z/nPieV9mawDznBdXKCuXLCvJwIJHHToZQTaDmBlBN3Wmp7qK6Wk2Y9fUc58U0jMqhvZ68f9ohgb6WGmgq+o5ww0c/wG3JC7FxFLLfDsuSRSmFmfndZ0NvJSSpxz5ETeQkPA04RfxwaSbTGvJ2c5Mr/vyQn+c6FJSdvKydDV+sEBXi2O+U3rtZ5azmh5JQlJ0tO1uul5aTuygnucsKDcvL9mYqQk1q4OzPMlhNub25xkZxgR07EkFtysicn1HLCmXKCvJxgyck5OeGT5ARLTs7JCZ8kJ3sF+JKTSXIi6YNpTlly8jw5oZITKjlhSk52Erfk5EXkhJJTlpx8ipzwF+QES06WnCw5+RGOs3JSWjnhl5yUrpzwJidfd5N9XznBK8oJsnLi1s0BOZGXWWHJSSMnwbN1TCXVfbZORk6+H5UEcdtYJSdccjJVTpCWE7hsyueZQtSGsZxgyclUOeEJOcGSkzeWEyTlhEtOlpwsOVlysuRkycmSkyUnS07ScsITcoJxORl7tk519dddTvBH5ITvICel+Nsif7dj5eTke4uRk5N6Qk7wt+SE8sKcJSdLTpacLDlZcrLkZMkJfu5jaOSkXCgnPCEnWHKy5OR95OQ/5lZ1Dw==",
+    "skating_index": "eNpjYGAGAQYQxcgIpIAEkGKEU4zMYIoZTDGDeEACqpIRqgRFJX4KAB1pAH0=",
+    "skating_values": "eNpjYEAHRzhhEMTuEI4XUhH6zrefF8SeK/1L4oD4VGFPARD7kKKa/B0ZJckHoiD2AnV51VKlbHkpORC7UddU+4HGUTUWNRB7nvFiQ1GDGN0yHRDbykrdosvsrHG5EYi92mGh3U0bLqtyCxD7nxuTq5izpUOnHYjt5RvkHeDZ7MbpCmJPCZ4fuND/jk+FN4j9IPJ9+I9Q0+BzgSC2YYJznH9Md6RsBIjdnDYtZVHSnfiMOAC/2Evb",
+}
+# END GENERATED POLICY TABLES
+
+
+def decode_policy_table(name: str) -> bytes:
+    return zlib.decompress(base64.b64decode(POLICY_TABLES[name]))
+
+
+_policy_started = time.perf_counter()
+HURDLE_POLICY = decode_policy_table("hurdle")
+ARCHERY_POLICY = decode_policy_table("archery")
+SKATING_POLICY_INDICES = decode_policy_table("skating_index")
+SKATING_POLICY_VALUES = array("H", decode_policy_table("skating_values"))
+debug(
+    "Policy tables decoded in {:.2f}ms".format(
+        (time.perf_counter() - _policy_started) * 1000
+    )
+)
+
+
+################
+# SEATS
+################
+
+NB_PLAYERS = 3
+# Register columns holding each player's values, per game in player order
+SEAT_REGISTERS = [
+    [(0, 3), (1, 4), (2, 5)],  # hurdle: position, stun
+    [(0, 1), (2, 3), (4, 5)],  # archery: x, y
+    [(0, 3), (1, 4), (2, 5)],  # skating: spaces, risk
+    [(0, 3), (1, 4), (2, 5)],  # diving: points, combo
+]
+
+
+def rotate_to_seat(values: List, seat: int, columns: List[Tuple[int, ...]]) -> List:
+    """
+    Reorder per player values so `seat` comes first, the others following
+    in turn order
+
+    Everything past the parsing assumes we are player 0, so the registers
+    and score lines are rotated once as they are read.
+    """
+    rotated = list(values)
+    for target, source in zip(columns, columns[seat:] + columns[:seat]):
+        for target_column, source_column in zip(target, source):
+            rotated[target_column] = values[source_column]
+    return rotated
+
+
+################
+# MEDAL ESTIMATION
+################
+
+# Keep only the most likely states when propagating a player's race forward
+MEDAL_MAX_STATES = 8
+# Hurdle races have no fixed length, stop looking this far ahead
+MEDAL_MAX_TURNS = 10
+MEDAL_GAMES = ["HURDLE", "ARCHERY", "SKATING", "DIVING"]
+# Below this the actions are considered equally good
+MEDAL_GAIN_EPSILON = 1e-6
+# Seconds after the turn's input was read, games not estimated by then are
+# left to the rollouts and search, which have later deadlines
+MEDAL_DEADLINE = 0.025
+
+
+class MedalDeadlineExceeded(Exception):
+    pass
+
+
+@dataclass
+class MedalChances:
+    gold: float
+    silver: float
+    bronze: float
+
+    @property
+    def expected_points(self) -> float:
+        # A gold is worth 3, a silver 1 and a bronze nothing
+        return 3 * self.gold + self.silver
+
+
+# A player's distribution over race states, {state: probability}
+StateDistribution = Dict[tuple, float]
+
+
+def _prune_distribution(distribution: StateDistribution) -> StateDistribution:
+    if len(distribution) <= MEDAL_MAX_STATES:
+        return distribution
+    kept = sorted(distribution.items(), key=lambda item: item[1], reverse=True)
+    kept = kept[:MEDAL_MAX_STATES]
+    total = sum(prob for _, prob in kept)
+    return {state: prob / total for state, prob in kept}
+
+
+def medal_chances_from_scores(
+    ours: Dict[float, float], opponents: List[Dict[float, float]]
+) -> MedalChances:
+    """
+    Medal odds from independent final score distributions (higher is better)
+
+    Ties share the medal, so a player's medal only depends on how many
+    opponents finish strictly ahead of them
+    """
+    cumulative = []
+    for opponent in opponents:
+        scores = sorted(opponent)
+        running, totals = 0.0, []
+        for score in scores:
+            running += opponent[score]
+            totals.append(running)
+        cumulative.append((scores, totals))
+
+    gold = bronze = 0.0
+    for score, prob in ours.items():
+        all_behind = all_ahead = 1.0
+        for scores, totals in cumulative:
+            idx = bisect_right(scores, score)
+            behind = totals[idx - 1] if idx else 0.0
+            all_behind *= behind
+            all_ahead *= 1 - behind
+        gold += prob * all_behind
+        bronze += prob * all_ahead
+
+    return MedalChances(gold=gold, silver=max(0.0, 1 - gold - bronze), bronze=bronze)
+
+
+def player_medal_points(score_info: List[int]) -> List[int]:
+    """Medal points per game from a score_info line, in MEDAL_GAMES order"""
+    return [
+        3 * score_info[1 + 3 * game] + score_info[2 + 3 * game]
+        for game in range(len(MEDAL_GAMES))
     ]
-    return force_priority_action[0] if len(force_priority_action) else None
 
 
-def get_mode_of_game_states(game_states: List[GameState]) -> ValueBasedTurn:
-    optimal_actions = [gs.optimal_action for gs in game_states if gs.optimal_action is not None]
-    return mode(optimal_actions)
+################
+# ACTION AGGREGATION
+################
 
+# One row per game, one column per action, None for games with no decision
+ValueMatrix = List[Union[None, List[float]]]
 
-def debug(message: str):
-    """ """
-    print(
-        message,
-        file=sys.stderr,
-        flush=False,
-    )
 
+def medal_value_matrix(
+    medal_chances: List[Union[None, List[MedalChances]]],
+) -> ValueMatrix:
+    """Expected medal points in each running race for each action"""
+    return [
+        None if chances is None else [c.expected_points for c in chances]
+        for chances in medal_chances
+    ]
+
+
+def medal_standing_weights(medal_points: List[int]) -> List[float]:
+    """
+    How much a medal point in each game is worth to the final score
+
+    The final score is the product of every game's medal points, so a point
+    in one game is worth the product of the others
+    """
+    weights = []
+    for game in range(len(medal_points)):
+        weight = 1.0
+        for other, points in enumerate(medal_points):
+            if other != game:
+                weight *= points + MEDAL_WEIGHT_PRIOR
+        weights.append(weight)
+    return weights
+
+
+def weighted_action_values(value_matrix: ValueMatrix, weights: List[float]) -> List[float]:
+    totals = [0.0] * len(ValueBasedTurn)
+    for values, weight in zip(value_matrix, weights):
+        if values is None:
+            continue
+        for action, value in enumerate(values):
+            totals[action] += weight * value
+    return totals
 
-def output_action(action: ValueBasedTurn = DEFAULT_ACTION):
-    debug("output_action: " + action.name)
-    print(action.name)
+
+def choose_action(
+    value_matrix: ValueMatrix, weights: List[float]
+) -> Union[None, ValueBasedTurn]:
+    """The action with the highest weighted value, None if they all tie"""
+    totals = weighted_action_values(value_matrix, weights)
+    best = max(totals)
+    if best - min(totals) <= MEDAL_GAIN_EPSILON:
+        return None
+    return ValueBasedTurn(totals.index(best))
+
+
+def choose_actions(
+    value_matrices: List[ValueMatrix], weights: List[List[float]]
+) -> List[Union[None, ValueBasedTurn]]:
+    """
+    choose_action for many recorded states at once, with one weighted sum
+    over a (states, games, actions) array
+    """
+    if np is None:
+        return [
+            choose_action(value_matrix, state_weights)
+            for value_matrix, state_weights in zip(value_matrices, weights)
+        ]
+    if not value_matrices:
+        return []
+
+    nb_games, nb_actions = len(value_matrices[0]), len(ValueBasedTurn)
+    # games with no decision add nothing to any action
+    no_values = [0.0] * nb_actions
+    values = np.fromiter(
+        itertools.chain.from_iterable(
+            no_values if row is None else row
+            for value_matrix in value_matrices
+            for row in value_matrix
+        ),
+        dtype=float,
+        count=len(value_matrices) * nb_games * nb_actions,
+    ).reshape(len(value_matrices), nb_games, nb_actions)
+    state_weights = np.fromiter(
+        itertools.chain.from_iterable(weights),
+        dtype=float,
+        count=len(value_matrices) * nb_games,
+    ).reshape(len(value_matrices), nb_games, 1)
+    totals = (values * state_weights).sum(axis=1)
+    # argmax keeps the first best action like totals.index(), and each row
+    # ties on its own spread like choose_action
+    best = totals.argmax(axis=1).tolist()
+    ties = (totals.max(axis=1) - totals.min(axis=1) <= MEDAL_GAIN_EPSILON).tolist()
+    actions = list(ValueBasedTurn)
+    return [None if tie else actions[action] for action, tie in zip(best, ties)]
 
 
 @dataclass
@@ -101,6 +344,11 @@ class BaseGameInputs:
     def should_force_priority(self) -> bool:
         return False
 
+    @property
+    def is_stunned(self) -> bool:
+        """Whether our action this turn is ignored by the game"""
+        return False
+
     @property
     def game_state(self) -> GameState:
         game_state = GameState(
@@ -132,11 +380,284 @@ class BaseGameInputs:
             )
         )
 
+    def continues_race(self, previous: "BaseGameInputs") -> bool:
+        """Whether these inputs follow on from `previous` in the same race"""
+        return self.gpu == previous.gpu
+
+    def possible_actions(
+        self, previous: "BaseGameInputs", player: int
+    ) -> Union[None, Set[ValueBasedTurn]]:
+        """
+        Actions that take `player` from `previous` to these registers, None
+        when they don't tell, e.g. while stunned
+        """
+        return None
+
+    def register_changes(self, previous: "BaseGameInputs") -> Dict[str, int]:
+        """How each register moved since `previous`, unchanged ones left out"""
+        return {
+            name: value - getattr(previous, name)
+            for name, value in asdict(self).items()
+            if isinstance(value, int) and value != getattr(previous, name)
+        }
+
+    # Race model used by the medal estimator, each game fills these in
+
+    def _medal_turns(self) -> int:
+        return 0
+
+    def _medal_initial_state(self, player: int) -> tuple:
+        return ()
+
+    def _medal_step(
+        self, state: tuple, turn: int, action: ValueBasedTurn
+    ) -> List[Tuple[float, tuple]]:
+        return [(1.0, state)]
+
+    def _medal_preferred_action(self, state: tuple, turn: int) -> ValueBasedTurn:
+        return DEFAULT_ACTION
+
+    def _medal_score(self, state: tuple) -> float:
+        return 0.0
+
+    def _medal_policy_step(
+        self, state: tuple, turn: int, focus: float
+    ) -> List[Tuple[float, tuple]]:
+        preferred = self._medal_preferred_action(state, turn)
+        transitions = []
+        for action in ValueBasedTurn:
+            weight = (1 - focus) / len(ValueBasedTurn)
+            if action == preferred:
+                weight += focus
+            for prob, next_state in self._medal_step(state, turn, action):
+                transitions.append((weight * prob, next_state))
+        return transitions
+
+    def _score_distribution(
+        self,
+        distribution: StateDistribution,
+        first_turn: int,
+        transitions_cache: Dict[Tuple[tuple, int, float], List[Tuple[float, tuple]]],
+        deadline: float,
+        focus: float = MEDAL_FOCUS,
+    ) -> Dict[float, float]:
+        for turn in range(first_turn, self._medal_turns()):
+            propagated = defaultdict(float)
+            for state, prob in distribution.items():
+                transitions = transitions_cache.get((state, turn, focus))
+                if transitions is None:
+                    # Computing transitions is the slow part, a hurdle step
+                    # can take milliseconds
+                    if time.perf_counter() > deadline:
+                        raise MedalDeadlineExceeded()
+                    transitions = self._medal_policy_step(state, turn, focus)
+                    transitions_cache[(state, turn, focus)] = transitions
+                for step_prob, next_state in transitions:
+                    propagated[next_state] += prob * step_prob
+            distribution = _prune_distribution(propagated)
+
+        scores = defaultdict(float)
+        for state, prob in distribution.items():
+            scores[self._medal_score(state)] += prob
+        return scores
+
+    def medal_chances_by_action(self, deadline: float) -> Union[None, List[MedalChances]]:
+        """
+        Our medal odds in the running race for each action this turn, None
+        when `deadline`, a time.perf_counter() value, passes first
+        """
+        if self.gpu == "GAME_OVER" or self._medal_turns() < 1:
+            return None
+
+        try:
+            return self._medal_chances_by_action(deadline)
+        except MedalDeadlineExceeded:
+            debug("{}: medal estimation out of time".format(self.game))
+            return None
+
+    def _medal_chances_by_action(self, deadline: float) -> List[MedalChances]:
+        # Players often pass through the same states, share their transitions
+        transitions_cache = {}
+        opponents = [
+            self._score_distribution(
+                {self._medal_initial_state(player): 1.0},
+                0,
+                transitions_cache,
+                deadline,
+                OPPONENT_MODEL.focus(player, self.game),
+            )
+            for player in OPPONENTS
+        ]
+
+        ours = self._medal_initial_state(0)
+        by_first_step: Dict[tuple, MedalChances] = {}
+        chances = []
+        for action in ValueBasedTurn:
+            first_step = defaultdict(float)
+            for prob, state in self._medal_step(ours, 0, action):
+                first_step[state] += prob
+            key = tuple(sorted(first_step.items()))
+            if key not in by_first_step:
+                by_first_step[key] = medal_chances_from_scores(
+                    self._score_distribution(
+                        dict(first_step), 1, transitions_cache, deadline
+                    ),
+                    opponents,
+                )
+            chances.append(by_first_step[key])
+        return chances
+
+
+################
+# RACE TRACKING
+################
+
+
+class RaceTracker:
+    """
+    Follows one mini-game from turn to turn
+
+    Each turn's inputs are compared with the previous turn's to tell a race
+    carrying on from a new one, and to see how every register moved. Plans
+    cached with `plan` last until the race they were built for is over.
+    """
+
+    def __init__(self, game: str):
+        self.game = game
+        self.previous: Union[None, BaseGameInputs] = None
+        self.races = 0
+        # turns played in the current race before this one
+        self.race_turn = 0
+        self.new_race = False
+        self.changes: Dict[str, int] = {}
+        # last turn's inputs, only while the same race is going on
+        self.continued_from: Union[None, BaseGameInputs] = None
+        self._plans: Dict[str, Any] = {}
+
+    def update(self, inputs: BaseGameInputs):
+        previous, self.previous = self.previous, inputs
+        self.new_race = False
+        self.changes = {}
+        self.continued_from = None
+
+        if inputs.gpu == "GAME_OVER":
+            self._plans.clear()
+            return
+
+        if (
+            previous is None
+            or previous.gpu == "GAME_OVER"
+            or not inputs.continues_race(previous)
+        ):
+            self.new_race = True
+            self.races += 1
+            self.race_turn = 0
+            self._plans.clear()
+            debug("RaceTracker: {} race {} started".format(self.game, self.races))
+            return
+
+        self.race_turn += 1
+        self.changes = inputs.register_changes(previous)
+        self.continued_from = previous
+
+    def plan(
+        self,
+        name: str,
+        build: Callable[[], Any],
+        is_valid: Union[None, Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        The plan called `name` for the current race, built on first use
+
+        `is_valid` guards against callers asking about some other race than
+        the one being tracked.
+        """
+        plan = self._plans.get(name)
+        if plan is None or (is_valid is not None and not is_valid(plan)):
+            plan = self._plans[name] = build()
+        return plan
+
+
+RACE_TRACKERS: Dict[str, RaceTracker] = {game: RaceTracker(game) for game in MEDAL_GAMES}
+
 
 ################
 # HURDLE GAME
 ################
 
+HURDLE_STUN_TURNS = 3
+HURDLE_RUN_SPACES = {
+    ValueBasedTurn.LEFT: 1,
+    ValueBasedTurn.DOWN: 2,
+    ValueBasedTurn.RIGHT: 3,
+}
+
+
+class HurdleTrack:
+    """
+    A hurdle track as an integer bitmask, bit i is set when square i holds a
+    hurdle
+
+    Hurdle queries become shifts and masks, and the turns each square needs to
+    reach the finish are worked out once per track, so projecting any player
+    is a lookup.
+    """
+
+    def __init__(self, gpu: str):
+        self.gpu = gpu
+        self.finish = len(gpu) - 1
+        self.hurdles = int(gpu[::-1].replace(".", "0").replace("#", "1"), 2)
+        # nothing stops a player on the finish square
+        self.hurdles &= (1 << self.finish) - 1
+
+        # turns_to_finish[pos] following preferred_action, stuns included
+        self.turns_to_finish = [0] * (self.finish + 1)
+        for pos in range(self.finish - 1, -1, -1):
+            landing, hit = self.move(pos, self.preferred_action(pos))
+            self.turns_to_finish[pos] = (
+                1 + (HURDLE_STUN_TURNS if hit else 0) + self.turns_to_finish[landing]
+            )
+
+    def next_hurdle(self, pos: int) -> int:
+        """Square of the first hurdle after `pos`, -1 if there are none left"""
+        ahead = self.hurdles >> (pos + 1)
+        if not ahead:
+            return -1
+        return pos + (ahead & -ahead).bit_length()
+
+    def move(self, pos: int, action: ValueBasedTurn) -> Tuple[int, bool]:
+        """
+        Apply one hurdle turn to a single player
+
+        Returns the new position and whether the player hit a hurdle. Jumping
+        only checks the landing square, running stops on the first hurdle.
+        """
+        if action == ValueBasedTurn.UP:
+            landing = min(pos + 2, self.finish)
+            return landing, bool((self.hurdles >> landing) & 1)
+
+        run = HURDLE_RUN_SPACES[action]
+        in_the_way = (self.hurdles >> (pos + 1)) & ((1 << run) - 1)
+        if in_the_way:
+            return pos + (in_the_way & -in_the_way).bit_length(), True
+        return min(pos + run, self.finish), False
+
+    def preferred_action(self, pos: int) -> ValueBasedTurn:
+        """The solved policy for the hurdles on the next few squares"""
+        window = (self.hurdles >> (pos + 1)) & ((1 << POLICY_HURDLE_WINDOW) - 1)
+        return ValueBasedTurn(HURDLE_POLICY[window])
+
+    def projected_finish(self, pos: int, stun: int) -> int:
+        """Turns a player needs to finish if they always get their way"""
+        return stun + self.turns_to_finish[min(pos, self.finish)]
+
+
+def get_hurdle_track(gpu: str) -> HurdleTrack:
+    """The track only changes when a new race starts"""
+    return RACE_TRACKERS["HURDLE"].plan(
+        "track", lambda: HurdleTrack(gpu=gpu), lambda track: track.gpu == gpu
+    )
+
 
 @dataclass
 class HurdleGameInputs(BaseGameInputs):
@@ -178,35 +699,73 @@ class HurdleGameInputs(BaseGameInputs):
         return self.current_place == 3
 
     @property
-    def optimal_action(self) -> Union[None, ValueBasedTurn]:
-
-        self.debug_state()
+    def is_stunned(self) -> bool:
+        return self.player_0_risk > 0
 
+    @property
+    def remaining_turns(self) -> Union[None, int]:
+        # the race ends as soon as anyone finishes
         if self.gpu == "GAME_OVER":
             return None
+        return min(self.projected_finishes)
 
-        if self.player_0_risk > 0:
+    @property
+    def track(self) -> HurdleTrack:
+        return get_hurdle_track(self.gpu)
+
+    def continues_race(self, previous: BaseGameInputs) -> bool:
+        # nobody moves backwards on the same track
+        return self.gpu == previous.gpu and all(
+            getattr(self, f"player_{p}_pos") >= getattr(previous, f"player_{p}_pos")
+            for p in range(3)
+        )
+
+    def possible_actions(
+        self, previous: BaseGameInputs, player: int
+    ) -> Union[None, Set[ValueBasedTurn]]:
+        pos = getattr(previous, f"player_{player}_pos")
+        if getattr(previous, f"player_{player}_risk") > 0 or pos >= self.track.finish:
             return None
+        moved = (
+            getattr(self, f"player_{player}_pos"),
+            getattr(self, f"player_{player}_risk") == HURDLE_STUN_TURNS,
+        )
+        return {action for action in ValueBasedTurn if self.track.move(pos, action) == moved}
 
-        action = ValueBasedTurn.RIGHT
+    @property
+    def player_actions(self) -> List[Union[None, ValueBasedTurn]]:
+        """Each player's preferred action, None while stunned"""
+        track = self.track
+        return [
+            None if stun > 0 else track.preferred_action(pos)
+            for pos, stun in [
+                (self.player_0_pos, self.player_0_risk),
+                (self.player_1_pos, self.player_1_risk),
+                (self.player_2_pos, self.player_2_risk),
+            ]
+        ]
 
-        try:
-            turns_until_next_hurdle = self.gpu[self.player_0_pos :].index("#")
-            debug(
-                "turns_until_next_hurdle: {}".format(turns_until_next_hurdle),
-            )
+    @property
+    def projected_finishes(self) -> List[int]:
+        """Turns each player needs to finish if nothing gets in their way"""
+        track = self.track
+        return [
+            track.projected_finish(self.player_0_pos, self.player_0_risk),
+            track.projected_finish(self.player_1_pos, self.player_1_risk),
+            track.projected_finish(self.player_2_pos, self.player_2_risk),
+        ]
 
-            if not turns_until_next_hurdle or turns_until_next_hurdle > 3:
-                action = ValueBasedTurn.RIGHT
-            if turns_until_next_hurdle == 3:
-                action = ValueBasedTurn.DOWN
-            if turns_until_next_hurdle == 2:
-                action = ValueBasedTurn.LEFT
-            if turns_until_next_hurdle == 1:
-                action = ValueBasedTurn.UP
+    @property
+    def optimal_action(self) -> Union[None, ValueBasedTurn]:
+
+        self.debug_state()
 
-        except Exception as exc:
-            debug(exc)  # list index out of range is expected
+        if self.gpu == "GAME_OVER":
+            return None
+
+        action = self.player_actions[0]
+        if action is None:
+            return None
 
         debug(
             "HurdleGameInputs._hurdle_determine_optimal_action_for_game: {}".format(
@@ -216,11 +775,95 @@ class HurdleGameInputs(BaseGameInputs):
 
         return action
 
+    def _medal_turns(self) -> int:
+        return MEDAL_MAX_TURNS
+
+    def _medal_initial_state(self, player: int) -> tuple:
+        # (position, stun timer, turn the player finished or -1)
+        pos = getattr(self, f"player_{player}_pos")
+        stun = getattr(self, f"player_{player}_risk")
+        return (pos, stun, 0 if pos >= len(self.gpu) - 1 else -1)
+
+    def _medal_step(
+        self, state: tuple, turn: int, action: ValueBasedTurn
+    ) -> List[Tuple[float, tuple]]:
+        pos, stun, finished = state
+        if finished >= 0:
+            return [(1.0, state)]
+        if stun > 0:
+            return [(1.0, (pos, stun - 1, -1))]
+
+        pos, stunned = self.track.move(pos, action)
+        return [
+            (
+                1.0,
+                (
+                    pos,
+                    HURDLE_STUN_TURNS if stunned else 0,
+                    turn if pos >= len(self.gpu) - 1 else -1,
+                ),
+            )
+        ]
+
+    def _medal_preferred_action(self, state: tuple, turn: int) -> ValueBasedTurn:
+        return self.track.preferred_action(state[0])
+
+    def _medal_score(self, state: tuple) -> float:
+        pos, _, finished = state
+        if finished >= 0:
+            # finishing sooner beats any position still on the track
+            return 1000 - finished
+        return pos
+
 
 ################
 # ARCHERY GAME
 ################
 
+ARCHERY_LIMIT = 20
+ARCHERY_DIRECTIONS = {
+    ValueBasedTurn.UP: (0, -1),
+    ValueBasedTurn.LEFT: (-1, 0),
+    ValueBasedTurn.DOWN: (0, 1),
+    ValueBasedTurn.RIGHT: (1, 0),
+}
+
+
+ARCHERY_MIRRORED = {
+    ValueBasedTurn.UP: ValueBasedTurn.DOWN,
+    ValueBasedTurn.LEFT: ValueBasedTurn.RIGHT,
+    ValueBasedTurn.DOWN: ValueBasedTurn.UP,
+    ValueBasedTurn.RIGHT: ValueBasedTurn.LEFT,
+}
+
+
+def archery_policy_action(x: int, y: int, winds: str) -> ValueBasedTurn:
+    """
+    The solved policy for this wind and the turns left
+
+    Tables only cover x, y >= 0, other quadrants mirror the action back.
+    """
+    side = ARCHERY_LIMIT + 1
+    turns = min(len(winds), POLICY_ARCHERY_TURNS)
+    action = ValueBasedTurn(
+        ARCHERY_POLICY[
+            ((turns - 1) * 10 + int(winds[0])) * side * side + abs(x) * side + abs(y)
+        ]
+    )
+    if (x < 0 and action in (ValueBasedTurn.LEFT, ValueBasedTurn.RIGHT)) or (
+        y < 0 and action in (ValueBasedTurn.UP, ValueBasedTurn.DOWN)
+    ):
+        return ARCHERY_MIRRORED[action]
+    return action
+
+
+def archery_move(x: int, y: int, wind: int, action: ValueBasedTurn) -> Tuple[int, int]:
+    dx, dy = ARCHERY_DIRECTIONS[action]
+    return (
+        max(-ARCHERY_LIMIT, min(ARCHERY_LIMIT, x + dx * wind)),
+        max(-ARCHERY_LIMIT, min(ARCHERY_LIMIT, y + dy * wind)),
+    )
+
 
 @dataclass
 class ArcheryGameInputs(BaseGameInputs):
@@ -274,8 +917,20 @@ class ArcheryGameInputs(BaseGameInputs):
             return False
         return self.current_place == 3
 
-    def _get_distance_from_center(self):
-        return 0 - self.player_0_x, 0 - self.player_0_y
+    def continues_race(self, previous: BaseGameInputs) -> bool:
+        # one wind is used up every turn
+        return self.gpu == previous.gpu[1:]
+
+    def possible_actions(
+        self, previous: BaseGameInputs, player: int
+    ) -> Union[None, Set[ValueBasedTurn]]:
+        x = getattr(previous, f"player_{player}_x")
+        y = getattr(previous, f"player_{player}_y")
+        moved = (getattr(self, f"player_{player}_x"), getattr(self, f"player_{player}_y"))
+        wind = int(previous.gpu[0])
+        return {
+            action for action in ValueBasedTurn if archery_move(x, y, wind, action) == moved
+        }
 
     def _get_distance_from_center_total(self, x, y):
         return abs(x) + abs(y)
@@ -288,28 +943,7 @@ class ArcheryGameInputs(BaseGameInputs):
         if self.gpu == "GAME_OVER":
             return None
 
-        action = ValueBasedTurn.LEFT
-
-        try:
-            current_wind = int(self.gpu[0])
-        except:
-            current_wind = 0
-        distance_x, distance_y = self._get_distance_from_center()
-
-        debug(f"current_wind: {current_wind}")
-        debug(f"x,y: {distance_x}, {distance_y}")
-
-        if abs(distance_x) > abs(distance_y):
-            if current_wind - distance_x >= 0:
-                action = ValueBasedTurn.LEFT
-            else:
-                action = ValueBasedTurn.RIGHT
-
-        else:
-            if current_wind - distance_y >= 0:
-                action = ValueBasedTurn.UP
-            else:
-                action = ValueBasedTurn.DOWN
+        action = archery_policy_action(self.player_0_x, self.player_0_y, self.gpu)
 
         debug(
             "ArcheryGameInputs._hurdle_determine_optimal_action_for_game: {}".format(
@@ -319,11 +953,186 @@ class ArcheryGameInputs(BaseGameInputs):
 
         return action
 
+    def _medal_turns(self) -> int:
+        return len(self.gpu)
+
+    def _medal_initial_state(self, player: int) -> tuple:
+        return (
+            getattr(self, f"player_{player}_x"),
+            getattr(self, f"player_{player}_y"),
+        )
+
+    def _medal_step(
+        self, state: tuple, turn: int, action: ValueBasedTurn
+    ) -> List[Tuple[float, tuple]]:
+        return [(1.0, archery_move(state[0], state[1], int(self.gpu[turn]), action))]
+
+    def _medal_preferred_action(self, state: tuple, turn: int) -> ValueBasedTurn:
+        return archery_policy_action(state[0], state[1], self.gpu[turn:])
+
+    def _medal_score(self, state: tuple) -> float:
+        # closest to the center wins
+        return -(state[0] ** 2 + state[1] ** 2)
+
 
 ################
 # SKATING GAME
 ################
 
+# Rule model, indexed by position in this turn's risk order
+SKATING_SPACES = (1, 2, 2, 3)
+SKATING_RISK_DELTAS = (-1, 0, 1, 2)
+SKATING_COLLISION_RISK = 2
+SKATING_STUN_RISK = 5
+SKATING_STUN_TURNS = 2
+SKATING_TRACK_LENGTH = 10
+SKATING_MAX_TURNS = 15
+
+# Chance of landing on the same square as one of the two opponents on a
+# future turn
+SKATING_FUTURE_COLLISION = 1 - (1 - 1 / SKATING_TRACK_LENGTH) ** 2
+
+# Every order the risk letters can be shuffled into, computed once
+SKATING_RISK_ORDERS: List[Tuple[ValueBasedTurn, ...]] = list(
+    itertools.permutations(ValueBasedTurn)
+)
+
+
+def skating_step(risk: int, index: int, collided: bool) -> Tuple[int, int]:
+    """
+    Apply one skating turn to a single player
+
+    Returns the spaces moved and the new risk register, which is negative
+    while the player is stunned
+    """
+    if risk < 0:
+        return 0, risk + 1
+
+    risk = max(0, risk + SKATING_RISK_DELTAS[index])
+    if collided:
+        risk += SKATING_COLLISION_RISK
+    if risk >= SKATING_STUN_RISK:
+        return SKATING_SPACES[index], -SKATING_STUN_TURNS
+    return SKATING_SPACES[index], risk
+
+
+class SkatingEvaluator:
+    """
+    Expected spaces gained over the rest of a skating race
+
+    On future turns we get the best risk-order index with probability
+    `control`. Otherwise the action is dictated by another game and lands on
+    whichever index the unknown risk order puts it at, averaged over all
+    SKATING_RISK_ORDERS.
+
+    The default model is read from the policy tables, any other one is
+    solved here.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = SKATING_MAX_TURNS,
+        control: float = SKATING_CONTROL,
+        collision_chance: float = SKATING_FUTURE_COLLISION,
+    ):
+        self.control = control
+        self.collision_chance = collision_chance
+        self.index_weights = self._index_weights_for_fixed_action()
+        if (
+            max_turns == SKATING_MAX_TURNS
+            and control == POLICY_SKATING_CONTROL
+            and collision_chance == SKATING_FUTURE_COLLISION
+        ):
+            self._load_policy_tables()
+            return
+
+        # values[turns][risk] for risk in -SKATING_STUN_TURNS..SKATING_STUN_RISK - 1
+        self.values: List[Dict[int, float]] = [
+            {risk: 0.0 for risk in self.risk_states()}
+        ]
+        for _ in range(max_turns):
+            self.values.append(self._solve_turn(self.values[-1]))
+        # best_indices[turns][risk], the index to aim for with `turns` to go after it
+        self.best_indices: List[Dict[int, int]] = [
+            {
+                risk: max(
+                    range(len(SKATING_SPACES)),
+                    key=lambda index: self._expected_from(
+                        future, risk, index, self.collision_chance
+                    ),
+                )
+                for risk in self.risk_states()
+            }
+            for future in self.values
+        ]
+
+    def _load_policy_tables(self):
+        risks = self.risk_states()
+        self.values = []
+        self.best_indices = []
+        for turns in range(SKATING_MAX_TURNS + 1):
+            offset = turns * len(risks)
+            self.values.append(
+                {
+                    risk: SKATING_POLICY_VALUES[offset + i] / POLICY_SKATING_VALUE_SCALE
+                    for i, risk in enumerate(risks)
+                }
+            )
+            self.best_indices.append(
+                {risk: SKATING_POLICY_INDICES[offset + i] for i, risk in enumerate(risks)}
+            )
+
+    @staticmethod
+    def risk_states() -> range:
+        return range(-SKATING_STUN_TURNS, SKATING_STUN_RISK)
+
+    @staticmethod
+    def _index_weights_for_fixed_action() -> List[float]:
+        action = DEFAULT_ACTION
+        weights = [0.0] * len(SKATING_SPACES)
+        for order in SKATING_RISK_ORDERS:
+            weights[order.index(action)] += 1 / len(SKATING_RISK_ORDERS)
+        return weights
+
+    def expected_value(
+        self, turns: int, risk: int, index: int, collision_chance: float
+    ) -> float:
+        """Spaces from playing `index` now plus the expected rest of the race"""
+        future = self.values[max(0, min(turns, len(self.values) - 1))]
+        return self._expected_from(future, risk, index, collision_chance)
+
+    def best_index(self, turns: int, risk: int) -> int:
+        return self.best_indices[max(0, min(turns, len(self.best_indices) - 1))][risk]
+
+    def _solve_turn(self, future: Dict[int, float]) -> Dict[int, float]:
+        values = {}
+        for risk in self.risk_states():
+            if risk < 0:
+                values[risk] = future[risk + 1]
+                continue
+            options = [
+                self._expected_from(future, risk, index, self.collision_chance)
+                for index in range(len(SKATING_SPACES))
+            ]
+            values[risk] = self.control * max(options) + (1 - self.control) * sum(
+                weight * option for weight, option in zip(self.index_weights, options)
+            )
+        return values
+
+    @staticmethod
+    def _expected_from(
+        future: Dict[int, float], risk: int, index: int, collision_chance: float
+    ) -> float:
+        spaces, safe_risk = skating_step(risk, index, collided=False)
+        _, hit_risk = skating_step(risk, index, collided=True)
+        return spaces + (
+            (1 - collision_chance) * future[safe_risk]
+            + collision_chance * future[hit_risk]
+        )
+
+
+SKATING_EVALUATOR = SkatingEvaluator()
+
 
 @dataclass
 class SkatingGameInputs(BaseGameInputs):
@@ -364,47 +1173,94 @@ class SkatingGameInputs(BaseGameInputs):
             return False
         return self.current_place == 3
 
-    def _map_gpu_to_actions(self) -> List[ValueBasedTurn]:
-        return [_map_letter_to_action(letter=l) for l in self.gpu]
+    @property
+    def is_stunned(self) -> bool:
+        return self.player_0_risk < 0
 
-    def _determine_intersector_risk(self) -> int:
+    @property
+    def remaining_turns(self) -> Union[None, int]:
+        if self.gpu == "GAME_OVER":
+            return None
+        return self.turns_left
 
-        if (
-            self.player_0_spaces % 10 == self.player_1_spaces % 10
-            or self.player_0_spaces % 10 == self.player_2_spaces % 10
-        ):
-            return 2
+    def continues_race(self, previous: BaseGameInputs) -> bool:
+        # the risk order is reshuffled every turn, only the countdown carries on
+        return self.turns_left == previous.turns_left - 1
 
-        return 0
+    def possible_actions(
+        self, previous: BaseGameInputs, player: int
+    ) -> Union[None, Set[ValueBasedTurn]]:
+        risk = getattr(previous, f"player_{player}_risk")
+        if risk < 0:
+            return None
+        moved = (
+            getattr(self, f"player_{player}_spaces")
+            - getattr(previous, f"player_{player}_spaces"),
+            getattr(self, f"player_{player}_risk"),
+        )
+        return {
+            action
+            for index, action in enumerate(previous._map_gpu_to_actions())
+            if moved in (skating_step(risk, index, False), skating_step(risk, index, True))
+        }
 
-    @property
-    def optimal_action(self) -> Union[None, ValueBasedTurn]:
+    def _map_gpu_to_actions(self) -> List[ValueBasedTurn]:
+        return [_map_letter_to_action(letter=l) for l in self.gpu]
 
-        self.debug_state()
+    def _collision_chance(self, index: int) -> float:
+        """
+        Chance that an opponent finishes this turn on the square we land on,
+        assuming opponents pick any risk-order index with equal odds
+        """
+        landing = (self.player_0_spaces + SKATING_SPACES[index]) % SKATING_TRACK_LENGTH
+
+        miss_chance = 1.0
+        for spaces, risk in [
+            (self.player_1_spaces, self.player_1_risk),
+            (self.player_2_spaces, self.player_2_risk),
+        ]:
+            if risk < 0:
+                # stunned opponents stay put
+                hit = float(spaces % SKATING_TRACK_LENGTH == landing)
+            else:
+                hit = sum(
+                    (spaces + moved) % SKATING_TRACK_LENGTH == landing
+                    for moved in SKATING_SPACES
+                ) / len(SKATING_SPACES)
+            miss_chance *= 1 - hit
+
+        return 1 - miss_chance
 
+    @property
+    def action_values(self) -> Union[None, List[float]]:
+        """Expected spaces over the rest of the race for each action"""
         if self.gpu == "GAME_OVER":
             return None
 
-        action = ValueBasedTurn.RIGHT
-
         if self.player_0_risk < 0:
-            # stunned, don't care
+            # stunned, every action is worth the same
             return None
 
-        converted_gpu: List[ValueBasedTurn] = self._map_gpu_to_actions()
-        risk = self.player_0_risk + self._determine_intersector_risk()
+        values = [0.0] * len(ValueBasedTurn)
+        for index, action in enumerate(self._map_gpu_to_actions()):
+            values[action] = SKATING_EVALUATOR.expected_value(
+                turns=self.turns_left - 1,
+                risk=self.player_0_risk,
+                index=index,
+                collision_chance=self._collision_chance(index),
+            )
+        return values
 
-        # if self.player_0_risk >= 5:
-        #     # decrease risk
-        #     action = converted_gpu[0]
+    @property
+    def optimal_action(self) -> Union[None, ValueBasedTurn]:
 
-        if risk >= 3:
-            # decrease risk
-            action = converted_gpu[0]
+        self.debug_state()
 
-        else:
-            # decrease risk
-            action = converted_gpu[3]
+        action_values = self.action_values
+        if action_values is None:
+            return None
+
+        action = ValueBasedTurn(action_values.index(max(action_values)))
 
         debug(
             "SkatingGameInputs._hurdle_determine_optimal_action_for_game: {}".format(
@@ -414,18 +1270,122 @@ class SkatingGameInputs(BaseGameInputs):
 
         return action
 
+    def _medal_turns(self) -> int:
+        return self.turns_left
+
+    def _medal_initial_state(self, player: int) -> tuple:
+        return (
+            getattr(self, f"player_{player}_spaces"),
+            getattr(self, f"player_{player}_risk"),
+        )
+
+    def _skating_transitions(
+        self, state: tuple, index: int, collision_chance: float
+    ) -> List[Tuple[float, tuple]]:
+        spaces, risk = state
+        moved, safe_risk = skating_step(risk, index, collided=False)
+        _, hit_risk = skating_step(risk, index, collided=True)
+        return [
+            (1 - collision_chance, (spaces + moved, safe_risk)),
+            (collision_chance, (spaces + moved, hit_risk)),
+        ]
+
+    def _medal_preferred_action(self, state: tuple, turn: int) -> ValueBasedTurn:
+        # Only meaningful this turn, while the risk order is known
+        index = SKATING_EVALUATOR.best_index(turns=self.turns_left - turn - 1, risk=state[1])
+        return self._map_gpu_to_actions()[index]
+
+    def _medal_step(
+        self, state: tuple, turn: int, action: ValueBasedTurn
+    ) -> List[Tuple[float, tuple]]:
+        # Only used for our own first move, where the risk order is known
+        index = self._map_gpu_to_actions().index(action)
+        return self._skating_transitions(state, index, self._collision_chance(index))
+
+    def _medal_policy_step(
+        self, state: tuple, turn: int, focus: float
+    ) -> List[Tuple[float, tuple]]:
+        # Players aim for a risk-order index, whatever letter it is behind
+        preferred = SKATING_EVALUATOR.best_index(
+            turns=self.turns_left - turn - 1, risk=state[1]
+        )
+        transitions = []
+        for index in range(len(SKATING_SPACES)):
+            weight = (1 - focus) / len(SKATING_SPACES)
+            if index == preferred:
+                weight += focus
+            for prob, next_state in self._skating_transitions(
+                state, index, SKATING_FUTURE_COLLISION
+            ):
+                transitions.append((weight * prob, next_state))
+        return transitions
+
+    def _medal_score(self, state: tuple) -> float:
+        return state[0]
+
 
 ################
 # DIVING GAME
 ################
 
 
+class DivingComboPlan:
+    """
+    Expected diving points over a race's dive letters
+
+    Starting letter `turn` on combo `c`, the expected points to the end of
+    the race are linear in the combo: slopes[turn] * c + offsets[turn].
+    Both arrays come from one backward pass, so the cost of missing any
+    letter (the points now plus the combo reset) is O(1) afterwards.
+    """
+
+    def __init__(self, gpu: str, match_chances: Union[None, List[float]] = None):
+        self.gpu = gpu
+        if match_chances is None:
+            match_chances = [DIVING_MATCH_CHANCE] * len(gpu)
+
+        self.slopes = [0.0] * (len(gpu) + 1)
+        self.offsets = [0.0] * (len(gpu) + 1)
+        for turn in range(len(gpu) - 1, -1, -1):
+            chance = match_chances[turn]
+            slope, offset = self.slopes[turn + 1], self.offsets[turn + 1]
+            # hit: combo + 1 points now, then carry the combo forward
+            # miss: combo resets to 0
+            self.slopes[turn] = chance * (1 + slope)
+            self.offsets[turn] = chance * (1 + slope + offset) + (1 - chance) * offset
+
+    def turn_for(self, remaining_gpu: str) -> int:
+        return len(self.gpu) - len(remaining_gpu)
+
+    def expected_points(self, turn: int, combo: int) -> float:
+        return self.slopes[turn] * combo + self.offsets[turn]
+
+    def miss_cost(self, turn: int, combo: int) -> float:
+        """Expected points lost by missing letter `turn` while on `combo`"""
+        return (combo + 1) * (1 + self.slopes[turn + 1])
+
+    def marginal_losses(self, remaining_gpu: str, combo: int) -> List[float]:
+        """Expected points lost for each action on the current letter"""
+        cost = self.miss_cost(self.turn_for(remaining_gpu), combo)
+        losses = [cost] * len(ValueBasedTurn)
+        losses[_map_letter_to_action(remaining_gpu[0])] = 0.0
+        return losses
+
+
+def get_diving_plan(gpu: str) -> DivingComboPlan:
+    """
+    Reuse the plan for the current race, the gpu only loses letters from
+    the front as the race goes on
+    """
+    return RACE_TRACKERS["DIVING"].plan(
+        "combo", lambda: DivingComboPlan(gpu=gpu), lambda plan: plan.gpu.endswith(gpu)
+    )
+
+
 @dataclass
 class DivingGameInputs(BaseGameInputs):
     """Generic holder for game inputs"""
 
-    DIVING_PRIORITY = 4
-
     player_0_points: int
     player_0_combo: int
     # Below unused
@@ -439,6 +1399,18 @@ class DivingGameInputs(BaseGameInputs):
     def current_score(self) -> Union[None, int]:
         return self.player_0_points
 
+    def continues_race(self, previous: BaseGameInputs) -> bool:
+        # one letter is used up every turn
+        return self.gpu == previous.gpu[1:]
+
+    def possible_actions(
+        self, previous: BaseGameInputs, player: int
+    ) -> Union[None, Set[ValueBasedTurn]]:
+        letter = _map_letter_to_action(previous.gpu[0])
+        if getattr(self, f"player_{player}_combo") > 0:
+            return {letter}
+        return set(ValueBasedTurn) - {letter}
+
     @property
     def current_place(self) -> Union[None, int]:
         if (
@@ -475,10 +1447,22 @@ class DivingGameInputs(BaseGameInputs):
             return True
 
         return (
-            self.remaining_turns <= self.DIVING_PRIORITY  # make sure to end on combos
+            self.remaining_turns <= DIVING_PRIORITY  # make sure to end on combos
             or self.current_place == 3  # prioritize if losing
         )
 
+    @property
+    def action_values(self) -> Union[None, List[float]]:
+        """Negated expected points lost for each action"""
+        if self.gpu == "GAME_OVER":
+            return None
+
+        losses = get_diving_plan(self.gpu).marginal_losses(
+            remaining_gpu=self.gpu,
+            combo=self.player_0_combo,
+        )
+        return [-loss for loss in losses]
+
     @property
     def optimal_action(self) -> Union[None, ValueBasedTurn]:
 
@@ -497,6 +1481,871 @@ class DivingGameInputs(BaseGameInputs):
 
         return action
 
+    def _medal_turns(self) -> int:
+        return len(self.gpu)
+
+    def _medal_initial_state(self, player: int) -> tuple:
+        return (
+            getattr(self, f"player_{player}_points"),
+            getattr(self, f"player_{player}_combo"),
+        )
+
+    def _medal_step(
+        self, state: tuple, turn: int, action: ValueBasedTurn
+    ) -> List[Tuple[float, tuple]]:
+        points, combo = state
+        if action == _map_letter_to_action(self.gpu[turn]):
+            return [(1.0, (points + combo + 1, combo + 1))]
+        return [(1.0, (points, 0))]
+
+    def _medal_preferred_action(self, state: tuple, turn: int) -> ValueBasedTurn:
+        return _map_letter_to_action(self.gpu[turn])
+
+    def _medal_score(self, state: tuple) -> float:
+        return state[0]
+
+
+################
+# PRIORITY SCHEDULING
+################
+
+
+def priority_urgency(
+    game_state: GameState, values: Union[None, List[float]], weight: float
+) -> Tuple[float, int]:
+    """
+    How urgently a game asks for its action, higher goes first
+
+    The expected medal points our action can swing in the game, weighted by
+    what they're worth to the final score, then the fewest turns left.
+    """
+    swing = 0.0 if values is None else weight * (max(values) - min(values))
+    # float noise shouldn't outrank a shorter race
+    if swing <= MEDAL_GAIN_EPSILON:
+        swing = 0.0
+    return swing, -game_state.remaining_turns
+
+
+class PriorityScheduler:
+    """
+    Picks the action of the most urgent game asking for priority
+
+    Games whose action can't matter this turn (race over, stunned, no
+    preference or excluded) are dropped before their GameState is built.
+    A game's entry is only recomputed when its registers change, equal
+    urgencies keep MEDAL_GAMES order.
+    """
+
+    def __init__(self, exclude_games: List[str] = PRIORITY_EXCLUDE_GAMES):
+        self.exclude_games = exclude_games
+        # game: ((gpu, registers), GameState or None when not a candidate)
+        self._entries: Dict[str, Tuple[tuple, Union[None, GameState]]] = {}
+
+    def update(self, inputs: BaseGameInputs, registers: List[int]):
+        key = (inputs.gpu, tuple(registers))
+        entry = self._entries.get(inputs.game)
+        if entry is not None and entry[0] == key:
+            return
+
+        game_state = None
+        if (
+            inputs.gpu != "GAME_OVER"
+            and inputs.game not in self.exclude_games
+            and not inputs.is_stunned
+            and inputs.should_force_priority
+        ):
+            game_state = inputs.game_state
+            if game_state.optimal_action is None:
+                game_state = None
+        self._entries[inputs.game] = (key, game_state)
+
+    def ranked(self, value_matrix: ValueMatrix, weights: List[float]) -> List[GameState]:
+        candidates = [
+            game_state
+            for game in MEDAL_GAMES
+            for _, game_state in [self._entries.get(game, (None, None))]
+            if game_state is not None
+        ]
+        return sorted(
+            candidates,
+            key=lambda gs: priority_urgency(
+                gs,
+                value_matrix[MEDAL_GAMES.index(gs.game)],
+                weights[MEDAL_GAMES.index(gs.game)],
+            ),
+            reverse=True,
+        )
+
+    def pick(
+        self, value_matrix: ValueMatrix, weights: List[float]
+    ) -> Union[None, ValueBasedTurn]:
+        ranked = self.ranked(value_matrix, weights)
+        if not ranked:
+            return None
+        debug(
+            "PriorityScheduler: {}".format(
+                ", ".join("{} {}".format(gs.game, gs.optimal_action.name) for gs in ranked)
+            )
+        )
+        return ranked[0].optimal_action
+
+
+PRIORITY_SCHEDULER = PriorityScheduler()
+
+
+################
+# OPPONENT MODEL
+################
+
+# Columns are rotated to our seat as they are read, so everyone after us
+OPPONENTS = tuple(range(1, NB_PLAYERS))
+# Estimates are rounded so players with similar ones share medal transitions
+OPPONENT_FOCUS_STEP = 0.05
+
+
+class OpponentModel:
+    """
+    Running estimate of how often each opponent plays each game's preferred
+    action
+
+    An opponent's action last turn is inferred from how their registers
+    moved in all four games at once: each game narrows down the actions
+    that could have done it. Matches against a game's preference are
+    counted as a fraction when more than one action is left, and the rate
+    random play would reach is taken off before turning it into a focus
+    comparable with MEDAL_FOCUS.
+    """
+
+    def __init__(self, prior_turns: float = OPPONENT_PRIOR_TURNS):
+        self.prior_turns = prior_turns
+        self.prior_rate = MEDAL_FOCUS + (1 - MEDAL_FOCUS) / len(ValueBasedTurn)
+        self.matches = {(p, game): 0.0 for p in OPPONENTS for game in MEDAL_GAMES}
+        self.observations = {(p, game): 0 for p in OPPONENTS for game in MEDAL_GAMES}
+        self.last_actions: Dict[int, Set[ValueBasedTurn]] = {}
+
+    def observe(self, games: List[BaseGameInputs]):
+        """Update from this turn's inputs, the trackers must be up to date"""
+        for player in OPPONENTS:
+            candidates = set(ValueBasedTurn)
+            preferred: Dict[str, ValueBasedTurn] = {}
+            for game in games:
+                previous = RACE_TRACKERS[game.game].continued_from
+                if previous is None:
+                    continue
+                possible = game.possible_actions(previous, player)
+                if possible is None:
+                    continue
+                candidates &= possible
+                preferred[game.game] = previous._medal_preferred_action(
+                    previous._medal_initial_state(player), 0
+                )
+
+            if not candidates or len(candidates) == len(ValueBasedTurn):
+                # nothing learned, or registers we misread
+                continue
+            self.last_actions[player] = candidates
+            for game, action in preferred.items():
+                self.observations[(player, game)] += 1
+                if action in candidates:
+                    self.matches[(player, game)] += 1 / len(candidates)
+
+    def focus(self, player: int, game: str) -> float:
+        """Chance `player` plays `game`'s preferred action rather than any action"""
+        if player not in OPPONENTS:
+            return MEDAL_FOCUS
+        rate = (self.matches[(player, game)] + self.prior_turns * self.prior_rate) / (
+            self.observations[(player, game)] + self.prior_turns
+        )
+        chance = 1 / len(ValueBasedTurn)
+        focus = max(0.0, min(1.0, (rate - chance) / (1 - chance)))
+        return round(round(focus / OPPONENT_FOCUS_STEP) * OPPONENT_FOCUS_STEP, 2)
+
+    def player_focus(self, player: int, games: List[BaseGameInputs]) -> float:
+        """Average focus over the running games"""
+        running = [game.game for game in games if game.gpu != "GAME_OVER"]
+        if not running:
+            return MEDAL_FOCUS
+        return sum(self.focus(player, game) for game in running) / len(running)
+
+    def debug_state(self):
+        debug(
+            "OpponentModel: last actions {} | focus {}".format(
+                {p: sorted(a.name for a in actions) for p, actions in self.last_actions.items()},
+                {
+                    p: [self.focus(p, game) for game in MEDAL_GAMES]
+                    for p in OPPONENTS
+                },
+            )
+        )
+
+
+OPPONENT_MODEL = OpponentModel()
+
+
+################
+# PLAN SEARCH
+################
+
+SEARCH_TIME_BUDGET = 0.01  # seconds per turn
+# Seconds after the turn's input was read, the search gets what's left of it
+SEARCH_DEADLINE = 0.04
+SEARCH_MAX_DEPTH = 8
+SEARCH_TABLE_SIZE = 1 << 16  # slots, a power of 2
+# What one unit of progress is worth in each game: a hurdle turn, a unit of
+# archery distance, a skating space and a diving point
+SEARCH_UNIT_VALUES = [1.0, 0.25, 0.5, 0.2]
+
+# Components of a search state, our own registers across the four games
+(
+    SEARCH_TURN,
+    SEARCH_HURDLE_POS,
+    SEARCH_HURDLE_STUN,
+    SEARCH_ARCHERY_X,
+    SEARCH_ARCHERY_Y,
+    SEARCH_DIVING_POINTS,
+    SEARCH_DIVING_COMBO,
+) = range(7)
+
+
+class ZobristHasher:
+    """
+    Zobrist hashing of search states: one random 64 bit key per (component,
+    value), a state hashes to the XOR of its keys, so changing a component
+    only costs two XORs
+    """
+
+    def __init__(self, seed: int = 2024):
+        self._rng = random.Random(seed)
+        self._keys: Dict[Tuple[int, int], int] = {}
+
+    def key(self, component: int, value: int) -> int:
+        key = self._keys.get((component, value))
+        if key is None:
+            key = self._keys[(component, value)] = self._rng.getrandbits(64)
+        return key
+
+    def hash(self, state: tuple) -> int:
+        h = 0
+        for component, value in enumerate(state):
+            h ^= self.key(component, value)
+        return h
+
+    def update(self, h: int, component: int, old: int, new: int) -> int:
+        if old == new:
+            return h
+        return h ^ self.key(component, old) ^ self.key(component, new)
+
+
+class TranspositionTable:
+    """
+    Fixed number of slots indexed by the low bits of the hash
+
+    A slot is overwritten when it's empty, was stored on an earlier turn, or
+    the new entry was searched at least as deep.
+    """
+
+    def __init__(self, size: int = SEARCH_TABLE_SIZE):
+        self.mask = size - 1
+        self.slots: List[Union[None, tuple]] = [None] * size
+        self.age = 0
+        self.hits = 0
+
+    def new_turn(self):
+        self.age += 1
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+
+    def lookup(self, h: int) -> Union[None, tuple]:
+        """(hash, depth, value, best action, age) or None"""
+        entry = self.slots[h & self.mask]
+        if entry is not None and entry[0] == h:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, h: int, depth: int, value: float, action: Union[None, int]):
+        slot = h & self.mask
+        entry = self.slots[slot]
+        if entry is None or entry[4] != self.age or depth >= entry[1]:
+            self.slots[slot] = (h, depth, value, action, self.age)
+
+
+class PlanSearch:
+    """
+    Iterative deepening over our own next few actions, opponents ignored
+
+    Skating's risk order is only known for this turn, so only the first
+    move counts there and the skating evaluator covers the rest of the race.
+    Search states carry the absolute turn, so nodes searched on the previous
+    turn are found again by this one's search. For that, stored values only
+    depend on the state: hurdle is scored by the turn we'd finish on, and
+    skating is left out of the table and added to the first moves.
+    """
+
+    def __init__(self):
+        self.hasher = ZobristHasher()
+        self.table = TranspositionTable()
+        self._previous_races: Union[None, List[Tuple[int, bool]]] = None
+        self._previous_weights: Union[None, List[float]] = None
+
+    def _start_turn(self, games: List[BaseGameInputs], weights: List[float]):
+        # races started or ended since the last search, even on turns it
+        # didn't run, an ended race drops out of the evaluation
+        races = [
+            (RACE_TRACKERS[game.game].races, game.gpu == "GAME_OVER") for game in games
+        ]
+        if races != self._previous_races or weights != self._previous_weights:
+            # cached values belong to races or standings that are gone
+            self.table.clear()
+        self._previous_races = races
+        self._previous_weights = list(weights)
+        self.table.new_turn()
+
+    def action_values(
+        self,
+        turn: int,
+        games: List[BaseGameInputs],
+        weights: List[float],
+        time_budget: float = SEARCH_TIME_BUDGET,
+    ) -> Union[None, List[float]]:
+        started = time.perf_counter()
+        self._start_turn(games, weights)
+
+        self.hurdle, self.archery, self.skating, self.diving = games
+        self.root_turn = turn
+        self.weights = [w * unit for w, unit in zip(weights, SEARCH_UNIT_VALUES)]
+        self.horizon = max(
+            [0]
+            + [
+                len(game.gpu)
+                for game in (self.archery, self.diving)
+                if game.gpu != "GAME_OVER"
+            ]
+            + [MEDAL_MAX_TURNS if self.hurdle.gpu != "GAME_OVER" else 0]
+        )
+        if self.horizon < 1:
+            return None
+
+        # the skating term only depends on the first move, see the docstring
+        skating_values = self.skating.action_values or [0.0] * len(ValueBasedTurn)
+        self.diving_plan = (
+            get_diving_plan(self.diving.gpu) if self.diving.gpu != "GAME_OVER" else None
+        )
+        self._archery_leaves: Dict[Tuple[int, int, int], float] = {}
+
+        root = (
+            turn,
+            self.hurdle.player_0_pos,
+            self.hurdle.player_0_risk,
+            self.archery.player_0_x,
+            self.archery.player_0_y,
+            self.diving.player_0_points,
+            self.diving.player_0_combo,
+        )
+        root_hash = self.hasher.hash(root)
+
+        values = None
+        elapsed = 0.0
+        for depth in range(1, min(SEARCH_MAX_DEPTH, self.horizon) + 1):
+            values = [
+                self._search(*self._apply(root, root_hash, action), depth - 1)
+                + self.weights[2] * skating_values[action]
+                for action in ValueBasedTurn
+            ]
+            elapsed = time.perf_counter() - started
+            # the next depth costs up to 4 times as much
+            if elapsed * (len(ValueBasedTurn) + 1) > time_budget:
+                break
+
+        debug(
+            "PlanSearch: depth {} in {:.1f}ms, {} table hits".format(
+                depth, elapsed * 1000, self.table.hits
+            )
+        )
+        return values
+
+    def _apply(self, state: tuple, h: int, action: ValueBasedTurn) -> Tuple[tuple, int]:
+        (
+            turn,
+            hurdle_pos,
+            hurdle_stun,
+            archery_x,
+            archery_y,
+            diving_points,
+            diving_combo,
+        ) = state
+        offset = turn - self.root_turn
+        child = list(state)
+        child[SEARCH_TURN] = turn + 1
+
+        if self.hurdle.gpu != "GAME_OVER" and hurdle_pos < len(self.hurdle.gpu) - 1:
+            if hurdle_stun > 0:
+                child[SEARCH_HURDLE_STUN] = hurdle_stun - 1
+            else:
+                pos, hit = self.hurdle.track.move(hurdle_pos, action)
+                child[SEARCH_HURDLE_POS] = pos
+                child[SEARCH_HURDLE_STUN] = HURDLE_STUN_TURNS if hit else 0
+
+        if self.archery.gpu != "GAME_OVER" and offset < len(self.archery.gpu):
+            child[SEARCH_ARCHERY_X], child[SEARCH_ARCHERY_Y] = archery_move(
+                archery_x, archery_y, int(self.archery.gpu[offset]), action
+            )
+
+        if self.diving_plan is not None and offset < len(self.diving.gpu):
+            if action == _map_letter_to_action(self.diving.gpu[offset]):
+                child[SEARCH_DIVING_COMBO] = diving_combo + 1
+                child[SEARCH_DIVING_POINTS] = diving_points + diving_combo + 1
+            else:
+                child[SEARCH_DIVING_COMBO] = 0
+
+        child_hash = h
+        for component, (old, new) in enumerate(zip(state, child)):
+            child_hash = self.hasher.update(child_hash, component, old, new)
+        return tuple(child), child_hash
+
+    def _search(self, state: tuple, h: int, depth: int) -> float:
+        entry = self.table.lookup(h)
+        if entry is not None and entry[1] >= depth:
+            return entry[2]
+
+        if depth == 0 or state[SEARCH_TURN] - self.root_turn >= self.horizon:
+            # the horizon moves with the root, so this is no deeper search
+            value = self._evaluate(state)
+            self.table.store(h, 0, value, None)
+            return value
+
+        # try the previous best action first, it is usually still the best
+        actions = list(ValueBasedTurn)
+        if entry is not None and entry[3] is not None:
+            actions.remove(entry[3])
+            actions.insert(0, ValueBasedTurn(entry[3]))
+
+        best_value, best_action = float("-inf"), None
+        for action in actions:
+            value = self._search(*self._apply(state, h, action), depth - 1)
+            if value > best_value:
+                best_value, best_action = value, action
+
+        self.table.store(h, depth, best_value, int(best_action))
+        return best_value
+
+    def _evaluate(self, state: tuple) -> float:
+        """Weighted progress in every game, with the rest of each race estimated"""
+        offset = state[SEARCH_TURN] - self.root_turn
+        value = 0.0
+
+        if self.hurdle.gpu != "GAME_OVER":
+            finish_turn = state[SEARCH_TURN] + self.hurdle.track.projected_finish(
+                state[SEARCH_HURDLE_POS], state[SEARCH_HURDLE_STUN]
+            )
+            value -= self.weights[0] * finish_turn
+
+        if self.archery.gpu != "GAME_OVER":
+            value -= self.weights[1] * self._archery_leaf(
+                state[SEARCH_ARCHERY_X], state[SEARCH_ARCHERY_Y], offset
+            )
+
+        if self.diving_plan is not None:
+            points = state[SEARCH_DIVING_POINTS]
+            if offset < len(self.diving.gpu):
+                points += self.diving_plan.expected_points(
+                    self.diving_plan.turn_for(self.diving.gpu) + offset,
+                    state[SEARCH_DIVING_COMBO],
+                )
+            value += self.weights[3] * points
+
+        return value
+
+    def _archery_leaf(self, x: int, y: int, offset: int) -> float:
+        """Distance from the center after aiming greedily with the rest of the wind"""
+        key = (x, y, offset)
+        distance = self._archery_leaves.get(key)
+        if distance is None:
+            for wind in self.archery.gpu[offset:]:
+                x, y = min(
+                    (archery_move(x, y, int(wind), action) for action in ValueBasedTurn),
+                    key=lambda cursor: cursor[0] ** 2 + cursor[1] ** 2,
+                )
+            distance = self._archery_leaves[key] = (x**2 + y**2) ** 0.5
+        return distance
+
+
+PLAN_SEARCH = PlanSearch()
+
+
+################
+# ROLLOUTS
+################
+
+ROLLOUT_COUNT = 10000  # playouts per turn, shared between our first actions
+ROLLOUT_BATCH = 2500
+# Smallest batch worth running, also each turn's first one, which is timed
+ROLLOUT_MIN_BATCH = 200
+# Seconds after the turn's input was read, well short of the 50ms limit
+ROLLOUT_DEADLINE = 0.035
+# Only trust a rollout winner this many standard errors ahead of the runner up
+ROLLOUT_CONFIDENCE = 2.0
+
+# Offsets per action, in ValueBasedTurn order
+ROLLOUT_DX = (0, -1, 0, 1)
+ROLLOUT_DY = (-1, 0, 1, 0)
+
+
+class RolloutEngine:
+    """
+    Random playouts of every running race at once, all players included
+
+    State is kept as one (playouts, players) array per register, so every
+    rule is applied to every playout with a handful of numpy operations.
+    Players play a random running game's preferred action with probability
+    MEDAL_FOCUS (opponents: their estimated focus), otherwise any action;
+    skating risk orders past this turn are shuffled per playout.
+    """
+
+    def __init__(self, seed: int = 2024):
+        self.rng = np.random.default_rng(seed)
+        self.dx = np.array(ROLLOUT_DX, np.int16)
+        self.dy = np.array(ROLLOUT_DY, np.int16)
+        # medal points by number of players strictly ahead
+        self.medal_points = np.array([3, 1, 0])
+        self.skating_spaces = np.array(SKATING_SPACES, np.int16)
+        self.skating_risk_deltas = np.array(SKATING_RISK_DELTAS, np.int16)
+        # action -> risk order index and back, flattened rows of one per shuffle
+        self.skating_orders = np.array(
+            [[order.index(action) for action in ValueBasedTurn] for order in SKATING_RISK_ORDERS],
+            np.int16,
+        ).ravel()
+        self.skating_actions = np.array(SKATING_RISK_ORDERS, np.int16).ravel()
+        # greedy archery action for archery_aims[wind, x + limit, y + limit]
+        span = np.arange(-ARCHERY_LIMIT, ARCHERY_LIMIT + 1)
+        x, y = np.meshgrid(span, span, indexing="ij")
+        self.archery_aims = np.array(
+            [
+                np.stack(
+                    [
+                        np.clip(x + dx * wind, -ARCHERY_LIMIT, ARCHERY_LIMIT) ** 2
+                        + np.clip(y + dy * wind, -ARCHERY_LIMIT, ARCHERY_LIMIT) ** 2
+                        for dx, dy in zip(ROLLOUT_DX, ROLLOUT_DY)
+                    ]
+                ).argmin(axis=0)
+                for wind in range(10)
+            ],
+            np.int16,
+        )
+        risk_states = SkatingEvaluator.risk_states()
+        # best_index[turns, risk - risk_states.start]
+        self.skating_best_index = np.array(
+            [
+                [SKATING_EVALUATOR.best_index(turns, risk) for risk in risk_states]
+                for turns in range(SKATING_MAX_TURNS + 1)
+            ]
+        )
+
+    def evaluate(
+        self,
+        games: List[BaseGameInputs],
+        medal_points: List[int],
+        deadline: float,
+        count: int = ROLLOUT_COUNT,
+    ) -> Union[None, Tuple[List[float], List[float]]]:
+        """
+        Mean final score, every game's medal points multiplied together, and
+        its standard error for each of our first actions
+
+        Playouts run in batches until `count` are done. A small first batch
+        is timed, and the next ones are sized from the slowest batch so far
+        to end before `deadline`, a time.perf_counter() value.
+        """
+        started = time.perf_counter()
+        batches = []
+        played = 0
+        # seconds per playout, a batch's overhead included
+        playout_seconds = None
+        while played < count:
+            smallest = min(ROLLOUT_MIN_BATCH, count - played)
+            remaining = deadline - time.perf_counter()
+            if playout_seconds is None:
+                size = smallest if remaining > 0 else 0
+            else:
+                size = min(ROLLOUT_BATCH, count - played, int(remaining / playout_seconds))
+            if size < smallest:
+                break
+
+            batch_started = time.perf_counter()
+            batch = self.playout_scores(games, medal_points, size)
+            if batch is None:
+                return None
+            batches.append(batch)
+            played += batch.size
+            playout_seconds = max(
+                playout_seconds or 0.0, (time.perf_counter() - batch_started) / batch.size
+            )
+
+        if not batches:
+            return None
+        scores = np.concatenate(batches, axis=1)
+        debug(
+            "RolloutEngine: {} playouts in {:.1f}ms".format(
+                scores.size, (time.perf_counter() - started) * 1000
+            )
+        )
+        means = scores.mean(axis=1)
+        errors = scores.std(axis=1) / np.sqrt(scores.shape[1])
+        return means.tolist(), errors.tolist()
+
+    def playout_scores(
+        self, games: List[BaseGameInputs], medal_points: List[int], count: int
+    ) -> Union[None, "np.ndarray"]:
+        """Final scores of `count` playouts, one row per first action"""
+        hurdle, archery, skating, diving = games
+        nb_actions = len(ValueBasedTurn)
+        n = max(1, count // nb_actions) * nb_actions
+        shape = (n, NB_PLAYERS)
+
+        def player_registers(game: BaseGameInputs, name: str):
+            return np.tile(
+                np.array(
+                    [getattr(game, f"player_{p}_{name}") for p in range(NB_PLAYERS)],
+                    np.int16,
+                ),
+                (n, 1),
+            )
+
+        running = [game.gpu != "GAME_OVER" for game in games]
+        turns = [0] * len(games)
+
+        if running[0]:
+            track = hurdle.track
+            finish = np.int16(track.finish)
+            hurdles = np.array([(track.hurdles >> i) & 1 for i in range(finish + 1)], bool)
+            hurdle_preferred = np.array(
+                [track.preferred_action(pos) for pos in range(finish + 1)], np.int16
+            )
+            hurdle_pos = player_registers(hurdle, "pos")
+            hurdle_stun = player_registers(hurdle, "risk")
+            hurdle_done = (hurdle_pos >= finish).any(axis=1)
+            turns[0] = MEDAL_MAX_TURNS
+        if running[1]:
+            winds = [int(wind) for wind in archery.gpu]
+            archery_x = player_registers(archery, "x")
+            archery_y = player_registers(archery, "y")
+            turns[1] = len(winds)
+        if running[2]:
+            first_order = SKATING_RISK_ORDERS.index(tuple(skating._map_gpu_to_actions()))
+            skating_spaces = player_registers(skating, "spaces")
+            skating_risk = player_registers(skating, "risk")
+            turns[2] = skating.turns_left
+        if running[3]:
+            letters = [int(_map_letter_to_action(letter)) for letter in diving.gpu]
+            diving_points = player_registers(diving, "points")
+            diving_combo = player_registers(diving, "combo")
+            turns[3] = len(letters)
+
+        horizon = max(turns)
+        if horizon < 1:
+            return None
+
+        first_actions = np.repeat(np.arange(nb_actions, dtype=np.int16), n // nb_actions)
+        focus = np.array(
+            [MEDAL_FOCUS] + [OPPONENT_MODEL.player_focus(p, games) for p in OPPONENTS]
+        )
+        # a player with no focus at all would divide by zero below
+        np.maximum(focus, 0.01, out=focus)
+        cells = np.arange(n * NB_PLAYERS).reshape(shape)
+        for turn in range(horizon):
+            live = [g for g in range(len(games)) if turn < turns[g]]
+
+            # risk order of every playout this turn, as the offset of its row
+            # in the flattened skating tables
+            if running[2] and turn < turns[2]:
+                if turn == 0:
+                    skating_order = np.full((n, 1), first_order * nb_actions)
+                else:
+                    skating_order = nb_actions * self.rng.integers(
+                        0, len(SKATING_RISK_ORDERS), (n, 1)
+                    )
+
+            preferred = []
+            for g in live:
+                if g == 0:
+                    preferred.append(hurdle_preferred[hurdle_pos])
+                elif g == 1:
+                    preferred.append(
+                        self.archery_aims[
+                            winds[turn],
+                            archery_x + ARCHERY_LIMIT,
+                            archery_y + ARCHERY_LIMIT,
+                        ]
+                    )
+                elif g == 2:
+                    best = self.skating_best_index[
+                        min(turns[2] - turn - 1, SKATING_MAX_TURNS),
+                        skating_risk + SKATING_STUN_TURNS,
+                    ]
+                    preferred.append(np.take(self.skating_actions, skating_order + best))
+                else:
+                    preferred.append(np.full(shape, letters[turn], np.int16))
+
+            # a random live game's preferred action with probability
+            # `focus`, otherwise any action
+            preferred.append(self.rng.integers(0, nb_actions, shape, np.int16))
+            choice = (self.rng.random(shape) * (len(live) / focus)).astype(np.intp)
+            np.minimum(choice, len(live), out=choice)
+            actions = np.take(np.stack(preferred), choice * choice.size + cells)
+            if turn == 0:
+                actions[:, 0] = first_actions
+
+            if running[0] and turn < turns[0]:
+                playing = ~hurdle_done[:, None]
+                stunned = playing & (hurdle_stun > 0)
+                hurdle_stun -= stunned
+                moving = playing & ~stunned
+                jumping = moving & (actions == ValueBasedTurn.UP)
+                landing = np.minimum(hurdle_pos + 2, finish)
+                hit = jumping & hurdles[landing]
+                hurdle_pos[jumping] = landing[jumping]
+                # runs move LEFT=1, DOWN=2, RIGHT=3 squares, stopping on a hurdle
+                running_players = moving & ~jumping
+                for step in range(1, HURDLE_RUN_SPACES[ValueBasedTurn.RIGHT] + 1):
+                    stepping = running_players & (actions >= step) & ~hit
+                    hurdle_pos += stepping
+                    np.minimum(hurdle_pos, finish, out=hurdle_pos)
+                    hit |= stepping & hurdles[hurdle_pos]
+                hurdle_stun[hit] = HURDLE_STUN_TURNS
+                hurdle_done |= (hurdle_pos >= finish).any(axis=1)
+
+            if running[1] and turn < turns[1]:
+                wind = winds[turn]
+                archery_x += self.dx[actions] * wind
+                archery_y += self.dy[actions] * wind
+                np.clip(archery_x, -ARCHERY_LIMIT, ARCHERY_LIMIT, out=archery_x)
+                np.clip(archery_y, -ARCHERY_LIMIT, ARCHERY_LIMIT, out=archery_y)
+
+            if running[2] and turn < turns[2]:
+                # stunned players only count their stun down
+                moved = skating_risk >= 0
+                index = np.take(self.skating_orders, skating_order + actions)
+                skating_spaces += self.skating_spaces[index] * moved
+                skating_risk += 1 + (self.skating_risk_deltas[index] - 1) * moved
+                skating_risk[moved & (skating_risk < 0)] = 0
+                squares = skating_spaces % SKATING_TRACK_LENGTH
+                same_01 = squares[:, 0] == squares[:, 1]
+                same_02 = squares[:, 0] == squares[:, 2]
+                same_12 = squares[:, 1] == squares[:, 2]
+                collided = moved & np.stack(
+                    [same_01 | same_02, same_01 | same_12, same_02 | same_12], axis=1
+                )
+                skating_risk += collided * SKATING_COLLISION_RISK
+                skating_risk[moved & (skating_risk >= SKATING_STUN_RISK)] = -SKATING_STUN_TURNS
+
+            if running[3] and turn < turns[3]:
+                diving_combo += 1
+                diving_combo *= actions == letters[turn]
+                diving_points += diving_combo
+
+        final = np.ones(n)
+        for g in range(len(games)):
+            points = medal_points[g] + MEDAL_WEIGHT_PRIOR
+            if running[g]:
+                if g == 0:
+                    scores = hurdle_pos
+                elif g == 1:
+                    scores = -(archery_x * archery_x + archery_y * archery_y)
+                elif g == 2:
+                    scores = skating_spaces
+                else:
+                    scores = diving_points
+                # ties share the better medal
+                ahead = (scores[:, 1:] > scores[:, :1]).sum(axis=1)
+                points = points + self.medal_points[ahead]
+            final = final * points
+
+        return final.reshape(nb_actions, n // nb_actions)
+
+    def best_action(
+        self, games: List[BaseGameInputs], medal_points: List[int], deadline: float
+    ) -> Union[None, ValueBasedTurn]:
+        """The first action with the best mean, None unless it's clearly ahead"""
+        evaluated = self.evaluate(games, medal_points, deadline)
+        if evaluated is None:
+            return None
+        means, errors = evaluated
+        order = sorted(range(len(means)), key=lambda a: means[a], reverse=True)
+        best, second = order[0], order[1]
+        margin = ROLLOUT_CONFIDENCE * (errors[best] ** 2 + errors[second] ** 2) ** 0.5
+        debug("RolloutEngine: means {} errors {}".format(means, errors))
+        if means[best] - means[second] <= max(margin, MEDAL_GAIN_EPSILON):
+            return None
+        return ValueBasedTurn(best)
+
+
+ROLLOUT_ENGINE = RolloutEngine() if np is not None else None
+
+
+################
+# TRACE
+################
+
+# Set to a file path to append a binary record of every turn
+TRACE_PATH = os.environ.get("LEVEL4_TRACE")
+TRACE_SOURCES = ["value", "rollout", "search", "priority", "default", "error"]
+TRACE_REGISTERS = 7
+# trace id, turn, player, then per game: gpu length and registers (rotated so
+# ours come first), medal points, action and its source, per game and action
+# values, weights and the turn's time in ms. Mirrored by trace_reader.py.
+TRACE_RECORD = struct.Struct(
+    "<IHb"
+    + "B{}h".format(TRACE_REGISTERS) * len(MEDAL_GAMES)
+    + "{}B".format(len(MEDAL_GAMES))
+    + "bb"
+    + "{}f".format(len(MEDAL_GAMES) * len(ValueBasedTurn))
+    + "{}f".format(len(MEDAL_GAMES))
+    + "f"
+)
+
+
+class TraceWriter:
+    """
+    Appends one fixed-width TRACE_RECORD per turn
+
+    Each record goes out in a single unbuffered write, so bots playing in
+    parallel can share a file, the random trace id tells their matches
+    apart. Games with no values this turn are recorded as NaN.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "ab", buffering=0)
+        self.trace_id = random.getrandbits(32)
+
+    def write(
+        self,
+        turn: int,
+        player_idx: int,
+        games: List[BaseGameInputs],
+        registers: List[List[int]],
+        medal_points: List[int],
+        action: ValueBasedTurn,
+        source: str,
+        value_matrix: ValueMatrix,
+        weights: List[float],
+        elapsed: float,
+    ):
+        fields = [self.trace_id, turn, player_idx]
+        for game, game_registers in zip(games, registers):
+            fields.append(0 if game.gpu == "GAME_OVER" else len(game.gpu))
+            fields.extend(game_registers)
+        fields.extend(medal_points)
+        fields.extend([int(action), TRACE_SOURCES.index(source)])
+        for values in value_matrix:
+            fields.extend(values if values is not None else [float("nan")] * len(ValueBasedTurn))
+        fields.extend(weights)
+        fields.append(elapsed * 1000)
+        self.file.write(TRACE_RECORD.pack(*fields))
+
+
+TRACE = TraceWriter(TRACE_PATH) if TRACE_PATH else None
+
 
 ################
 # GAME LOOPS
@@ -505,17 +2354,26 @@ class DivingGameInputs(BaseGameInputs):
 
 player_idx = int(input())
 nb_games = int(input())
+turn = 0
 # game loop
 while True:
-    for i in range(3):
-        score_info = input()
+    turn += 1
+    score_infos = [[int(v) for v in input().split()] for _ in range(3)]
+    turn_started = time.perf_counter()
+    # From here on we are player 0, whichever seat we play from
+    score_infos = rotate_to_seat(score_infos, player_idx, [(0,), (1,), (2,)])
+    medal_points = player_medal_points(score_infos[0])
 
     # Store the optimal actions for each "game" in this turn
     optimal_actions = []
-    game_states: List[GameState] = []
+    games: List[BaseGameInputs] = []
+    medal_chances: List[Union[None, List[MedalChances]]] = []
+    registers: List[List[int]] = []
 
     for i in range(nb_games):
         inputs = input().split()
+        inputs[1:] = rotate_to_seat(inputs[1:], player_idx, SEAT_REGISTERS[i])
+        registers.append([int(v) for v in inputs[1:]])
 
         if i == 0:
             game_inputs = HurdleGameInputs(
@@ -587,21 +2445,79 @@ while True:
                 unused=int(inputs[7]),
             )
 
-        game_states.append(game_inputs.game_state)
+        RACE_TRACKERS[game_inputs.game].update(game_inputs)
+        games.append(game_inputs)
+        PRIORITY_SCHEDULER.update(game_inputs, registers[-1])
+
+    OPPONENT_MODEL.observe(games)
+    OPPONENT_MODEL.debug_state()
+
+    for game_inputs in games:
+        try:
+            medal_chances.append(
+                game_inputs.medal_chances_by_action(turn_started + MEDAL_DEADLINE)
+            )
+        except Exception as e:
+            debug(e)
+            medal_chances.append(None)
+
+    value_matrix = medal_value_matrix(medal_chances)
+    weights = medal_standing_weights(medal_points)
+    debug("value_matrix: {} | weights: {}".format(value_matrix, weights))
 
     try:
         # If diving game is forcing priority, do that
         # if game_states[3].force_priority:
         #     debug("Diving game is priority, using that action...")
         #     output_action(game_states[3].optimal_action)
-        if parse_game_states_for_priority(game_states):
-            debug("Another game has a forced priority, so using that...")
-            output_action(parse_game_states_for_priority(game_states))
+        best_action = choose_action(value_matrix, weights)
+        rollout_action = None
+        if best_action is None and ROLLOUT_ENGINE is not None:
+            rollout_action = ROLLOUT_ENGINE.best_action(
+                games, medal_points, turn_started + ROLLOUT_DEADLINE
+            )
+        search_values = None
+        if best_action is None and rollout_action is None:
+            search_values = PLAN_SEARCH.action_values(
+                turn,
+                games,
+                weights,
+                min(SEARCH_TIME_BUDGET, turn_started + SEARCH_DEADLINE - time.perf_counter()),
+            )
+
+        if best_action is not None:
+            debug("Using the action with the best weighted value...")
+            action, source = best_action, "value"
+        elif rollout_action is not None:
+            debug("No medal at stake this race, using the best rollout...")
+            action, source = rollout_action, "rollout"
+        elif search_values and max(search_values) - min(search_values) > MEDAL_GAIN_EPSILON:
+            debug("No medal at stake, using the best searched plan...")
+            action = ValueBasedTurn(search_values.index(max(search_values)))
+            source = "search"
         else:
-            debug("Just using the mode...")
-            the_mode = get_mode_of_game_states(game_states)
-            output_action(the_mode)
+            action, source = PRIORITY_SCHEDULER.pick(value_matrix, weights), "priority"
+            if action is not None:
+                debug("The most urgent game has a forced priority, so using that...")
+            else:
+                debug("No game has a preference, using the default...")
+                action, source = DEFAULT_ACTION, "default"
 
     except Exception as e:
         debug(e)
-        output_action(DEFAULT_ACTION)
+        action, source = DEFAULT_ACTION, "error"
+
+    output_action(action)
+    if TRACE is not None:
+        TRACE.write(
+            turn=turn,
+            player_idx=player_idx,
+            games=games,
+            registers=registers,
+            medal_points=medal_points,
+            action=action,
+            source=source,
+            value_matrix=value_matrix,
+            weights=weights,
+            elapsed=time.perf_counter() - turn_started,
+        )
@@ -0,0 +1,6 @@
+"""
+Code shared by the Olymbits bots
+
+Bots import from here while developing, build.py inlines whatever they use
+into a single submission file.
+"""
@@ -0,0 +1,33 @@
+import sys
+from enum import Enum
+
+
+class ValueBasedTurn(int, Enum):
+    UP = 0
+    LEFT = 1
+    DOWN = 2
+    RIGHT = 3
+
+
+DEFAULT_ACTION = ValueBasedTurn.RIGHT
+
+
+def _map_letter_to_action(letter: str) -> ValueBasedTurn:
+    if letter == "U":
+        return ValueBasedTurn.UP
+    if letter == "R":
+        return ValueBasedTurn.RIGHT
+    if letter == "D":
+        return ValueBasedTurn.DOWN
+    if letter == "L":
+        return ValueBasedTurn.LEFT
+    return DEFAULT_ACTION
+
+
+def debug(message: str):
+    """ """
+    print(
+        message,
+        file=sys.stderr,
+        flush=False,
+    )
@@ -0,0 +1,276 @@
+"""
+Policy table generator for level4.py
+
+Solves the single-player version of each mini-game offline and embeds the
+optimal actions in level4.py as compressed lookup tables:
+
+    python policy_tables.py --workers 4
+
+General methodology is:
+- Hurdle: the action that gets past the next HURDLE_WINDOW squares soonest,
+  for every arrangement of hurdles on them
+- Archery: finite-horizon MDP over (turns left, wind, |x|, |y|), future winds
+  uniformly random, minimising the expected final distance to the center
+- Skating: value iteration over (turns left, risk), the same model as
+  level4.py's SkatingEvaluator, for a given SKATING_CONTROL
+- Each table is packed one byte per entry (skating values as fixed point
+  uint16), zlib-compressed and base64-encoded, then written between the
+  generated markers in level4.py
+"""
+
+import argparse
+import base64
+import itertools
+import math
+import os
+import time
+import zlib
+from array import array
+from functools import partial
+from multiprocessing import Pool
+from typing import Dict, List, Sequence, Tuple
+
+from referee import ACTIONS, ArcheryRace, HurdleRace, SkatingRace
+
+BOT = "level4.py"
+BEGIN_MARKER = "# BEGIN GENERATED POLICY TABLES\n"
+END_MARKER = "# END GENERATED POLICY TABLES\n"
+
+HURDLE_WINDOW = 6
+ARCHERY_TURNS = 15
+ARCHERY_WINDS = 10
+SKATING_CONTROL = 0.5
+SKATING_VALUE_SCALE = 1000
+
+UP, LEFT, DOWN, RIGHT = range(len(ACTIONS))
+
+
+def encode_table(data: bytes) -> str:
+    return base64.b64encode(zlib.compress(data, 9)).decode("ascii")
+
+
+################
+# HURDLE
+################
+
+
+def hurdle_move(mask: int, offset: int, action: int) -> Tuple[int, bool]:
+    """Same rules as HurdleRace.play, squares counted from the player"""
+    if action == UP:
+        landing = offset + 2
+        return landing, bool((mask >> (landing - 1)) & 1)
+    for _ in range(HurdleRace.RUN_SPACES[ACTIONS[action]]):
+        offset += 1
+        if (mask >> (offset - 1)) & 1:
+            return offset, True
+    return offset, False
+
+
+def solve_hurdle_window(mask: int) -> int:
+    """
+    Best action with hurdles on the `mask` squares ahead
+
+    Squares past the window are assumed clear, where running covers
+    3 squares a turn, so landing further past it is worth a fraction of a
+    turn.
+    """
+    run = HurdleRace.RUN_SPACES["RIGHT"]
+    turns: Dict[int, float] = {}
+    best_action = RIGHT
+    for offset in range(HURDLE_WINDOW, -1, -1):
+        options = []
+        for action in (RIGHT, DOWN, LEFT, UP):
+            landing, hit = hurdle_move(mask, offset, action)
+            cost = 1 + (HurdleRace.STUN_TURNS if hit else 0)
+            if landing >= HURDLE_WINDOW:
+                cost -= (landing - HURDLE_WINDOW) / run
+            else:
+                cost += turns[landing]
+            options.append((cost, -landing, action))
+        best = min(options)
+        turns[offset] = best[0]
+        best_action = best[2]
+    return best_action
+
+
+def hurdle_table(pool: Pool) -> bytes:
+    return bytes(pool.map(solve_hurdle_window, range(1 << HURDLE_WINDOW)))
+
+
+################
+# ARCHERY
+################
+
+
+def _archery_move(x: int, y: int, wind: int, action: int) -> Tuple[int, int]:
+    dx, dy = ArcheryRace.DIRECTIONS[ACTIONS[action]]
+    limit = ArcheryRace.LIMIT
+    return (
+        max(-limit, min(limit, x + dx * wind)),
+        max(-limit, min(limit, y + dy * wind)),
+    )
+
+
+def _archery_layer_for_wind(
+    values: Sequence[float], wind: int
+) -> Tuple[List[int], List[float]]:
+    """Best action and its value on every |x|, |y| square for one wind"""
+    side = ArcheryRace.LIMIT + 1
+    actions, best_values = [], []
+    for x, y in itertools.product(range(side), range(side)):
+        best = min(
+            (values[abs(nx) * side + abs(ny)], action)
+            for action in range(len(ACTIONS))
+            for nx, ny in [_archery_move(x, y, wind, action)]
+        )
+        best_values.append(best[0])
+        actions.append(best[1])
+    return actions, best_values
+
+
+def archery_table(pool: Pool) -> bytes:
+    """
+    actions[((turns - 1) * ARCHERY_WINDS + wind) * side**2 + |x| * side + |y|]
+
+    The distance is symmetric in both axes, so only the quadrant with
+    x, y >= 0 is solved.
+    """
+    side = ArcheryRace.LIMIT + 1
+    values = [math.hypot(x, y) for x, y in itertools.product(range(side), range(side))]
+    table = bytearray()
+    for _ in range(ARCHERY_TURNS):
+        layers = pool.map(
+            partial(_archery_layer_for_wind, values), range(ARCHERY_WINDS)
+        )
+        for actions, _ in layers:
+            table.extend(actions)
+        # before this turn's wind is known, every wind is as likely
+        values = [
+            sum(layer[1][square] for layer in layers) / ARCHERY_WINDS
+            for square in range(side * side)
+        ]
+    return bytes(table)
+
+
+################
+# SKATING
+################
+
+
+def _skating_step(risk: int, index: int, collided: bool) -> Tuple[int, int]:
+    """Same rules as level4.py's skating_step"""
+    if risk < 0:
+        return 0, risk + 1
+    risk = max(0, risk + SkatingRace.RISK_DELTAS[index])
+    if collided:
+        risk += SkatingRace.COLLISION_RISK
+    if risk >= SkatingRace.STUN_RISK:
+        return SkatingRace.SPACES[index], -SkatingRace.STUN_TURNS
+    return SkatingRace.SPACES[index], risk
+
+
+def skating_tables(control: float) -> Tuple[bytes, bytes]:
+    """
+    (best index, value) for every (turns to go, risk), mirroring
+    SkatingEvaluator, risk from -STUN_TURNS to STUN_RISK - 1
+    """
+    risks = range(-SkatingRace.STUN_TURNS, SkatingRace.STUN_RISK)
+    collision = 1 - (1 - 1 / SkatingRace.TRACK_LENGTH) ** 2
+    # where a fixed action lands in a random risk order
+    orders = list(itertools.permutations(range(len(SkatingRace.SPACES))))
+    index_weights = [0.0] * len(SkatingRace.SPACES)
+    for order in orders:
+        index_weights[order.index(RIGHT)] += 1 / len(orders)
+
+    def expected(future: Dict[int, float], risk: int, index: int) -> float:
+        spaces, safe_risk = _skating_step(risk, index, collided=False)
+        _, hit_risk = _skating_step(risk, index, collided=True)
+        return (
+            spaces + (1 - collision) * future[safe_risk] + collision * future[hit_risk]
+        )
+
+    values = [{risk: 0.0 for risk in risks}]
+    for _ in range(SkatingRace.TURNS):
+        future, solved = values[-1], {}
+        for risk in risks:
+            if risk < 0:
+                solved[risk] = future[risk + 1]
+                continue
+            options = [
+                expected(future, risk, i) for i in range(len(SkatingRace.SPACES))
+            ]
+            solved[risk] = control * max(options) + (1 - control) * sum(
+                w * option for w, option in zip(index_weights, options)
+            )
+        values.append(solved)
+
+    best_indices = bytearray()
+    fixed_point = array("H")
+    for future in values:
+        for risk in risks:
+            options = [
+                expected(future, risk, i) for i in range(len(SkatingRace.SPACES))
+            ]
+            best_indices.append(options.index(max(options)))
+            fixed_point.append(round(future[risk] * SKATING_VALUE_SCALE))
+    return bytes(best_indices), fixed_point.tobytes()
+
+
+################
+# EMBEDDING
+################
+
+
+def render_block(tables: Dict[str, bytes], control: float) -> str:
+    lines = [
+        BEGIN_MARKER.rstrip("\n"),
+        "# policy_tables.py, do not edit by hand",
+        "POLICY_HURDLE_WINDOW = {}".format(HURDLE_WINDOW),
+        "POLICY_ARCHERY_TURNS = {}".format(ARCHERY_TURNS),
+        "POLICY_SKATING_CONTROL = {!r}".format(control),
+        "POLICY_SKATING_VALUE_SCALE = {}".format(SKATING_VALUE_SCALE),
+        "POLICY_TABLES = {",
+    ]
+    for name, data in tables.items():
+        lines.append('    "{}": "{}",'.format(name, encode_table(data)))
+    lines.append("}")
+    lines.append(END_MARKER.rstrip("\n"))
+    return "\n".join(lines) + "\n"
+
+
+def embed(path: str, block: str):
+    with open(path) as bot_file:
+        source = bot_file.read()
+    start = source.index(BEGIN_MARKER)
+    end = source.index(END_MARKER) + len(END_MARKER)
+    with open(path, "w") as bot_file:
+        bot_file.write(source[:start] + block + source[end:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bot", default=BOT)
+    parser.add_argument("--skating-control", type=float, default=SKATING_CONTROL)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with Pool(processes=args.workers or os.cpu_count()) as pool:
+        skating = pool.apply_async(skating_tables, (args.skating_control,))
+        tables = {"hurdle": hurdle_table(pool), "archery": archery_table(pool)}
+        tables["skating_index"], tables["skating_values"] = skating.get()
+
+    block = render_block(tables, args.skating_control)
+    embed(args.bot, block)
+    print("solved in {:.1f}s".format(time.perf_counter() - started))
+    for name, data in tables.items():
+        print(
+            "  {}: {} bytes, {} encoded".format(
+                name, len(data), len(encode_table(data))
+            )
+        )
+    print("wrote {} ({} characters of tables)".format(args.bot, len(block)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,826 @@
+"""
+Local referee for https://www.codingame.com/ide/challenge/summer-challenge-2024-olymbits
+
+Plays full 3-player matches of the four mini-games with the same text
+protocol as the platform, so the level scripts can be pitted against each
+other offline:
+
+    python referee.py level2.py level3.py level4.py --rounds 20 --seed 1
+
+General methodology is:
+- Every combination of 3 bots plays every seating order, once per round
+- Matches are spread over a process pool, each one seeded from --seed
+- Bots run in-process (each in a thread, with `input`/`print` swapped out)
+  or as subprocesses speaking over stdin/stdout
+
+A bot can be a variant of a script with some of its constants overridden,
+`level4.py@DIVING_PRIORITY=6;MEDAL_FOCUS=0.5`. The overrides are served as
+the script's generated constants module, `level4_constants` for level4.py.
+"""
+
+import abc
+import argparse
+import ast
+import importlib.util
+import itertools
+import math
+import os
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Any, Dict, List, Optional, Tuple
+
+NB_PLAYERS = 3
+NB_GAMES = 4
+TOTAL_TURNS = 100
+ACTIONS = ("UP", "LEFT", "DOWN", "RIGHT")
+LETTERS = ("U", "L", "D", "R")
+DEFAULT_ACTION = "RIGHT"
+GAME_OVER = "GAME_OVER"
+
+# Generous, we're measuring strength here rather than the platform's 50ms
+TURN_TIMEOUT = 1.0
+
+
+################
+# MINI-GAMES
+################
+
+
+class MiniGame(abc.ABC):
+    """One race of a mini-game, for 3 players"""
+
+    name = ""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    @property
+    @abc.abstractmethod
+    def gpu(self) -> str:
+        pass
+
+    @abc.abstractmethod
+    def registers(self) -> List[int]:
+        pass
+
+    @abc.abstractmethod
+    def play(self, actions: List[str]) -> bool:
+        """Apply one turn, returns True once the race is over"""
+
+    @abc.abstractmethod
+    def scores(self) -> List[float]:
+        """Final standings, higher is better"""
+
+
+class HurdleRace(MiniGame):
+    name = "HURDLE"
+    TRACK_LENGTH = 30
+    STUN_TURNS = 3
+    RUN_SPACES = {"LEFT": 1, "DOWN": 2, "RIGHT": 3}
+
+    def __init__(self, rng: random.Random):
+        super().__init__(rng)
+        cells = ["."] * self.TRACK_LENGTH
+        cell = 3
+        while cell < self.TRACK_LENGTH - 1:
+            if rng.random() < 0.3:
+                cells[cell] = "#"
+                cell += 2
+            cell += 1
+        self.track = "".join(cells)
+        self.positions = [0] * NB_PLAYERS
+        self.stuns = [0] * NB_PLAYERS
+
+    @property
+    def gpu(self) -> str:
+        return self.track
+
+    def registers(self) -> List[int]:
+        return self.positions + self.stuns + [0]
+
+    def play(self, actions: List[str]) -> bool:
+        finish = self.TRACK_LENGTH - 1
+        for player, action in enumerate(actions):
+            if self.stuns[player] > 0:
+                self.stuns[player] -= 1
+                continue
+
+            pos = self.positions[player]
+            if action == "UP":
+                pos = min(pos + 2, finish)
+                if self.track[pos] == "#":
+                    self.stuns[player] = self.STUN_TURNS
+            else:
+                for _ in range(self.RUN_SPACES[action]):
+                    pos = min(pos + 1, finish)
+                    if self.track[pos] == "#":
+                        self.stuns[player] = self.STUN_TURNS
+                        break
+            self.positions[player] = pos
+
+        return max(self.positions) >= finish
+
+    def scores(self) -> List[float]:
+        return list(self.positions)
+
+
+class ArcheryRace(MiniGame):
+    name = "ARCHERY"
+    LIMIT = 20
+    DIRECTIONS = {"UP": (0, -1), "LEFT": (-1, 0), "DOWN": (0, 1), "RIGHT": (1, 0)}
+
+    def __init__(self, rng: random.Random):
+        super().__init__(rng)
+        self.winds = "".join(str(rng.randint(0, 9)) for _ in range(rng.randint(12, 15)))
+        start = (
+            rng.randint(-self.LIMIT, self.LIMIT),
+            rng.randint(-self.LIMIT, self.LIMIT),
+        )
+        self.cursors = [start] * NB_PLAYERS
+
+    @property
+    def gpu(self) -> str:
+        return self.winds
+
+    def registers(self) -> List[int]:
+        return [v for cursor in self.cursors for v in cursor] + [0]
+
+    def play(self, actions: List[str]) -> bool:
+        wind = int(self.winds[0])
+        for player, action in enumerate(actions):
+            dx, dy = self.DIRECTIONS[action]
+            x, y = self.cursors[player]
+            self.cursors[player] = (
+                max(-self.LIMIT, min(self.LIMIT, x + dx * wind)),
+                max(-self.LIMIT, min(self.LIMIT, y + dy * wind)),
+            )
+        self.winds = self.winds[1:]
+        return not self.winds
+
+    def scores(self) -> List[float]:
+        return [-(x**2 + y**2) for x, y in self.cursors]
+
+
+class SkatingRace(MiniGame):
+    name = "SKATING"
+    TURNS = 15
+    TRACK_LENGTH = 10
+    SPACES = (1, 2, 2, 3)
+    RISK_DELTAS = (-1, 0, 1, 2)
+    COLLISION_RISK = 2
+    STUN_RISK = 5
+    STUN_TURNS = 2
+
+    def __init__(self, rng: random.Random):
+        super().__init__(rng)
+        self.spaces = [0] * NB_PLAYERS
+        self.risks = [0] * NB_PLAYERS
+        self.turns_left = self.TURNS
+        self._shuffle()
+
+    def _shuffle(self):
+        self.order = list(LETTERS)
+        self.rng.shuffle(self.order)
+
+    @property
+    def gpu(self) -> str:
+        return "".join(self.order)
+
+    def registers(self) -> List[int]:
+        return self.spaces + self.risks + [self.turns_left]
+
+    def play(self, actions: List[str]) -> bool:
+        moved = [False] * NB_PLAYERS
+        for player, action in enumerate(actions):
+            if self.risks[player] < 0:
+                # stunned
+                self.risks[player] += 1
+                continue
+            index = self.order.index(action[0])
+            self.spaces[player] += self.SPACES[index]
+            self.risks[player] = max(0, self.risks[player] + self.RISK_DELTAS[index])
+            moved[player] = True
+
+        squares = [spaces % self.TRACK_LENGTH for spaces in self.spaces]
+        for player in range(NB_PLAYERS):
+            if not moved[player]:
+                continue
+            if any(
+                squares[other] == squares[player]
+                for other in range(NB_PLAYERS)
+                if other != player
+            ):
+                self.risks[player] += self.COLLISION_RISK
+            if self.risks[player] >= self.STUN_RISK:
+                self.risks[player] = -self.STUN_TURNS
+
+        self.turns_left -= 1
+        self._shuffle()
+        return self.turns_left <= 0
+
+    def scores(self) -> List[float]:
+        return list(self.spaces)
+
+
+class DivingRace(MiniGame):
+    name = "DIVING"
+
+    def __init__(self, rng: random.Random):
+        super().__init__(rng)
+        self.dives = "".join(rng.choice(LETTERS) for _ in range(rng.randint(12, 15)))
+        self.points = [0] * NB_PLAYERS
+        self.combos = [0] * NB_PLAYERS
+
+    @property
+    def gpu(self) -> str:
+        return self.dives
+
+    def registers(self) -> List[int]:
+        return self.points + self.combos + [0]
+
+    def play(self, actions: List[str]) -> bool:
+        for player, action in enumerate(actions):
+            if action[0] == self.dives[0]:
+                self.combos[player] += 1
+                self.points[player] += self.combos[player]
+            else:
+                self.combos[player] = 0
+        self.dives = self.dives[1:]
+        return not self.dives
+
+    def scores(self) -> List[float]:
+        return list(self.points)
+
+
+MINI_GAMES = [HurdleRace, ArcheryRace, SkatingRace, DivingRace]
+
+
+def award_medals(scores: List[float]) -> List[int]:
+    """0 for gold, 1 for silver, 2 for bronze, ties share the better medal"""
+    return [sum(other > score for other in scores) for score in scores]
+
+
+@dataclass
+class GameSlot:
+    """A mini-game running races back to back, with a GAME_OVER turn between"""
+
+    game_cls: type
+    rng: random.Random
+    race: MiniGame = None
+    over: bool = False
+
+    def __post_init__(self):
+        self.race = self.game_cls(self.rng)
+
+    def input_line(self) -> str:
+        gpu = GAME_OVER if self.over else self.race.gpu
+        return " ".join([gpu] + [str(v) for v in self.race.registers()])
+
+    def play(self, actions: List[str]) -> Optional[List[int]]:
+        """Returns each player's medal when a race finishes this turn"""
+        if self.over:
+            self.race = self.game_cls(self.rng)
+            self.over = False
+            return None
+
+        if self.race.play(actions):
+            self.over = True
+            return award_medals(self.race.scores())
+        return None
+
+
+################
+# BOTS
+################
+
+
+def parse_bot_spec(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """`level4.py@NAME=VALUE;NAME=VALUE` to the script path and its overrides"""
+    path, _, overrides = spec.partition("@")
+    values = {}
+    for override in filter(None, overrides.split(";")):
+        name, _, value = override.partition("=")
+        values[name.strip()] = ast.literal_eval(value.strip())
+    return path, values
+
+
+def constants_module_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0] + "_constants"
+
+
+def load_constants(path: str) -> Dict[str, Any]:
+    """Values from a script's generated constants module, if it has one"""
+    constants_path = os.path.join(
+        os.path.dirname(os.path.abspath(path)), constants_module_name(path) + ".py"
+    )
+    if not os.path.exists(constants_path):
+        return {}
+    namespace: Dict[str, Any] = {}
+    with open(constants_path) as constants_file:
+        exec(constants_file.read(), namespace)
+    return {
+        name: value for name, value in namespace.items() if not name.startswith("_")
+    }
+
+
+def write_constants_module(path: str, values: Dict[str, Any], comments: List[str] = ()):
+    """Write `values` as a constants module that a bot star-imports"""
+    lines = ['"""Generated, do not edit by hand"""', ""]
+    lines.extend("# " + comment for comment in comments)
+    if comments:
+        lines.append("")
+    lines.extend("{} = {!r}".format(name, value) for name, value in values.items())
+    with open(path, "w") as constants_file:
+        constants_file.write("\n".join(lines) + "\n")
+
+
+class BotCrashed(Exception):
+    pass
+
+
+class _MatchOver(BaseException):
+    """Unwinds an in-process bot's game loop, which never returns by itself"""
+
+
+_BOT_THREAD = threading.local()
+
+
+class _QuietBotStderr:
+    """
+    sys.stderr, minus what in-process bot threads write to it
+
+    Shared modules such as olymbits/ print their debug output themselves,
+    out of reach of the bot module's own `print`.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        if getattr(_BOT_THREAD, "quiet", False):
+            return len(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
+class Bot(abc.ABC):
+    @abc.abstractmethod
+    def send(self, lines: List[str]):
+        pass
+
+    @abc.abstractmethod
+    def receive(self, timeout: float) -> str:
+        pass
+
+    def close(self):
+        pass
+
+
+# sys.modules is shared, so bots are started one at a time, each one
+# importing its constants before the next can swap them
+_CONSTANTS_LOCK = threading.Lock()
+
+
+class InProcessBot(Bot):
+    """
+    Runs a bot script in a thread of this process
+
+    The scripts read stdin with `input()` and answer with `print()` at module
+    level, so both names are shadowed in the module's namespace before it runs.
+    """
+
+    def __init__(self, bot_spec: str):
+        self.inputs: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.outputs: "queue.Queue[str]" = queue.Queue()
+        self.error: Optional[BaseException] = None
+        self.started = threading.Event()
+
+        path, overrides = parse_bot_spec(bot_spec)
+        spec = importlib.util.spec_from_file_location("olymbits_bot", path)
+        self.module = importlib.util.module_from_spec(spec)
+        self.module.input = self._input
+        self.module.print = self._print
+        self.thread = threading.Thread(
+            target=self._run, args=(spec.loader,), daemon=True
+        )
+        if not isinstance(sys.stderr, _QuietBotStderr):
+            sys.stderr = _QuietBotStderr(sys.stderr)
+
+        name = constants_module_name(path)
+        with _CONSTANTS_LOCK:
+            if not overrides:
+                # plain bots also wait, or a variant started right after
+                # could swap its constants in before they're imported
+                self.thread.start()
+                self.started.wait()
+                return
+
+            constants = types.ModuleType(name)
+            constants.__dict__.update(load_constants(path))
+            constants.__dict__.update(overrides)
+            previous = sys.modules.get(name)
+            sys.modules[name] = constants
+            try:
+                self.thread.start()
+                # the constants are imported before the first input() call
+                self.started.wait()
+            finally:
+                if previous is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = previous
+
+    def _run(self, loader):
+        _BOT_THREAD.quiet = True
+        try:
+            loader.exec_module(self.module)
+        except _MatchOver:
+            pass
+        except BaseException as exc:  # noqa
+            self.error = exc
+            self.outputs.put(None)
+        finally:
+            self.started.set()
+
+    def _input(self, prompt: str = "") -> str:
+        self.started.set()
+        line = self.inputs.get()
+        if line is None:
+            raise _MatchOver()
+        return line
+
+    def _print(self, *args, file=None, **kwargs):
+        if file is not None and file is not sys.stdout:
+            # debug output
+            return
+        self.outputs.put(" ".join(str(arg) for arg in args))
+
+    def send(self, lines: List[str]):
+        for line in lines:
+            self.inputs.put(line)
+
+    def receive(self, timeout: float) -> str:
+        try:
+            line = self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            raise BotCrashed("timeout")
+        if line is None:
+            raise BotCrashed(repr(self.error))
+        return line
+
+    def close(self):
+        self.inputs.put(None)
+
+
+class SubprocessBot(Bot):
+    def __init__(self, bot_spec: str):
+        path, overrides = parse_bot_spec(bot_spec)
+        # shared modules such as olymbits/ live next to the original script
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(
+                None, [os.path.dirname(os.path.abspath(path)), env.get("PYTHONPATH")]
+            )
+        )
+        self.workdir = None
+        if overrides:
+            # the script's own directory comes first on sys.path, so run a
+            # copy next to the variant's constants module
+            self.workdir = tempfile.mkdtemp(prefix="olymbits_")
+            write_constants_module(
+                os.path.join(self.workdir, constants_module_name(path) + ".py"),
+                {**load_constants(path), **overrides},
+            )
+            path = shutil.copy(path, self.workdir)
+
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            cwd=os.path.dirname(os.path.abspath(path)),
+            env=env,
+        )
+        self.outputs: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.outputs.put(line.rstrip("\n"))
+        self.outputs.put(None)
+
+    def send(self, lines: List[str]):
+        try:
+            self.process.stdin.write("\n".join(lines) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise BotCrashed(repr(exc))
+
+    def receive(self, timeout: float) -> str:
+        try:
+            line = self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            raise BotCrashed("timeout")
+        if line is None:
+            # stdout is closed, so the process is exiting
+            raise BotCrashed("exited with {}".format(self.process.wait()))
+        return line
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+BOT_MODES = {
+    "inprocess": InProcessBot,
+    "subprocess": SubprocessBot,
+}
+
+
+################
+# MATCHES
+################
+
+
+@dataclass
+class MatchResult:
+    seed: int
+    bots: List[str]
+    final_scores: List[int]
+    crashes: List[Optional[str]]
+    turns: int
+    duration: float
+
+    @property
+    def winners(self) -> List[int]:
+        best = max(self.final_scores)
+        return [seat for seat, score in enumerate(self.final_scores) if score == best]
+
+
+def final_score(medals: List[List[int]]) -> int:
+    """medals[game] = [gold, silver, bronze], a gold is worth 3 and a silver 1"""
+    score = 1
+    for gold, silver, _ in medals:
+        score *= 3 * gold + silver
+    return score
+
+
+def play_match(
+    bot_specs: List[str],
+    seed: int,
+    mode: str = "inprocess",
+    turn_timeout: float = TURN_TIMEOUT,
+) -> MatchResult:
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    slots = [GameSlot(game_cls=game_cls, rng=rng) for game_cls in MINI_GAMES]
+    # medals[player][game] = [gold, silver, bronze]
+    medals = [[[0, 0, 0] for _ in range(NB_GAMES)] for _ in range(NB_PLAYERS)]
+    crashes: List[Optional[str]] = [None] * NB_PLAYERS
+
+    bots: List[Bot] = []
+    for player, bot_spec in enumerate(bot_specs):
+        bot = BOT_MODES[mode](bot_spec)
+        bot.send([str(player), str(NB_GAMES)])
+        bots.append(bot)
+
+    turn = 0
+    try:
+        for turn in range(TOTAL_TURNS):
+            score_lines = [
+                " ".join(
+                    str(v)
+                    for v in [final_score(medals[player])]
+                    + [count for game in medals[player] for count in game]
+                )
+                for player in range(NB_PLAYERS)
+            ]
+            game_lines = [slot.input_line() for slot in slots]
+
+            actions = []
+            for player, bot in enumerate(bots):
+                action = DEFAULT_ACTION
+                if crashes[player] is None:
+                    try:
+                        bot.send(score_lines + game_lines)
+                        answer = bot.receive(turn_timeout).strip().split()
+                        if answer and answer[0] in ACTIONS:
+                            action = answer[0]
+                        else:
+                            crashes[player] = "invalid output {!r}".format(answer)
+                    except BotCrashed as exc:
+                        crashes[player] = str(exc)
+                actions.append(action)
+
+            for game, slot in enumerate(slots):
+                race_medals = slot.play(actions)
+                if race_medals is None:
+                    continue
+                for player, medal in enumerate(race_medals):
+                    medals[player][game][medal] += 1
+    finally:
+        for bot in bots:
+            bot.close()
+
+    return MatchResult(
+        seed=seed,
+        bots=list(bot_specs),
+        final_scores=[
+            # a crashed bot would have been disqualified on the platform
+            -1 if crashes[player] else final_score(medals[player])
+            for player in range(NB_PLAYERS)
+        ],
+        crashes=crashes,
+        turns=turn + 1,
+        duration=time.perf_counter() - started,
+    )
+
+
+def _play_match_job(job: Tuple[List[str], int, str, float]) -> MatchResult:
+    return play_match(*job)
+
+
+################
+# TOURNAMENTS
+################
+
+
+@dataclass
+class BotStanding:
+    bot: str
+    matches: int = 0
+    wins: float = 0.0
+    score_total: int = 0
+    crashes: int = 0
+    first_crash: Optional[str] = None
+
+    @property
+    def always_crashed(self) -> bool:
+        """A bot that never finished a match is broken, not just weak"""
+        return self.matches > 0 and self.crashes == self.matches
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.matches if self.matches else 0.0
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_total / self.matches if self.matches else 0.0
+
+    def confidence_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        """Wilson score interval for the win rate"""
+        if not self.matches:
+            return 0.0, 1.0
+        n, p = self.matches, self.win_rate
+        centre = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+        spread = z * math.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+        return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+@dataclass
+class TournamentResult:
+    standings: Dict[str, BotStanding] = field(default_factory=dict)
+    matches: int = 0
+    duration: float = 0.0
+
+    @property
+    def matches_per_second(self) -> float:
+        return self.matches / self.duration if self.duration else 0.0
+
+    def record(self, result: MatchResult):
+        self.matches += 1
+        winners = result.winners
+        for seat, bot in enumerate(result.bots):
+            standing = self.standings.setdefault(bot, BotStanding(bot=bot))
+            standing.matches += 1
+            standing.score_total += max(0, result.final_scores[seat])
+            if result.crashes[seat]:
+                standing.crashes += 1
+                standing.first_crash = standing.first_crash or result.crashes[seat]
+            if seat in winners:
+                # shared wins are split
+                standing.wins += 1 / len(winners)
+
+    def report(self) -> str:
+        lines = [
+            "{:<40} {:>8} {:>8} {:>17} {:>10} {:>8}".format(
+                "bot", "matches", "win %", "95% CI", "avg score", "crashes"
+            )
+        ]
+        ranked = [s for s in self.standings.values() if not s.always_crashed]
+        for standing in sorted(ranked, key=lambda s: s.win_rate, reverse=True):
+            low, high = standing.confidence_interval()
+            lines.append(
+                "{:<40} {:>8} {:>7.1f}% {:>7.1f}% - {:>5.1f}% {:>10.1f} {:>8}".format(
+                    standing.bot,
+                    standing.matches,
+                    100 * standing.win_rate,
+                    100 * low,
+                    100 * high,
+                    standing.mean_score,
+                    standing.crashes,
+                )
+            )
+        for standing in self.standings.values():
+            if standing.always_crashed:
+                lines.append(
+                    "{} crashed in all {} matches and is not ranked: {}".format(
+                        standing.bot, standing.matches, standing.first_crash
+                    )
+                )
+        lines.append(
+            "{} matches in {:.1f}s ({:.2f} matches/s)".format(
+                self.matches, self.duration, self.matches_per_second
+            )
+        )
+        return "\n".join(lines)
+
+
+def schedule_matches(
+    bot_specs: List[str], rounds: int, seed: int
+) -> List[Tuple[List[str], int]]:
+    """
+    Round-robin: every group of 3 bots plays every seating order each round
+
+    Seating matters because the registers are ordered by player index, so
+    each group plays all orders with the same seed to cancel it out.
+    """
+    if len(bot_specs) >= NB_PLAYERS:
+        groups = list(itertools.combinations(bot_specs, NB_PLAYERS))
+    else:
+        groups = list(itertools.combinations_with_replacement(bot_specs, NB_PLAYERS))
+
+    rng = random.Random(seed)
+    matches = []
+    for _ in range(rounds):
+        for group in groups:
+            match_seed = rng.getrandbits(32)
+            for seating in sorted(set(itertools.permutations(group))):
+                matches.append((list(seating), match_seed))
+    return matches
+
+
+def run_tournament(
+    bot_specs: List[str],
+    rounds: int = 10,
+    seed: int = 0,
+    mode: str = "inprocess",
+    workers: Optional[int] = None,
+    turn_timeout: float = TURN_TIMEOUT,
+) -> TournamentResult:
+    jobs = [
+        (seating, match_seed, mode, turn_timeout)
+        for seating, match_seed in schedule_matches(bot_specs, rounds, seed)
+    ]
+
+    tournament = TournamentResult()
+    started = time.perf_counter()
+    with Pool(processes=workers or os.cpu_count()) as pool:
+        for result in pool.imap_unordered(_play_match_job, jobs):
+            tournament.record(result)
+    tournament.duration = time.perf_counter() - started
+    return tournament
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "bots",
+        nargs="+",
+        help="bot scripts or variants, e.g. level4.py@MEDAL_FOCUS=0.5",
+    )
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=sorted(BOT_MODES), default="inprocess")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT)
+    args = parser.parse_args()
+
+    tournament = run_tournament(
+        bot_specs=args.bots,
+        rounds=args.rounds,
+        seed=args.seed,
+        mode=args.mode,
+        workers=args.workers,
+        turn_timeout=args.turn_timeout,
+    )
+    print(tournament.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Reader for level4.py's binary turn traces
+
+Record some self-play with tracing turned on, then convert the trace:
+
+    LEVEL4_TRACE=trace.bin python referee.py level4.py level3.py level4.py --rounds 20
+    python trace_reader.py trace.bin --csv trace.csv
+
+or load it for analysis with `read_dataframe("trace.bin")` (needs pandas).
+"""
+
+import argparse
+import csv
+import struct
+import sys
+from typing import Any, Dict, Iterator, List
+
+# Mirrors level4.py's TRACE block
+GAMES = ["HURDLE", "ARCHERY", "SKATING", "DIVING"]
+ACTIONS = ["UP", "LEFT", "DOWN", "RIGHT"]
+SOURCES = ["value", "rollout", "search", "priority", "default", "error"]
+REGISTERS = 7
+RECORD = struct.Struct(
+    "<IHb"
+    + "B{}h".format(REGISTERS) * len(GAMES)
+    + "{}B".format(len(GAMES))
+    + "bb"
+    + "{}f".format(len(GAMES) * len(ACTIONS))
+    + "{}f".format(len(GAMES))
+    + "f"
+)
+
+
+def columns() -> List[str]:
+    names = ["trace_id", "turn", "player_idx"]
+    for game in GAMES:
+        names.append("{}_gpu_length".format(game.lower()))
+        names.extend("{}_register_{}".format(game.lower(), r) for r in range(REGISTERS))
+    names.extend("{}_medal_points".format(game.lower()) for game in GAMES)
+    names.extend(["action", "source"])
+    for game in GAMES:
+        names.extend("{}_value_{}".format(game.lower(), a.lower()) for a in ACTIONS)
+    names.extend("{}_weight".format(game.lower()) for game in GAMES)
+    names.append("elapsed_ms")
+    return names
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    names = columns()
+    with open(path, "rb") as trace_file:
+        data = trace_file.read()
+    complete = len(data) - len(data) % RECORD.size
+    if complete != len(data):
+        print(
+            "{}: ignoring {} trailing bytes".format(path, len(data) - complete),
+            file=sys.stderr,
+        )
+    for values in RECORD.iter_unpack(data[:complete]):
+        record = dict(zip(names, values))
+        record["action"] = ACTIONS[record["action"]]
+        record["source"] = SOURCES[record["source"]]
+        yield record
+
+
+def write_csv(path: str, output: str) -> int:
+    count = 0
+    with open(output, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=columns())
+        writer.writeheader()
+        for record in read_records(path):
+            writer.writerow(record)
+            count += 1
+    return count
+
+
+def read_dataframe(path: str):
+    """All records as a pandas DataFrame, one row per bot turn"""
+    import pandas as pd
+
+    return pd.DataFrame.from_records(list(read_records(path)), columns=columns())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace")
+    parser.add_argument(
+        "--csv", default=None, help="defaults to the trace name with .csv"
+    )
+    args = parser.parse_args()
+
+    output = args.csv or args.trace.rsplit(".", 1)[0] + ".csv"
+    count = write_csv(args.trace, output)
+    print("wrote {} turns to {}".format(count, output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Parameter tuner for the level4.py heuristics
+
+Treats the constants in level4.py's TUNABLE CONSTANTS block as a parameter
+vector and searches it by self-play against the local referee:
+
+    python tuner.py --candidates 16 --matches 3 --seed 1
+
+General methodology is:
+- Sample candidate vectors around the current constants (which always take
+  part, unchanged)
+- Successive halving: every survivor plays the same seeded matches against
+  the opponents, the best 1/eta go on to play eta times more matches
+- The last survivor is written to level4_constants.py, which level4.py
+  star-imports over its defaults
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import date
+from multiprocessing import Pool
+from typing import Any, Dict, List, Optional, Tuple
+
+from referee import (
+    NB_PLAYERS,
+    constants_module_name,
+    load_constants,
+    play_match,
+    write_constants_module,
+)
+
+BOT = "level4.py"
+OPPONENTS = ["level4.py", "level3.py"]
+
+
+@dataclass
+class Parameter:
+    name: str
+    default: Any
+    low: Optional[float] = None
+    high: Optional[float] = None
+    choices: Optional[List[Any]] = None
+
+    def sample(self, rng: random.Random, around: Any, spread: float) -> Any:
+        """A random value, `spread` sets how far from `around` it strays"""
+        if self.choices is not None:
+            if rng.random() < spread:
+                return rng.choice(self.choices)
+            return around
+
+        if isinstance(self.default, int):
+            step = max(1, round(spread * (self.high - self.low)))
+            return max(self.low, min(self.high, around + rng.randint(-step, step)))
+
+        value = rng.gauss(around, spread * (self.high - self.low))
+        return round(max(self.low, min(self.high, value)), 3)
+
+
+# Mirrors level4.py's TUNABLE CONSTANTS block
+PARAMETERS = [
+    Parameter("SKATING_CONTROL", 0.5, low=0.0, high=1.0),
+    Parameter("DIVING_MATCH_CHANCE", 0.75, low=0.25, high=1.0),
+    Parameter("DIVING_PRIORITY", 4, low=0, high=10),
+    Parameter("MEDAL_FOCUS", 0.6, low=0.0, high=1.0),
+    Parameter("OPPONENT_PRIOR_TURNS", 10, low=0, high=50),
+    Parameter("MEDAL_WEIGHT_PRIOR", 1, low=0, high=5),
+    Parameter(
+        "PRIORITY_EXCLUDE_GAMES",
+        [],
+        choices=[
+            [],
+            ["DIVING"],
+            ["ARCHERY"],
+            ["SKATING"],
+            ["HURDLE"],
+            ["ARCHERY", "DIVING"],
+        ],
+    ),
+]
+
+Vector = Tuple[Any, ...]
+
+
+def current_vector(bot: str) -> Vector:
+    """The constants in use today, generated ones over the defaults"""
+    constants = load_constants(bot)
+    return tuple(constants.get(p.name, p.default) for p in PARAMETERS)
+
+
+def bot_spec(bot: str, vector: Vector) -> str:
+    return (
+        bot
+        + "@"
+        + ";".join(
+            "{}={!r}".format(p.name, value) for p, value in zip(PARAMETERS, vector)
+        )
+    )
+
+
+def sample_candidates(
+    around: Vector, count: int, spread: float, rng: random.Random
+) -> List[Vector]:
+    candidates = [around]
+    while len(candidates) < count:
+        candidate = tuple(
+            p.sample(rng, value, spread) for p, value in zip(PARAMETERS, around)
+        )
+        if candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+
+def _candidate_match(job: Tuple[int, List[str], int, int]) -> Tuple[int, float]:
+    """Share of the win taken by the candidate sitting at `seat`"""
+    candidate, seating, seat, seed = job
+    result = play_match(seating, seed)
+    winners = result.winners
+    return candidate, (1 / len(winners) if seat in winners else 0.0)
+
+
+@dataclass
+class CandidateRecord:
+    vector: Vector
+    matches: int = 0
+    wins: float = 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.matches if self.matches else 0.0
+
+
+def successive_halving(
+    bot: str,
+    candidates: List[Vector],
+    opponents: List[str],
+    matches: int,
+    eta: int,
+    seed: int,
+    pool: Pool,
+) -> List[CandidateRecord]:
+    """
+    Returns the records of the last rung, best first
+
+    A "match" here is a group of NB_PLAYERS games with the candidate in each
+    seat, so seating order never favours one candidate over another.
+    """
+    rng = random.Random(seed)
+    records = [CandidateRecord(vector=vector) for vector in candidates]
+    survivors = list(range(len(records)))
+    rung = 0
+
+    while True:
+        # every survivor plays the same seeds this rung
+        seeds = [rng.getrandbits(32) for _ in range(matches)]
+        jobs = []
+        for candidate in survivors:
+            spec = bot_spec(bot, records[candidate].vector)
+            for match_seed in seeds:
+                for seat in range(NB_PLAYERS):
+                    seating = list(opponents)
+                    seating.insert(seat, spec)
+                    jobs.append((candidate, seating, seat, match_seed))
+
+        started = time.perf_counter()
+        for candidate, win in pool.imap_unordered(_candidate_match, jobs):
+            records[candidate].matches += 1
+            records[candidate].wins += win
+
+        survivors.sort(key=lambda c: records[c].win_rate, reverse=True)
+        print(
+            "rung {}: {} candidates x {} games in {:.1f}s, best {:.1%}".format(
+                rung,
+                len(survivors),
+                len(seeds) * NB_PLAYERS,
+                time.perf_counter() - started,
+                records[survivors[0]].win_rate,
+            )
+        )
+
+        if len(survivors) == 1:
+            return [records[c] for c in survivors]
+        survivors = survivors[: max(1, math.ceil(len(survivors) / eta))]
+        matches *= eta
+        rung += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bot", default=BOT)
+    parser.add_argument("--opponents", nargs=NB_PLAYERS - 1, default=OPPONENTS)
+    parser.add_argument("--candidates", type=int, default=16)
+    parser.add_argument("--spread", type=float, default=0.2)
+    parser.add_argument(
+        "--matches", type=int, default=3, help="per candidate, first rung"
+    )
+    parser.add_argument("--eta", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    baseline = current_vector(args.bot)
+    candidates = sample_candidates(baseline, args.candidates, args.spread, rng)
+
+    with Pool(processes=args.workers or os.cpu_count()) as pool:
+        best = successive_halving(
+            bot=args.bot,
+            candidates=candidates,
+            opponents=args.opponents,
+            matches=args.matches,
+            eta=args.eta,
+            seed=args.seed,
+            pool=pool,
+        )[0]
+
+    values: Dict[str, Any] = {
+        p.name: value for p, value in zip(PARAMETERS, best.vector)
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(args.bot)),
+        constants_module_name(args.bot) + ".py",
+    )
+    write_constants_module(
+        output,
+        values,
+        comments=[
+            "tuner.py on {}, seed {}".format(date.today().isoformat(), args.seed),
+            "win rate {:.1%} over {} games against {}".format(
+                best.win_rate, best.matches, ", ".join(args.opponents)
+            ),
+        ],
+    )
+    print("wrote {}".format(output))
+    for name, value in values.items():
+        print("  {} = {!r}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()